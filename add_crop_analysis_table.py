@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("📊 crop_analysis (촬영별 분석 이력) 테이블 생성 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS crop_analysis (
+            id BIGSERIAL PRIMARY KEY,
+            group_id INTEGER NOT NULL,
+            captured_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            ripe INTEGER NOT NULL DEFAULT 0,
+            unripe INTEGER NOT NULL DEFAULT 0,
+            rotten INTEGER NOT NULL DEFAULT 0,
+            image_path VARCHAR(255),
+            model_version VARCHAR(100),
+            FOREIGN KEY (group_id) REFERENCES crop_groups(id) ON DELETE CASCADE
+        )
+    """)
+    print("✅ crop_analysis 테이블 생성 완료")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_crop_analysis_group_captured
+        ON crop_analysis (group_id, captured_at)
+    """)
+    print("✅ (group_id, captured_at) 인덱스 생성 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("📡 device_commands 테이블에 pull 방식 전달 컬럼 추가 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        ALTER TABLE device_commands
+        ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMPTZ,
+        ADD COLUMN IF NOT EXISTS acked_at TIMESTAMPTZ
+    """)
+    print("✅ delivered_at, acked_at 컬럼 추가 완료")
+
+    # 디바이스별 대기 명령 조회용 (처리 완료된 명령은 인덱스에서 제외)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_device_commands_pending
+        ON device_commands (iot_id, id)
+        WHERE status IN ('queued', 'delivered')
+    """)
+    print("✅ 대기 명령 인덱스 생성 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
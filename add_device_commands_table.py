@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("📡 device_commands (IoT 명령 상태) 테이블 생성 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS device_commands (
+            id BIGSERIAL PRIMARY KEY,
+            iot_id INTEGER NOT NULL,
+            group_id INTEGER,
+            greenhouse_id INTEGER,
+            batch_id VARCHAR(32),
+            action VARCHAR(50) NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}',
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (iot_id) REFERENCES iot(id) ON DELETE CASCADE
+        )
+    """)
+    print("✅ device_commands 테이블 생성 완료")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_device_commands_batch
+        ON device_commands (batch_id)
+    """)
+    print("✅ batch_id 인덱스 생성 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
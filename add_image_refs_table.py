@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("🗂️ image_refs (이미지 참조 → 해시 blob 매핑) 테이블 생성 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS image_refs (
+            ref VARCHAR(255) PRIMARY KEY,
+            sha256 CHAR(64) NOT NULL,
+            ext VARCHAR(10) NOT NULL,
+            size_bytes INTEGER,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    print("✅ image_refs 테이블 생성 완료")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_image_refs_sha256
+        ON image_refs (sha256)
+    """)
+    print("✅ sha256 인덱스 생성 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+    print("ℹ️ 기존 평면 구조 이미지는 그대로 조회됩니다. (새 업로드부터 해시 샤딩 경로에 저장)")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
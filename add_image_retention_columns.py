@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("🧹 이미지 보존 정책(gc_crop_images.py)용 컬럼/인덱스 추가 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        ALTER TABLE image_refs
+        ADD COLUMN IF NOT EXISTS downsampled_at TIMESTAMPTZ
+    """)
+    print("✅ image_refs.downsampled_at 컬럼 추가 완료")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_image_refs_sha256_ext
+        ON image_refs (sha256, ext)
+    """)
+    print("✅ (sha256, ext) 인덱스 생성 완료")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_crop_analysis_image_path
+        ON crop_analysis (image_path)
+    """)
+    print("✅ crop_analysis.image_path 인덱스 생성 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("🧠 crop_analysis 모델 실행 기록 컬럼 추가 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        ALTER TABLE crop_analysis
+        ADD COLUMN IF NOT EXISTS models_run TEXT[]
+    """)
+    print("✅ models_run 컬럼 추가 완료 (실행한 모델 목록, 기존 행은 NULL = 두 모델 모두 실행)")
+
+    cur.execute("""
+        ALTER TABLE crop_analysis
+        ADD COLUMN IF NOT EXISTS skipped_ms REAL NOT NULL DEFAULT 0
+    """)
+    print("✅ skipped_ms 컬럼 추가 완료 (실행 정책으로 절약한 추론 시간)")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("💓 iot 테이블에 last_seen (마지막 heartbeat) 컬럼 추가 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        ALTER TABLE iot
+        ADD COLUMN IF NOT EXISTS last_seen TIMESTAMPTZ
+    """)
+    print("✅ last_seen 컬럼 추가 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+try:
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST'),
+        port=os.getenv('DB_PORT'),
+        database=os.getenv('DB_NAME'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD')
+    )
+
+    print("🌡️ sensor_log 테이블에 집계 컬럼 추가 중...")
+
+    cur = conn.cursor()
+
+    cur.execute("""
+        ALTER TABLE sensor_log
+        ADD COLUMN IF NOT EXISTS temperature_min FLOAT,
+        ADD COLUMN IF NOT EXISTS temperature_max FLOAT,
+        ADD COLUMN IF NOT EXISTS humidity_min FLOAT,
+        ADD COLUMN IF NOT EXISTS humidity_max FLOAT,
+        ADD COLUMN IF NOT EXISTS sample_count INTEGER,
+        ADD COLUMN IF NOT EXISTS iot_id INTEGER REFERENCES iot(id) ON DELETE SET NULL
+    """)
+    print("✅ 최소/최대/샘플 수, 디바이스(iot_id) 컬럼 추가 완료")
+
+    # 디바이스가 같은 배치를 다시 보내도 중복 저장하지 않도록 (기존 단건 레코드는 대상 아님)
+    # 한 온실에 센서 디바이스가 여러 대면 같은 집계 시각이 겹치므로 디바이스별로 구분
+    cur.execute("DROP INDEX IF EXISTS idx_sensor_log_aggregate")
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sensor_log_device_aggregate
+        ON sensor_log (gh_id, iot_id, timestamp)
+        WHERE sample_count IS NOT NULL
+    """)
+    print("✅ 디바이스별 집계 중복 방지 인덱스 생성 완료")
+
+    conn.commit()
+    conn.close()
+
+    print("🎉 테이블 업데이트 완료!")
+
+except Exception as e:
+    print(f"❌ 오류 발생: {e}")
+    import traceback
+    traceback.print_exc()
@@ -22,6 +22,10 @@ from routes.chart import chart_bp
 from routes.weather import weather_bp
 from routes.notification import notification_bp
 from routes.sensor import sensor_bp
+from routes.analysis import analysis_bp
+from routes.media import media_bp
+from routes.device import device_bp
+from utils.upload_stream import StreamingUploadRequest, MAX_UPLOAD_MB
 
 # PostgreSQL 연결 함수
 def get_db_connection():
@@ -43,6 +47,13 @@ def get_db_connection():
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key')
 
+# 업로드 스트리밍 설정 (파일 파트를 받는 즉시 해시·디스크 기록)
+app.request_class = StreamingUploadRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+# 프록시(nginx 등)가 X-Sendfile을 처리하는 환경이면 파일 전송을 위임
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+
 # 세션 설정 (CORS와 쿠키를 위한)
 app.config['SESSION_COOKIE_SECURE'] = True  # HTTPS에서만 쿠키 전송
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -91,12 +102,19 @@ app.register_blueprint(chart_bp)
 app.register_blueprint(weather_bp)
 app.register_blueprint(notification_bp)
 app.register_blueprint(sensor_bp)
+app.register_blueprint(analysis_bp)
+app.register_blueprint(media_bp)
+app.register_blueprint(device_bp)
 
 # 전역 오류 처리기 추가
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    return jsonify({'error': f'업로드 용량은 {MAX_UPLOAD_MB}MB를 넘을 수 없습니다.'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
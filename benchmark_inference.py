@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+분석 파이프라인 처리량/지연시간 벤치마크
+iot_camera_system.capture_image와 비슷한 합성 딸기 프레임을 iot_resolution 해상도별로 생성해
+디코딩 → 전처리 → 추론 → 집계 전체 경로를 백엔드 x 배치 크기 x 스레드 수 조합으로 측정합니다.
+조합마다 새 프로세스에서 모델을 로드하므로 peak_rss_mb는 조합끼리 비교할 수 있고,
+rss_delta_mb는 모델 로드/워밍업 이후 측정 구간 동안 늘어난 메모리입니다.
+
+사용 예: python benchmark_inference.py --backends pytorch onnx --batch-sizes 1 4 8 --threads 1 2 4 \\
+            --output bench_results.json --baseline bench_previous.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+
+import psutil
+import torch
+from PIL import Image, ImageDraw
+
+from utils.benchmark import percentile
+from utils.inference import analyze_batch, decode_image_bytes, StageTimer, INFERENCE_IMGSZ
+from utils.model_backends import BACKENDS, DEFAULT_BACKEND, MODEL_WEIGHTS, backend_model_path, load_model
+
+# docs/psql.txt의 iot_resolution ENUM과 동일
+RESOLUTIONS = ['640x480', '1280x720', '1920x1080']
+
+
+def generate_frame(resolution, seed):
+    """초록 배경에 익은(빨강)/안익은(연두) 딸기 모양을 그린 합성 JPEG 프레임"""
+    width, height = (int(v) for v in resolution.split('x'))
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height), color='green')
+    draw = ImageDraw.Draw(img)
+
+    radius = max(8, width // 26)
+    for _ in range(rng.randint(3, 8)):
+        x = rng.randint(0, width - radius * 2)
+        y = rng.randint(0, height - radius * 2)
+        color = rng.choice(['red', 'red', 'lightgreen'])
+        draw.ellipse([x, y, x + radius * 2, y + radius * 2], fill=color)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class PeakRSSSampler:
+    """측정 구간 동안 프로세스 RSS 최대값(MB)과 측정 시작 시점 대비 증가량 샘플링"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.baseline = 0
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.baseline = self.peak = self.process.memory_info().rss
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1)
+
+    @property
+    def delta_mb(self):
+        return round((self.peak - self.baseline) / (1024 * 1024), 1)
+
+
+def run_case(models, backend, frames, batch_size, threads, rounds):
+    """하나의 조합을 rounds번 반복 실행하고 요청(배치) 단위 지연시간과 처리량을 집계"""
+    torch.set_num_threads(threads)
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+
+    # 워밍업
+    analyze_batch([decode_image_bytes(frames[0])], models=models, backend=backend, max_batch=batch_size,
+                  policy='always')
+
+    latencies = []
+    timer = StageTimer()
+    with PeakRSSSampler() as rss:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for request_frames in batches:
+                request_start = time.perf_counter()
+                with timer.stage('decode'):
+                    images = [decode_image_bytes(data) for data in request_frames]
+                analyze_batch(images, timer, models=models, backend=backend, max_batch=batch_size,
+                              policy='always')
+                latencies.append((time.perf_counter() - request_start) * 1000)
+        elapsed = time.perf_counter() - start
+
+    total_images = len(frames) * rounds
+    return {
+        'images_per_sec': round(total_images / elapsed, 2),
+        'latency_ms_p50': round(percentile(latencies, 50), 2),
+        'latency_ms_p99': round(percentile(latencies, 99), 2),
+        'latency_ms_mean': round(statistics.mean(latencies), 2),
+        'peak_rss_mb': rss.peak_mb,
+        'rss_delta_mb': rss.delta_mb,
+        'stage_ms_per_image': {
+            name: round(elapsed_ms / total_images, 2) for name, elapsed_ms in timer.timings.items()
+        },
+    }
+
+
+def case_worker(case, frames, rounds):
+    """새 프로세스에서 모델을 조합의 스레드 수로 로드한 뒤 측정"""
+    backend, threads = case['backend'], case['threads']
+    model_ripe, loaded = load_model(MODEL_WEIGHTS['ripe'], backend, INFERENCE_IMGSZ, threads=threads)
+    model_rotten, _ = load_model(MODEL_WEIGHTS['rotten'], loaded, INFERENCE_IMGSZ, threads=threads)
+    return run_case((model_ripe, model_rotten), backend, frames, case['batch_size'], threads, rounds)
+
+
+def run_case_isolated(case, frames, rounds):
+    """
+    조합마다 새 프로세스에서 실행
+    이전 조합이 남긴 메모리나 다른 스레드 설정이 섞이지 않아 peak_rss_mb를 조합끼리 비교할 수 있음
+    """
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(case_worker, (case, frames, rounds))
+
+
+def case_key(case):
+    return f"{case['backend']}|{case['resolution']}|b{case['batch_size']}|t{case['threads']}"
+
+
+def compare_with_baseline(cases, baseline_path, tolerance):
+    """이전 결과 파일과 비교해 처리량 저하/지연시간 증가가 tolerance(%)를 넘는 조합 출력"""
+    with open(baseline_path, 'r') as f:
+        baseline = {case_key(case): case for case in json.load(f)['cases'] if 'error' not in case}
+
+    regressions = []
+    for case in cases:
+        previous = baseline.get(case_key(case))
+        if not previous or 'error' in case:
+            continue
+        ips_change = (case['images_per_sec'] - previous['images_per_sec']) / previous['images_per_sec'] * 100
+        p99_change = (case['latency_ms_p99'] - previous['latency_ms_p99']) / previous['latency_ms_p99'] * 100
+        print(f"   {case_key(case):<32} img/s {ips_change:+6.1f}%   p99 {p99_change:+6.1f}%")
+        if ips_change < -tolerance or p99_change > tolerance:
+            regressions.append(case_key(case))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="분석 파이프라인 벤치마크")
+    parser.add_argument('--backends', nargs='+', default=[DEFAULT_BACKEND], choices=list(BACKENDS))
+    parser.add_argument('--resolutions', nargs='+', default=RESOLUTIONS, choices=RESOLUTIONS)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--frames', type=int, default=16, help="해상도별 합성 프레임 수")
+    parser.add_argument('--rounds', type=int, default=3, help="조합별 반복 횟수")
+    parser.add_argument('--output', default="bench_results.json", help="결과 JSON 파일 경로")
+    parser.add_argument('--baseline', help="비교할 이전 결과 JSON 파일")
+    parser.add_argument('--tolerance', type=float, default=10.0, help="회귀로 판단할 변화율(%%)")
+    args = parser.parse_args()
+
+    frames = {
+        resolution: [generate_frame(resolution, seed) for seed in range(args.frames)]
+        for resolution in args.resolutions
+    }
+
+    cases = []
+    for backend in args.backends:
+        if not os.path.exists(backend_model_path(MODEL_WEIGHTS['ripe'], backend)):
+            print(f"❌ {backend} 변환 결과가 없어 건너뜁니다. export_models.py를 먼저 실행하세요.")
+            continue
+
+        for resolution in args.resolutions:
+            for batch_size in args.batch_sizes:
+                for threads in args.threads:
+                    case = {'backend': backend, 'resolution': resolution,
+                            'batch_size': batch_size, 'threads': threads}
+                    print(f"⏱️ {case_key(case)} 측정 중...")
+                    try:
+                        case.update(run_case_isolated(dict(case), frames[resolution], args.rounds))
+                        print(f"   {case['images_per_sec']} img/s, p50 {case['latency_ms_p50']}ms, "
+                              f"p99 {case['latency_ms_p99']}ms, RSS {case['peak_rss_mb']}MB "
+                              f"(+{case['rss_delta_mb']}MB)")
+                    except Exception as e:
+                        print(f"❌ 측정 실패: {e}")
+                        case['error'] = str(e)
+                    cases.append(case)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'host': {
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'torch': torch.__version__,
+        },
+        'imgsz': INFERENCE_IMGSZ,
+        'frames_per_resolution': args.frames,
+        'rounds': args.rounds,
+        'cases': cases,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"\n✅ 결과 저장: {args.output}")
+
+    if args.baseline:
+        print(f"\n📊 기준 결과와 비교: {args.baseline}")
+        regressions = compare_with_baseline(cases, args.baseline, args.tolerance)
+        if regressions:
+            print(f"❌ 성능 회귀 {len(regressions)}건 (허용 {args.tolerance}%)")
+            sys.exit(1)
+        print("✅ 성능 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+추론 프로파일(FP32/INT8, 입력 크기)별 지연시간, 처리량, FP32 대비 개수 일치율 측정
+사용 예: python benchmark_profiles.py samples/ --profiles fp32 fp32-320 int8 --output profile_report.json
+--policy fruit 로 실행하면 썩은 딸기 모델을 딸기가 검출된 이미지에만 실행했을 때의 속도/정확도를 측정합니다.
+
+samples/ 디렉토리에 labels.json이 있으면 정답 개수 대비 정확도도 함께 보고합니다.
+labels.json 형식: {"파일명.jpg": {"ripe": 3, "unripe": 1, "rotten": 0}, ...}
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from check_backend_parity import load_sample_images
+from utils.benchmark import percentile
+from utils.inference import analyze_batch, INFERENCE_MAX_BATCH
+from utils.model_backends import (
+    BACKENDS, DEFAULT_BACKEND, INFERENCE_PROFILES, BASELINE_PROFILE, MODEL_WEIGHTS,
+    load_model, resolve_profile
+)
+
+LABELS_FILE = "labels.json"
+
+
+def load_labels(image_dir):
+    path = os.path.join(image_dir, LABELS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def run_profile(profile, default_backend, images, policy='always'):
+    """프로파일 하나에 대해 단건 지연시간과 배치 처리량을 측정하고 이미지별 결과를 반환"""
+    backend, imgsz = resolve_profile(profile, default_backend)
+    model_ripe, loaded = load_model(MODEL_WEIGHTS['ripe'], backend, imgsz)
+    model_rotten, _ = load_model(MODEL_WEIGHTS['rotten'], loaded, imgsz)
+    if loaded != backend:
+        raise RuntimeError(f"{backend} 변환 결과가 없습니다. export_models.py를 먼저 실행하세요.")
+    models = (model_ripe, model_rotten)
+    frames = [image for _, image in images]
+
+    # 워밍업 (첫 호출의 그래프 초기화 비용 제외)
+    analyze_batch(frames[:1], models=models, backend=backend, imgsz=imgsz, policy=policy)
+
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        analyze_batch([frame], models=models, backend=backend, imgsz=imgsz, policy=policy)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    results = analyze_batch(frames, models=models, backend=backend, imgsz=imgsz, policy=policy)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'backend': backend,
+        'imgsz': imgsz,
+        'latency_ms_mean': round(statistics.mean(latencies), 2),
+        'latency_ms_p50': round(percentile(latencies, 50), 2),
+        'latency_ms_p99': round(percentile(latencies, 99), 2),
+        'throughput_ips': round(len(frames) / elapsed, 2),
+        'rotten_skipped': sum(1 for r in results if 'rotten' not in r['models_run']),
+    }, results
+
+
+def compare_counts(expected_list, actual_list):
+    """개수 완전 일치율(%)과 익은/안익은 개수 평균 절대 오차, 썩음 여부 일치율(%)"""
+    exact = 0
+    ripe_err = 0
+    unripe_err = 0
+    rotten_match = 0
+    for expected, actual in zip(expected_list, actual_list):
+        if expected['ripe'] == actual['ripe'] and expected['unripe'] == actual['unripe'] \
+                and bool(expected['has_rotten']) == actual['has_rotten']:
+            exact += 1
+        ripe_err += abs(expected['ripe'] - actual['ripe'])
+        unripe_err += abs(expected['unripe'] - actual['unripe'])
+        if bool(expected['has_rotten']) == actual['has_rotten']:
+            rotten_match += 1
+
+    n = len(actual_list)
+    return {
+        'exact_match_pct': round(exact / n * 100, 1),
+        'ripe_mae': round(ripe_err / n, 3),
+        'unripe_mae': round(unripe_err / n, 3),
+        'rotten_match_pct': round(rotten_match / n * 100, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추론 프로파일 벤치마크")
+    parser.add_argument('image_dir', help="샘플 이미지 디렉토리 (labels.json 선택)")
+    parser.add_argument('--profiles', nargs='+', default=list(INFERENCE_PROFILES), choices=list(INFERENCE_PROFILES))
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=list(BACKENDS),
+                        help="backend가 지정되지 않은 프로파일(fp32 계열)에 사용할 백엔드")
+    parser.add_argument('--limit', type=int, default=100, help="사용할 최대 이미지 수")
+    parser.add_argument('--policy', default='always', choices=('always', 'fruit'),
+                        help="모델 실행 정책 (직전 촬영 정보가 필요한 정책은 제외)")
+    parser.add_argument('--output', help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    images = load_sample_images(args.image_dir, args.limit)
+    if not images:
+        print(f"❌ 샘플 이미지가 없습니다: {args.image_dir}")
+        sys.exit(1)
+
+    labels = load_labels(args.image_dir)
+    labeled = None
+    if labels:
+        labeled = [(idx, {
+            'ripe': labels[name].get('ripe', 0),
+            'unripe': labels[name].get('unripe', 0),
+            'has_rotten': labels[name].get('rotten', 0) > 0
+        }) for idx, (name, _) in enumerate(images) if name in labels]
+        print(f"🏷️ 정답 라벨 {len(labeled)}/{len(images)}장")
+
+    profiles = [BASELINE_PROFILE] + [p for p in args.profiles if p != BASELINE_PROFILE]
+    report = {'images': len(images), 'batch_size': INFERENCE_MAX_BATCH, 'policy': args.policy, 'profiles': {}}
+    baseline_results = None
+
+    for profile in profiles:
+        print(f"⏱️ {profile} 측정 중...")
+        try:
+            summary, results = run_profile(profile, args.backend, images, args.policy)
+        except Exception as e:
+            print(f"❌ {profile}: 실행 실패 - {e}")
+            if profile == BASELINE_PROFILE:
+                sys.exit(1)
+            report['profiles'][profile] = {'error': str(e)}
+            continue
+
+        if profile == BASELINE_PROFILE:
+            baseline_results = results
+        summary['vs_fp32'] = compare_counts(baseline_results, results)
+        if labeled:
+            summary['vs_labels'] = compare_counts(
+                [label for _, label in labeled],
+                [results[idx] for idx, _ in labeled]
+            )
+        report['profiles'][profile] = summary
+
+    print(f"\n{'프로파일':<10} {'백엔드':<14} {'크기':>5} {'p50(ms)':>9} {'p99(ms)':>9} {'img/s':>8} {'FP32일치%':>10} {'라벨일치%':>10}")
+    for profile, summary in report['profiles'].items():
+        if 'error' in summary:
+            print(f"{profile:<10} 실패: {summary['error']}")
+            continue
+        label_pct = summary['vs_labels']['exact_match_pct'] if 'vs_labels' in summary else '-'
+        print(f"{profile:<10} {summary['backend']:<14} {summary['imgsz']:>5} {summary['latency_ms_p50']:>9} "
+              f"{summary['latency_ms_p99']:>9} {summary['throughput_ips']:>8} "
+              f"{summary['vs_fp32']['exact_match_pct']:>10} {label_pct:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\n✅ 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+변환된 추론 백엔드가 pytorch 원본과 같은 검출 개수를 내는지 샘플 이미지로 확인
+사용 예: python check_backend_parity.py static/uploads/crop_images --backends onnx openvino
+하나라도 개수가 다르면 종료 코드 1로 끝납니다.
+"""
+import argparse
+import glob
+import os
+import sys
+
+from utils.inference import analyze_batch, decode_image_bytes, INFERENCE_IMGSZ
+from utils.model_backends import BACKENDS, DEFAULT_BACKEND, MODEL_WEIGHTS, load_model
+from utils.renditions import is_rendition
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+COUNT_KEYS = ('ripe', 'unripe', 'total', 'rotten', 'has_rotten')
+
+
+def load_sample_images(image_dir, limit):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        # 해시 샤딩 디렉토리(ab/cd/...)까지 포함, 썸네일 등 파생본은 제외
+        paths.extend(glob.glob(os.path.join(image_dir, '**', pattern), recursive=True))
+    paths = sorted(path for path in set(paths) if not is_rendition(path))[:limit]
+
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), decode_image_bytes(f.read())))
+    return images
+
+
+def run_backend(backend, images):
+    model_ripe, loaded = load_model(MODEL_WEIGHTS['ripe'], backend, INFERENCE_IMGSZ)
+    model_rotten, _ = load_model(MODEL_WEIGHTS['rotten'], loaded, INFERENCE_IMGSZ)
+    if loaded != backend:
+        raise RuntimeError(f"{backend} 변환 결과가 없습니다. export_models.py를 먼저 실행하세요.")
+    return analyze_batch([image for _, image in images], models=(model_ripe, model_rotten), backend=backend,
+                         policy='always')
+
+
+def main():
+    export_targets = [name for name in BACKENDS if name != DEFAULT_BACKEND]
+    # INT8은 FP32와 개수가 정확히 같을 것으로 기대하지 않으므로 기본 대상에서 제외 (benchmark_profiles.py로 일치율 측정)
+    default_targets = [name for name in export_targets if not BACKENDS[name]['int8']]
+
+    parser = argparse.ArgumentParser(description="추론 백엔드 검출 개수 일치 확인")
+    parser.add_argument('image_dir', nargs='?', default="test_images", help="샘플 이미지 디렉토리")
+    parser.add_argument('--backends', nargs='+', default=default_targets, choices=export_targets)
+    parser.add_argument('--limit', type=int, default=50, help="사용할 최대 이미지 수")
+    args = parser.parse_args()
+
+    images = load_sample_images(args.image_dir, args.limit)
+    if not images:
+        print(f"❌ 샘플 이미지가 없습니다: {args.image_dir}")
+        sys.exit(1)
+
+    print(f"🔍 기준 백엔드({DEFAULT_BACKEND}) 분석: {len(images)}장")
+    baseline = run_backend(DEFAULT_BACKEND, images)
+
+    mismatched = False
+    for backend in args.backends:
+        try:
+            results = run_backend(backend, images)
+        except Exception as e:
+            print(f"❌ {backend}: 실행 실패 - {e}")
+            mismatched = True
+            continue
+
+        diffs = []
+        for (filename, _), expected, actual in zip(images, baseline, results):
+            if any(expected[key] != actual[key] for key in COUNT_KEYS):
+                diffs.append((filename, expected, actual))
+
+        if diffs:
+            mismatched = True
+            print(f"❌ {backend}: {len(diffs)}/{len(images)}장 검출 개수 불일치")
+            for filename, expected, actual in diffs:
+                print(f"   {filename}: 기준 {[expected[k] for k in COUNT_KEYS]} / {backend} {[actual[k] for k in COUNT_KEYS]}")
+        else:
+            print(f"✅ {backend}: {len(images)}장 모두 검출 개수 일치")
+
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
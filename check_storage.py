@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+파일 저장소 드라이버 동작 확인 (쓰기 / 멀티파트 업로드 / Range 읽기 / 삭제)
+사용 예 (로컬 MinIO):
+  docker run -p 9000:9000 -e MINIO_ROOT_USER=minio -e MINIO_ROOT_PASSWORD=minio123 minio/minio server /data
+  AWS_ACCESS_KEY_ID=minio AWS_SECRET_ACCESS_KEY=minio123 S3_ENDPOINT_URL=http://localhost:9000 \\
+      python check_storage.py --backend s3 --create-bucket
+하나라도 실패하면 종료 코드 1로 끝납니다.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import uuid
+
+from utils.storage import STORAGE_DRIVERS, StorageNotFound, S3_MULTIPART_MB, create_storage
+
+
+def check(label, condition):
+    print(f"{'✅' if condition else '❌'} {label}")
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description="파일 저장소 드라이버 점검")
+    parser.add_argument('--backend', choices=list(STORAGE_DRIVERS), default='local')
+    parser.add_argument('--create-bucket', action='store_true', help="S3 버킷이 없으면 생성 (MinIO 테스트용)")
+    args = parser.parse_args()
+
+    storage = create_storage(args.backend)
+    if args.create_bucket and args.backend == 's3':
+        existing = [bucket['Name'] for bucket in storage.client.list_buckets().get('Buckets', [])]
+        if storage.bucket not in existing:
+            storage.client.create_bucket(Bucket=storage.bucket)
+            print(f"🪣 버킷 생성: {storage.bucket}")
+
+    prefix = f"storage_check/{uuid.uuid4().hex[:8]}"
+    small = os.urandom(1000)
+    # 멀티파트 기준보다 큰 파일로 청크 분할 업로드 경로 확인
+    large = os.urandom(S3_MULTIPART_MB * 1024 * 1024 + 12345)
+    ok = True
+
+    try:
+        storage.put_bytes(f"{prefix}/small.bin", small, 'application/octet-stream')
+        ok &= check("put_bytes / read", storage.read(f"{prefix}/small.bin") == small)
+        ok &= check("size", storage.size(f"{prefix}/small.bin") == len(small))
+        ok &= check("read_range", storage.read_range(f"{prefix}/small.bin", 100, 250) == small[100:250])
+        ok &= check("iter_chunks (범위)", b''.join(storage.iter_chunks(f"{prefix}/small.bin", 10, 900)) == small[10:900])
+
+        storage.put_fileobj(f"{prefix}/large.bin", io.BytesIO(large))
+        ok &= check("put_fileobj (멀티파트)", storage.size(f"{prefix}/large.bin") == len(large))
+        ok &= check("read_range (끝부분)", storage.read_range(f"{prefix}/large.bin", len(large) - 500, len(large)) == large[-500:])
+
+        fd, tmp_path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(large)
+        storage.put_file(f"{prefix}/moved.bin", tmp_path, move=True)
+        ok &= check("put_file(move=True)", not os.path.exists(tmp_path) and storage.exists(f"{prefix}/moved.bin"))
+
+        try:
+            storage.read(f"{prefix}/missing.bin")
+            ok &= check("없는 키 → StorageNotFound", False)
+        except StorageNotFound:
+            ok &= check("없는 키 → StorageNotFound", True)
+    finally:
+        for name in ('small.bin', 'large.bin', 'moved.bin'):
+            storage.delete(f"{prefix}/{name}")
+
+    ok &= check("delete", not storage.exists(f"{prefix}/small.bin"))
+
+    print("🎉 저장소 점검 통과" if ok else "❌ 저장소 점검 실패")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
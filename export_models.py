@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+YOLO 가중치(.pt)를 CPU 추론 백엔드 형식으로 변환
+사용 예: python export_models.py onnx openvino torchscript --imgsz 640
+INT8: python export_models.py openvino_int8 --data strawberry.yaml (보정용 데이터셋 필요)
+엣지(라즈베리파이)용: python export_models.py --edge onnx_int8 --imgsz 320
+변환 후 .env에 INFERENCE_BACKEND=onnx 처럼 지정하면 서버가 해당 형식을 사용합니다.
+"""
+import argparse
+import sys
+
+from utils.model_backends import (BACKENDS, DEFAULT_BACKEND, EDGE_TARGETS, MODEL_WEIGHTS, export_model,
+                                  export_edge_model)
+
+
+def export_edge(target, imgsz, data):
+    failed = False
+    for name, weights_path in MODEL_WEIGHTS.items():
+        print(f"📦 {name} 모델 → 엣지 {target} 변환 중... ({weights_path}, 입력 {imgsz})")
+        try:
+            output_path = export_edge_model(weights_path, target, imgsz=imgsz, data=data)
+            print(f"✅ 변환 완료: {output_path} (라즈베리파이로 복사 후 EDGE_MODEL_{name.upper()}에 지정)")
+        except Exception as e:
+            print(f"❌ 변환 실패 ({name}, {target}): {e}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    export_targets = [name for name in BACKENDS if name != DEFAULT_BACKEND]
+
+    parser = argparse.ArgumentParser(description="YOLO 모델 백엔드 변환")
+    parser.add_argument('backends', nargs='*', default=export_targets, choices=export_targets,
+                        help="변환할 백엔드 (기본값: 전체)")
+    parser.add_argument('--imgsz', type=int, default=640, help="모델 입력 크기 (INFERENCE_IMGSZ와 동일하게)")
+    parser.add_argument('--batch', type=int, default=8, help="동적 배치 최대 크기 (INFERENCE_MAX_BATCH와 동일하게)")
+    parser.add_argument('--data', help="INT8 양자화 보정용 데이터셋 yaml")
+    parser.add_argument('--edge', choices=list(EDGE_TARGETS),
+                        help="디바이스 엣지 추론용 모델만 변환 (EDGE_INFERENCE 모드)")
+    args = parser.parse_args()
+
+    if args.edge:
+        export_edge(args.edge, args.imgsz, args.data)
+        return
+
+    failed = False
+    for backend in args.backends:
+        if BACKENDS[backend]['int8'] and not args.data:
+            print(f"⚠️ {backend}: --data 보정용 데이터셋이 없어 건너뜁니다.")
+            continue
+        for name, weights_path in MODEL_WEIGHTS.items():
+            print(f"📦 {name} 모델 → {backend} 변환 중... ({weights_path})")
+            try:
+                output_path = export_model(weights_path, backend, imgsz=args.imgsz, batch=args.batch, data=args.data)
+                print(f"✅ 변환 완료: {output_path}")
+            except Exception as e:
+                print(f"❌ 변환 실패 ({name}, {backend}): {e}")
+                failed = True
+
+    if failed:
+        sys.exit(1)
+    print("🎉 모델 변환 완료! check_backend_parity.py로 결과 일치 여부를 확인하세요.")
+
+
+if __name__ == "__main__":
+    main()
@@ -987,7 +987,7 @@ function FarmDetail() {
                                 📸 촬영 이미지
                               </h4>
                               <img
-                                src={`${API_BASE_URL}/static/uploads/crop_images/${selectedBar.group.last_image_path}`}
+                                src={`${API_BASE_URL}/api/media/crop-images/${selectedBar.group.last_image_path}?size=preview`}
                                 alt="분석 이미지"
                                 style={{
                                   width: "100%",
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+작물 촬영 이미지 보존 정책 적용 (가비지 컬렉션)
+  - crop_groups.last_image_path 가 가리키는 이미지는 절대 삭제하지 않음
+  - 그룹별 최근 N장, 썩은 딸기가 검출된 이미지는 원본 보존
+  - 그 외 오래된 이미지는 썸네일만 남기고 원본/미리보기 삭제 (--downsample-days)
+  - 더 오래된 이미지는 썸네일까지 삭제 (--delete-days, 0이면 사용 안 함)
+  - IoT 로컬 촬영 폴더(test_images 등)의 오래된 파일 삭제 (--scratch-dir)
+정해진 개수씩 나눠 처리하고 배치마다 커밋하므로 이미지가 많아도 메모리 사용량이 일정합니다.
+사용 예: python gc_crop_images.py --keep-latest 20 --downsample-days 30 --delete-days 365 --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+
+from utils.database import get_db_connection
+from utils.image_store import IMAGE_STORE_DIR, blob_key, lock_blob
+from utils.renditions import (RENDITIONS, RENDITION_FORMATS, DOWNSAMPLED_RENDITION, PIL_AVAILABLE,
+                              is_rendition, rendition_path, create_rendition)
+from utils.storage import STORAGE, StorageNotFound
+
+
+class GCReport:
+    def __init__(self):
+        self.downsampled = 0
+        self.deleted = 0
+        self.files_removed = 0
+        self.bytes_reclaimed = 0
+        self.skipped = 0
+
+    def summary(self):
+        return (f"다운샘플 {self.downsampled}건, 삭제 {self.deleted}건, 재확인 후 건너뜀 {self.skipped}건, "
+                f"파일 {self.files_removed}개, "
+                f"회수 {self.bytes_reclaimed / (1024 * 1024):.1f}MB")
+
+
+def remove_key(key, report, dry_run):
+    """저장소 키 하나 삭제 후 회수한 바이트 수 기록 (없는 키는 무시)"""
+    try:
+        size = STORAGE.size(key)
+    except StorageNotFound:
+        return
+    if not dry_run:
+        STORAGE.delete(key)
+    report.files_removed += 1
+    report.bytes_reclaimed += size
+
+
+def rendition_keys(original_key, keep_thumb):
+    keys = []
+    for name in RENDITIONS:
+        for fmt in RENDITION_FORMATS:
+            if keep_thumb and (name, fmt) == DOWNSAMPLED_RENDITION:
+                continue
+            keys.append(rendition_path(original_key, name, fmt))
+    return keys
+
+
+def downsample(original_key, report, dry_run):
+    """썸네일을 확보한 뒤 원본과 나머지 파생본 삭제 (썸네일을 만들 수 없으면 아무것도 지우지 않음)"""
+    thumb_key = rendition_path(original_key, *DOWNSAMPLED_RENDITION)
+    if not STORAGE.exists(thumb_key):
+        if not PIL_AVAILABLE:
+            return False
+        try:
+            if not dry_run:
+                create_rendition(original_key, *DOWNSAMPLED_RENDITION)
+        except Exception as e:
+            print(f"⚠️ 썸네일 생성 실패, 건너뜀 ({original_key}): {e}")
+            return False
+
+    for key in [original_key] + rendition_keys(original_key, keep_thumb=True):
+        remove_key(key, report, dry_run)
+    report.downsampled += 1
+    return True
+
+
+def delete_all(original_key, report, dry_run):
+    for key in [original_key] + rendition_keys(original_key, keep_thumb=False):
+        remove_key(key, report, dry_run)
+    report.deleted += 1
+
+
+def build_protected_table(cur, keep_latest, keep_rotten):
+    """보존 대상 ref를 임시 테이블로 한 번만 계산 (배치마다 윈도 함수를 다시 돌리지 않음)"""
+    cur.execute("""
+        CREATE TEMP TABLE gc_protected ON COMMIT PRESERVE ROWS AS
+        SELECT DISTINCT image_path AS ref
+        FROM (
+            SELECT image_path, rotten,
+                   ROW_NUMBER() OVER (PARTITION BY group_id ORDER BY captured_at DESC) AS rn
+            FROM crop_analysis
+            WHERE image_path IS NOT NULL
+        ) ranked
+        WHERE rn <= %s OR (%s AND rotten > 0)
+    """, (keep_latest, keep_rotten))
+    cur.execute("CREATE INDEX ON gc_protected (ref)")
+    cur.execute("SELECT COUNT(*) FROM gc_protected")
+    return cur.fetchone()[0]
+
+
+def fetch_candidates(cur, after, days, batch_size, only_original):
+    """
+    모든 ref가 보존 대상이 아니고 days일보다 오래된 blob을 sha256 순으로 batch_size개 조회
+    (같은 내용을 여러 ref가 공유하므로 blob 단위로 판단, crop_groups 참조는 매번 최신 상태로 확인)
+    """
+    cur.execute(f"""
+        SELECT sha256, ext, array_agg(ref)
+        FROM (
+            SELECT r.sha256, r.ext, r.ref, r.created_at, r.downsampled_at,
+                   EXISTS (SELECT 1 FROM gc_protected p WHERE p.ref = r.ref)
+                   OR EXISTS (SELECT 1 FROM crop_groups cg WHERE cg.last_image_path = r.ref) AS protected
+            FROM image_refs r
+            WHERE (r.sha256, r.ext) > (%s, %s)
+        ) refs
+        GROUP BY sha256, ext
+        HAVING MAX(created_at) < NOW() - (%s * INTERVAL '1 day')
+           AND NOT bool_or(protected)
+           {'AND bool_or(downsampled_at IS NULL)' if only_original else ''}
+        ORDER BY sha256, ext
+        LIMIT %s
+    """, (after[0], after[1], days, batch_size))
+    return cur.fetchall()
+
+
+def still_collectable(cur, sha256, ext, refs):
+    """
+    lock_blob 이후 다시 확인: 후보 조회 뒤 같은 blob으로 중복 제거된 새 ref가 등록되었거나
+    crop_groups.last_image_path 가 된 ref가 있으면 건너뜀
+    """
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM image_refs r
+            WHERE r.sha256 = %s AND r.ext = %s
+              AND (r.ref <> ALL(%s)
+                   OR EXISTS (SELECT 1 FROM crop_groups cg WHERE cg.last_image_path = r.ref))
+        )
+    """, (sha256, ext, refs))
+    return not cur.fetchone()[0]
+
+
+def process_blobs(conn, days, action, args, report):
+    """image_refs 인덱스에 등록된 blob에 정책 적용 (downsample / delete)"""
+    after = ('', '')
+    while True:
+        with conn.cursor() as cur:
+            rows = fetch_candidates(cur, after, days, args.batch_size, only_original=(action == 'downsample'))
+            if not rows:
+                break
+
+            for sha256, ext, refs in rows:
+                key = blob_key(sha256, ext)
+                # 잠금은 배치 커밋까지 유지 → 그동안 이 blob으로 중복 제거하는 업로드는 대기 후 blob을 복구
+                lock_blob(cur, sha256)
+                if not still_collectable(cur, sha256, ext, refs):
+                    report.skipped += 1
+                    continue
+                if action == 'downsample':
+                    if downsample(key, report, args.dry_run) and not args.dry_run:
+                        cur.execute("UPDATE image_refs SET downsampled_at = NOW() "
+                                    "WHERE sha256 = %s AND ext = %s AND ref = ANY(%s)", (sha256, ext, refs))
+                else:
+                    delete_all(key, report, args.dry_run)
+                    if not args.dry_run:
+                        cur.execute("UPDATE crop_analysis SET image_path = NULL WHERE image_path = ANY(%s)", (refs,))
+                        cur.execute("DELETE FROM image_refs WHERE sha256 = %s AND ext = %s AND ref = ANY(%s)",
+                                    (sha256, ext, refs))
+
+            after = (rows[-1][0], rows[-1][1])
+        conn.commit()
+        print(f"  … {action} 진행 중: {report.summary()}")
+
+
+def process_legacy_files(conn, args, report):
+    """image_refs 도입 전 평면 구조로 저장된 이미지 (로컬 저장소만 해당)"""
+    root = STORAGE.local_path(IMAGE_STORE_DIR)
+    if root is None or not os.path.isdir(root):
+        return
+
+    now = time.time()
+    batch = []
+
+    def flush():
+        with conn.cursor() as cur:
+            names = [entry.name for entry in batch]
+            cur.execute("""
+                SELECT ref FROM gc_protected WHERE ref = ANY(%s)
+                UNION
+                SELECT last_image_path FROM crop_groups WHERE last_image_path = ANY(%s)
+            """, (names, names))
+            protected = {row[0] for row in cur.fetchall()}
+
+        for entry in batch:
+            if entry.name in protected:
+                continue
+            key = f"{IMAGE_STORE_DIR}/{entry.name}"
+            age_days = (now - entry.stat().st_mtime) / 86400
+            if args.delete_days and age_days > args.delete_days:
+                delete_all(key, report, args.dry_run)
+            elif age_days > args.downsample_days:
+                downsample(key, report, args.dry_run)
+        batch.clear()
+
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name.endswith('.tmp') or is_rendition(entry.name):
+                continue
+            batch.append(entry)
+            if len(batch) >= args.batch_size:
+                flush()
+    if batch:
+        flush()
+
+
+def process_scratch_dir(path, max_age_days, report, dry_run):
+    """IoT 로컬 촬영 폴더의 오래된 파일 삭제 (이미 서버로 업로드된 사본)"""
+    if not os.path.isdir(path):
+        return
+    cutoff = time.time() - max_age_days * 86400
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                size = entry.stat().st_size
+                if not dry_run:
+                    os.remove(entry.path)
+                report.files_removed += 1
+                report.bytes_reclaimed += size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="작물 촬영 이미지 보존 정책 적용")
+    parser.add_argument('--keep-latest', type=int, default=20, help="그룹별로 원본을 보존할 최근 촬영 수")
+    parser.add_argument('--no-keep-rotten', dest='keep_rotten', action='store_false',
+                        help="썩은 딸기가 검출된 이미지도 정책 대상에 포함")
+    parser.add_argument('--downsample-days', type=int, default=30, help="이 기간이 지난 이미지는 썸네일만 남김")
+    parser.add_argument('--delete-days', type=int, default=0, help="이 기간이 지난 이미지는 썸네일까지 삭제 (0: 사용 안 함)")
+    parser.add_argument('--scratch-dir', action='append', default=[], help="오래된 파일을 삭제할 IoT 로컬 촬영 폴더")
+    parser.add_argument('--scratch-days', type=int, default=7, help="--scratch-dir 파일 보존 기간")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help="삭제하지 않고 회수 가능한 용량만 보고")
+    args = parser.parse_args()
+
+    if args.delete_days and args.delete_days <= args.downsample_days:
+        parser.error("--delete-days는 --downsample-days보다 커야 합니다.")
+    if not PIL_AVAILABLE:
+        print("⚠️ Pillow가 없어 썸네일이 없는 이미지는 다운샘플하지 않습니다.")
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit(1)
+
+    report = GCReport()
+    started = time.time()
+    try:
+        with conn.cursor() as cur:
+            protected = build_protected_table(cur, args.keep_latest, args.keep_rotten)
+        conn.commit()
+        print(f"🛡️ 보존 대상 이미지: {protected}건 (그룹별 최근 {args.keep_latest}장"
+              f"{', 썩은 딸기 검출' if args.keep_rotten else ''}) + 그룹 대표 이미지")
+
+        if args.delete_days:
+            process_blobs(conn, args.delete_days, 'delete', args, report)
+        process_blobs(conn, args.downsample_days, 'downsample', args, report)
+        process_legacy_files(conn, args, report)
+        conn.commit()
+
+        for path in args.scratch_dir:
+            process_scratch_dir(path, args.scratch_days, report, args.dry_run)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ 오류 발생: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    prefix = "🔍 (dry-run) 회수 가능" if args.dry_run else "🧹 정리 완료"
+    print(f"{prefix}: {report.summary()} ({time.time() - started:.1f}초)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+# 운영 서버 설정: gunicorn -c gunicorn.conf.py app:app
+#
+# - preload_app: 마스터에서 앱(YOLO 모델 포함)을 한 번만 로드한 뒤 fork
+#   → 워커들이 모델 메모리 페이지를 copy-on-write로 공유
+# - post_fork: 워커별 torch intra/inter-op 스레드 수를 (코어 수 / 워커 수)로 제한
+#   → 여러 워커가 동시에 추론할 때 CPU 과다 구독 방지
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5001)}"
+
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# 워커 내 동시 요청은 스레드로 처리 (IoT 업로드 마이크로 배치가 모일 수 있도록)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+# YOLO 분석 시간을 고려한 요청 타임아웃
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+preload_app = True
+
+
+def worker_torch_threads():
+    cpu_count = os.cpu_count() or 1
+    return int(os.getenv('TORCH_INTRA_OP_THREADS', max(1, cpu_count // workers)))
+
+
+def when_ready(server):
+    # 마스터에서 로드된 객체를 GC 추적 대상에서 제외 (참조 카운트 갱신에 의한 페이지 복사 최소화)
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"모델 사전 로드 완료, 워커 {workers}개 x 스레드 {threads}개로 fork")
+
+
+def post_fork(server, worker):
+    from utils.inference import configure_torch_threads
+
+    intra_op = worker_torch_threads()
+    inter_op = int(os.getenv('TORCH_INTER_OP_THREADS', 1))
+    configure_torch_threads(intra_op, inter_op)
+    server.log.info(f"워커 {worker.pid}: torch intra-op {intra_op}, inter-op {inter_op} 스레드")
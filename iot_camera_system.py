@@ -8,10 +8,24 @@ import os
 import time
 import requests
 import glob
-from datetime import datetime
+import heapq
+import queue
+import random
+import shutil
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
 from flask import Flask, request, jsonify
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 import threading
 import json
+from iot_sensor_buffer import SensorBuffer
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
 
 # --- 설정 ---
 # 로컬 테스트용 이미지 디렉토리
@@ -24,24 +38,56 @@ SERVER_BASE_URL = "http://165.229.229.242:5001"
 # SERVER_BASE_URL = "https://smart-farm-ignore.onrender.com"
 
 IMAGE_UPLOAD_URL = f"{SERVER_BASE_URL}/api/greenhouses/iot-image-upload"
-SENSOR_UPLOAD_URL = f"{SERVER_BASE_URL}/api/sensor/upload"
+SENSOR_UPLOAD_URL = f"{SERVER_BASE_URL}/product/upload-sensor/batch"
+
+# 이 디바이스의 IoT ID (iot 테이블의 id)
+IOT_ID = int(os.getenv('IOT_ID', 1))
+# 명령 수신 방식 (서버의 COMMAND_DELIVERY와 같게 설정)
+#   push: 서버가 5002 포트의 /capture-command 로 전송 (서버에서 Pi로 접속 가능해야 함, 기본값)
+#   pull: Pi가 서버에 long-poll 요청을 열어 두고 명령을 가져감 (NAT/방화벽 뒤에서도 동작)
+COMMAND_MODE = os.getenv('COMMAND_MODE', 'push')
+COMMAND_POLL_URL = f"{SERVER_BASE_URL}/api/devices/{IOT_ID}/commands"
+# 서버가 명령 없이 응답을 보류하는 최대 시간 (초)
+COMMAND_POLL_WAIT = 30
+# push 방식일 때 접속 상태 알림 주기 (초, pull 방식은 명령 요청이 heartbeat 역할)
+HEARTBEAT_URL = f"{SERVER_BASE_URL}/api/devices/{IOT_ID}/heartbeat"
+HEARTBEAT_INTERVAL = 30
 
-MAX_IMAGES_TO_UPLOAD_PER_CYCLE = 6
-processed_files = set()
+# 업로드 대기 이미지를 보관하는 폴더 (재시작해도 남은 업로드를 이어서 처리)
+UPLOAD_QUEUE_DIR = os.getenv('UPLOAD_QUEUE_DIR', 'upload_queue')
+# 동시에 업로드할 이미지 수 (Pi의 업링크 대역폭에 맞게 조정)
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 3))
+# 재시도 간격: UPLOAD_BACKOFF_BASE * 2^시도횟수 (최대 UPLOAD_BACKOFF_MAX초) 범위에서 무작위
+UPLOAD_BACKOFF_BASE = 1
+UPLOAD_BACKOFF_MAX = 60
+# 업로드 중 예기치 않은 오류(파일 손상/디스크 오류 등)가 이 횟수만큼 반복되면 failed 폴더로 옮김
+# (네트워크 오류/5xx/429 재시도는 횟수 제한 없음)
+UPLOAD_MAX_ERRORS = int(os.getenv('UPLOAD_MAX_ERRORS', 5))
+# 촬영 명령 처리 시 업로드 결과를 기다리는 최대 시간 (초)
+UPLOAD_RESULT_WAIT = 30
+UPLOAD_OK, UPLOAD_RETRY, UPLOAD_FAILED = 'ok', 'retry', 'failed'
+# inotify를 쓸 수 없을 때 이미지 폴더 스캔 주기 (초)
+IMAGE_POLL_INTERVAL = 5
+# 최근 처리한 파일 기록 최대 개수 (오래된 것부터 삭제, 장기 실행 시 메모리 고정)
+PROCESSED_INDEX_MAX = 4096
 
 # Flask 앱 (명령 수신용)
 app = Flask(__name__)
 
 # --- 카메라 촬영 함수 ---
-def capture_image(group_id, iot_id):
+def capture_path(group_id, iot_id):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(IMAGE_DIR, f"iot_{iot_id}_group_{group_id}_{timestamp}.jpg")
+
+
+def capture_image(group_id, iot_id, filepath=None):
     """
     카메라로 이미지 촬영
     실제 환경에서는 Raspberry Pi 카메라 모듈 사용
     """
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"iot_{iot_id}_group_{group_id}_{timestamp}.jpg"
-        filepath = os.path.join(IMAGE_DIR, filename)
+        filepath = filepath or capture_path(group_id, iot_id)
+        filename = os.path.basename(filepath)
         
         # 실제 카메라 촬영 명령 (예시)
         # import picamera
@@ -66,80 +112,259 @@ def capture_image(group_id, iot_id):
         print(f"❌ 이미지 촬영 실패: {e}")
         return None
 
-# --- 이미지 업로드 함수 ---
-def upload_image(filepath, group_id, iot_id):
-    """지정된 경로의 이미지를 서버로 업로드합니다."""
+# --- 이미지 업로드 파이프라인 ---
+class UploadPipeline:
+    """
+    촬영 이미지를 디스크 큐(UPLOAD_QUEUE_DIR)에 넣고 워커 스레드들이 병렬로 업로드
+      - keep-alive 세션을 재사용해 파일마다 TCP/TLS 연결을 새로 맺지 않음
+      - 네트워크 오류/5xx/429는 지수 백오프 + 지터로 재시도 (무제한, 최대 UPLOAD_BACKOFF_MAX초 간격)
+      - 예기치 않은 오류는 UPLOAD_MAX_ERRORS회까지만 재시도한 뒤 failed 폴더로 옮김
+      - 큐는 이미지 + 메타데이터(.json) 파일이므로 재시작해도 남은 업로드를 이어서 처리
+    """
+
+    def __init__(self, queue_dir=UPLOAD_QUEUE_DIR, workers=UPLOAD_WORKERS):
+        self.queue_dir = queue_dir
+        self.failed_dir = os.path.join(queue_dir, 'failed')
+        self.workers = workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.ready = queue.Queue()
+        self.delayed = []
+        self.condition = threading.Condition()
+        self.futures = {}
+        self.started = False
+
+    def start(self):
+        """디스크 큐에 남아 있는 항목을 다시 넣고 워커 시작"""
+        if self.started:
+            return
+        self.started = True
+        os.makedirs(self.failed_dir, exist_ok=True)
+        recovered = 0
+        for meta_path in sorted(glob.glob(os.path.join(self.queue_dir, '*.json'))):
+            image_path = meta_path[:-len('.json')]
+            if not os.path.exists(image_path):
+                os.remove(meta_path)
+                continue
+            self.ready.put(image_path)
+            recovered += 1
+        if recovered:
+            print(f"♻️ 업로드 큐 복구: {recovered}건")
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+        threading.Thread(target=self._scheduler, daemon=True).start()
+
+    def submit(self, filepath, group_id, iot_id):
+        """이미지를 큐 폴더로 옮기고 업로드 예약, 업로드 결과(True/False)를 담을 Future 반환"""
+        self.start()
+        entry = os.path.join(self.queue_dir, f"{time.time_ns()}_{os.path.basename(filepath)}")
+        meta = {'group_id': group_id, 'iot_id': iot_id, 'attempts': 0}
+        # 메타데이터를 먼저 기록 (이미지 이동 전에 종료되면 복구 시 메타데이터만 정리됨)
+        self._write_meta(entry, meta)
+        try:
+            shutil.move(filepath, entry)
+        except FileNotFoundError:
+            os.remove(f"{entry}.json")
+            raise
+        future = Future()
+        self.futures[entry] = future
+        self.ready.put(entry)
+        return future
+
+    def pending(self):
+        with self.condition:
+            return self.ready.qsize() + len(self.delayed)
+
+    def _write_meta(self, entry, meta):
+        tmp_path = f"{entry}.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, f"{entry}.json")
+
+    def _scheduler(self):
+        """백오프 시간이 지난 재시도 항목을 다시 업로드 큐로"""
+        while True:
+            with self.condition:
+                while not self.delayed:
+                    self.condition.wait()
+                due, entry = self.delayed[0]
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                heapq.heappop(self.delayed)
+            self.ready.put(entry)
+
+    def _worker(self):
+        while True:
+            entry = self.ready.get()
+            try:
+                self._process(entry)
+            except Exception as e:
+                print(f"❌ 업로드 워커 오류: {os.path.basename(entry)} - {e}")
+                # 시도 횟수/백오프가 초기화되지 않도록 사이드카의 메타데이터를 다시 읽어 이어감
+                meta = self._read_meta(entry)
+                meta['errors'] = meta.get('errors', 0) + 1
+                if meta['errors'] >= UPLOAD_MAX_ERRORS:
+                    print(f"🚫 업로드 오류 {meta['errors']}회, failed 폴더로 이동: {os.path.basename(entry)}")
+                    try:
+                        self._write_meta(entry, meta)
+                    except OSError:
+                        pass
+                    self._move_failed(entry)
+                else:
+                    self._retry(entry, meta)
+
+    def _read_meta(self, entry):
+        try:
+            with open(f"{entry}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            meta = {'attempts': 0}
+            meta.update(parse_image_filename(entry))
+            return meta
+
+    def _process(self, entry):
+        meta = self._read_meta(entry)
+        result = upload_image(entry, meta.get('group_id'), meta.get('iot_id'), self.session)
+        if result == UPLOAD_OK:
+            self._finish(entry, True)
+        elif result == UPLOAD_RETRY:
+            self._retry(entry, meta)
+        else:
+            # 서버가 거부한 이미지(4xx)는 재시도해도 같으므로 failed 폴더로 옮겨 둠
+            self._move_failed(entry)
+
+    def _move_failed(self, entry):
+        for path in (entry, f"{entry}.json"):
+            try:
+                if os.path.exists(path):
+                    shutil.move(path, os.path.join(self.failed_dir, os.path.basename(path)))
+            except OSError as e:
+                print(f"⚠️ failed 폴더 이동 실패: {os.path.basename(path)} - {e}")
+        self._finish(entry, False, remove=False)
+
+    def _retry(self, entry, meta):
+        meta['attempts'] = meta.get('attempts', 0) + 1
+        try:
+            self._write_meta(entry, meta)
+        except OSError:
+            pass
+        # full jitter: 여러 디바이스/워커가 동시에 재접속하지 않도록 0~상한 사이에서 무작위
+        delay = random.uniform(0, min(UPLOAD_BACKOFF_MAX, UPLOAD_BACKOFF_BASE * 2 ** meta['attempts']))
+        print(f"🔁 업로드 재시도 예약 ({meta['attempts']}회차, {delay:.1f}초 후): {os.path.basename(entry)}")
+        with self.condition:
+            heapq.heappush(self.delayed, (time.monotonic() + delay, entry))
+            self.condition.notify()
+
+    def _finish(self, entry, success, remove=True):
+        if remove:
+            for path in (entry, f"{entry}.json"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        future = self.futures.pop(entry, None)
+        if future is not None:
+            future.set_result(success)
+
+
+def parse_image_filename(filepath):
+    """파일명(iot_{iot_id}_group_{group_id}_{timestamp}.jpg)에서 ID 추출, 규칙에 맞지 않으면 기본값"""
+    parts = os.path.basename(filepath).split('_')
+    if 'iot' in parts:
+        i = parts.index('iot')
+        if len(parts) > i + 3 and parts[i + 2] == 'group':
+            return {'iot_id': parts[i + 1], 'group_id': parts[i + 3]}
+    return {'iot_id': "1", 'group_id': "1"}
+
+
+def upload_image(filepath, group_id, iot_id, session):
+    """지정된 경로의 이미지를 서버로 업로드 (UPLOAD_OK / UPLOAD_RETRY / UPLOAD_FAILED 반환)"""
     filename = os.path.basename(filepath)
     
-    # 파일이 완전히 기록될 때까지 대기
-    time.sleep(0.1)
-    
     try:
         # 파일 유효성 검사
         if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-            print(f"⚠️ 파일이 준비되지 않았거나 비어 있습니다: {filename}")
-            return False
+            print(f"⚠️ 파일이 비어 있거나 없습니다: {filename}")
+            return UPLOAD_FAILED
         
         with open(filepath, "rb") as img_file:
             files = {"file": (filename, img_file, "image/jpeg")}
             data = {
                 "group_id": group_id,
-                "iot_id": iot_id
+                "iot_id": iot_id,
+                # 대기열에서 재시도하다 늦게 올라가도 서버가 실제 촬영 시각으로 기록하도록
+                "captured_at": datetime.fromtimestamp(os.path.getmtime(filepath), timezone.utc).isoformat()
             }
             
-            res = requests.post(
+            res = session.post(
                 IMAGE_UPLOAD_URL,
                 files=files,
                 data=data,
-                timeout=30  # YOLO 분석 시간 고려
+                timeout=(5, 30)  # YOLO 분석 시간 고려
             )
-            res.raise_for_status()
-            
-            result = res.json()
-            print(f"✅ 이미지 업로드 및 분석 성공: {filename}")
-            print(f"📊 분석 결과: {result.get('result', {})}")
-            return True
+        if res.status_code == 429 or res.status_code >= 500:
+            print(f"⚠️ 서버 일시 오류 ({res.status_code}): {filename}")
+            return UPLOAD_RETRY
+        if res.status_code >= 400:
+            print(f"❌ 서버가 업로드를 거부함 ({res.status_code}): {filename} - {res.text[:200]}")
+            return UPLOAD_FAILED
+
+        result = res.json()
+        print(f"✅ 이미지 업로드 및 분석 성공: {filename}")
+        print(f"📊 분석 결과: {result.get('result', {})}")
+        return UPLOAD_OK
             
     except requests.exceptions.RequestException as e:
         print(f"❌ 이미지 업로드 실패: {filename} - {e}")
-        return False
+        return UPLOAD_RETRY
     except Exception as e:
         print(f"❌ 알 수 없는 오류: {filename} - {e}")
+        return UPLOAD_RETRY
+
+UPLOADER = UploadPipeline()
+
+# --- 센서 읽기 ---
+def read_sensor():
+    """온습도 센서 한 번 읽기, (온도, 습도) 반환 (실패 시 None)"""
+    # 실제 환경에서는 DHT22 센서 사용
+    # import adafruit_dht
+    # dht_device = adafruit_dht.DHT22(board.D4)
+    # try:
+    #     return dht_device.temperature, dht_device.humidity
+    # except RuntimeError:
+    #     return None
+
+    # 테스트용 더미 데이터
+    return round(random.uniform(20.0, 30.0), 1), round(random.uniform(40.0, 80.0), 1)
+
+# --- 촬영 명령 처리 ---
+def capture_and_upload(group_id, iot_id, wait=UPLOAD_RESULT_WAIT):
+    """
+    촬영 후 업로드 큐에 넣고 최대 wait초 동안 결과를 기다림
+    업로드가 재시도 중이어도 이미지는 큐에 안전하게 보관되어 있으므로 성공으로 간주 (재촬영 방지)
+    """
+    # 1. 이미지 촬영 (폴더 감시가 같은 파일을 중복 업로드하지 않도록 먼저 처리 목록에 등록)
+    image_path = capture_path(group_id, iot_id)
+    PROCESSED.add(image_path)
+    image_path = capture_image(group_id, iot_id, image_path)
+    if not image_path:
+        print("❌ 이미지 촬영 실패")
         return False
 
-# --- 센서 데이터 업로드 함수 ---
-def upload_sensor_data(iot_id, gh_id):
-    """온습도 센서 데이터를 서버로 전송"""
+    # 2. 업로드 큐에 등록 (업로드 성공 시 큐에서 자동 삭제)
+    future = UPLOADER.submit(image_path, group_id, iot_id)
     try:
-        # 실제 환경에서는 DHT22 센서 사용
-        # import adafruit_dht
-        # dht_device = adafruit_dht.DHT22(board.D4)
-        # temperature = dht_device.temperature
-        # humidity = dht_device.humidity
-        
-        # 테스트용 더미 데이터
-        import random
-        temperature = round(random.uniform(20.0, 30.0), 1)
-        humidity = round(random.uniform(40.0, 80.0), 1)
-        
-        data = {
-            "temperature": temperature,
-            "humidity": humidity,
-            "timestamp": datetime.now().isoformat(),
-            "iot_id": iot_id,
-            "gh_id": gh_id
-        }
-        
-        res = requests.post(SENSOR_UPLOAD_URL, json=data, timeout=10)
-        res.raise_for_status()
-        print(f"✅ 센서 데이터 업로드: 온도 {temperature}°C, 습도 {humidity}%")
+        return future.result(timeout=wait)
+    except FutureTimeout:
+        print(f"⏳ 업로드 대기 중 (백그라운드에서 계속 재시도): {os.path.basename(image_path)}")
         return True
-        
-    except Exception as e:
-        print(f"❌ 센서 데이터 전송 실패: {e}")
-        return False
 
-# --- Flask 라우트: 촬영 명령 수신 ---
+
+# --- Flask 라우트: 촬영 명령 수신 (push 방식) ---
 @app.route('/capture-command', methods=['POST'])
 def receive_capture_command():
     """
@@ -157,27 +382,8 @@ def receive_capture_command():
         if action == 'capture_and_upload':
             print(f"📸 촬영 명령 수신 - 그룹 ID: {group_id}, IoT ID: {iot_id}")
             
-            # 비동기적으로 촬영 및 업로드 실행
-            def capture_and_upload_async():
-                # 1. 이미지 촬영
-                image_path = capture_image(group_id, iot_id)
-                if image_path:
-                    # 2. 서버로 업로드 및 분석
-                    success = upload_image(image_path, group_id, iot_id)
-                    if success:
-                        # 3. 업로드 성공 시 로컬 파일 삭제
-                        try:
-                            os.remove(image_path)
-                            print(f"🗑️ 로컬 이미지 삭제: {os.path.basename(image_path)}")
-                        except OSError as e:
-                            print(f"❌ 파일 삭제 실패: {e}")
-                    else:
-                        print(f"⚠️ 업로드 실패, 로컬 파일 유지: {image_path}")
-                else:
-                    print("❌ 이미지 촬영 실패")
-            
-            # 백그라운드에서 실행
-            threading.Thread(target=capture_and_upload_async, daemon=True).start()
+            # 백그라운드에서 촬영 및 업로드 실행
+            threading.Thread(target=capture_and_upload, args=(group_id, iot_id), daemon=True).start()
             
             return jsonify({
                 'message': '촬영 명령을 수신했습니다. 처리 중...',
@@ -191,84 +397,153 @@ def receive_capture_command():
         print(f"❌ 명령 처리 오류: {e}")
         return jsonify({'message': '서버 오류 발생', 'error': str(e)}), 500
 
+# --- 명령 수신 (pull 방식, 서버에 long-poll) ---
+def run_pulled_command(session, command):
+    """가져온 명령을 실행하고 결과를 서버에 ack (ack가 없으면 서버가 일정 시간 뒤 다시 전달)"""
+    payload = command.get('payload') or {}
+    command_id = command['id']
+    if command.get('action') == 'capture_and_upload':
+        print(f"📸 촬영 명령 수신 (pull) - 명령 ID: {command_id}, 그룹 ID: {payload.get('group_id')}")
+        success = capture_and_upload(payload.get('group_id'), payload.get('iot_id', IOT_ID))
+        ack = {'status': 'done'} if success else {'status': 'failed', 'error': '촬영 또는 업로드 실패'}
+    else:
+        ack = {'status': 'failed', 'error': f"알 수 없는 액션: {command.get('action')}"}
+
+    try:
+        session.post(f"{COMMAND_POLL_URL}/{command_id}/ack", json=ack, timeout=10)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ 명령 ack 전송 실패 (서버가 재전달 예정) - 명령 ID: {command_id}: {e}")
+
+
+def command_poll_loop():
+    """
+    서버에 명령 요청을 열어 두고, 명령이 등록되면 바로 받아 실행
+    서버는 명령이 없으면 최대 COMMAND_POLL_WAIT초 동안 응답을 보류하므로 요청 횟수는 적고 지연은 1초 미만
+    """
+    print(f"📡 명령 수신 대기 시작 (pull): {COMMAND_POLL_URL}")
+    session = requests.Session()
+    failures = 0
+    while True:
+        try:
+            res = session.get(
+                COMMAND_POLL_URL,
+                params={'wait': COMMAND_POLL_WAIT},
+                timeout=(5, COMMAND_POLL_WAIT + 10)
+            )
+            res.raise_for_status()
+            failures = 0
+            for command in res.json().get('commands', []):
+                # 촬영/업로드가 끝날 때까지 다음 명령 수신을 막지 않도록 별도 스레드에서 실행
+                threading.Thread(target=run_pulled_command, args=(session, command), daemon=True).start()
+        except Exception as e:
+            # 서버 재시작/네트워크 단절 시 점점 간격을 늘려 재시도 (최대 30초)
+            failures += 1
+            delay = min(2 ** failures, 30)
+            print(f"⚠️ 명령 수신 실패, {delay}초 후 재시도: {e}")
+            time.sleep(delay)
+
 # --- 자동 이미지 업로드 시스템 ---
+class ProcessedIndex:
+    """최근 처리한 파일 경로 (최대 max_size개, 오래된 것부터 삭제)"""
+
+    def __init__(self, max_size=PROCESSED_INDEX_MAX):
+        self.max_size = max_size
+        self.paths = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, path):
+        """처음 보는 경로면 등록하고 True, 이미 있으면 False"""
+        path = os.path.abspath(path)
+        with self.lock:
+            if path in self.paths:
+                return False
+            self.paths[path] = None
+            if len(self.paths) > self.max_size:
+                self.paths.popitem(last=False)
+            return True
+
+
+PROCESSED = ProcessedIndex()
+
+
+def handle_new_image(image_path):
+    """새 이미지를 업로드 큐에 등록 (이미 처리했거나 다른 쪽에서 먼저 옮긴 파일은 무시)"""
+    if not image_path.endswith('.jpg') or not PROCESSED.add(image_path):
+        return
+    # 파일명에서 group_id, iot_id 추출 (파일명 규칙에 따라)
+    ids = parse_image_filename(image_path)
+    try:
+        UPLOADER.submit(image_path, ids['group_id'], ids['iot_id'])
+        print(f"📦 업로드 큐 등록: {os.path.basename(image_path)} (대기 중 {UPLOADER.pending()}건)")
+    except FileNotFoundError:
+        pass
+
+
+def scan_image_dir(started_at):
+    """
+    시작 이후 생긴 이미지 중 처리하지 않은 것을 등록
+    시작 전에 있던 파일은 mtime으로 제외하므로 처리 목록이 폴더 크기만큼 커지지 않음
+    """
+    now = time.time()
+    with os.scandir(IMAGE_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.jpg') or not entry.is_file():
+                continue
+            # 아직 기록 중일 수 있는 파일(1초 이내 수정)은 다음 스캔으로
+            if started_at <= entry.stat().st_mtime < now - 1:
+                handle_new_image(entry.path)
+
+
+def watch_with_inotify(started_at):
+    """파일 기록이 끝나는 시점(IN_CLOSE_WRITE)이나 다른 곳에서 옮겨 온 시점(IN_MOVED_TO)에 바로 업로드"""
+    inotify = INotify()
+    try:
+        inotify.add_watch(IMAGE_DIR, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+        print(f"👀 inotify로 {IMAGE_DIR} 폴더 감시 중")
+        # 감시를 (다시) 시작하기 전에 생긴 파일 처리
+        scan_image_dir(started_at)
+        while True:
+            for event in inotify.read():
+                handle_new_image(os.path.join(IMAGE_DIR, event.name))
+    finally:
+        inotify.close()
+
+
+def watch_with_polling(started_at):
+    """inotify를 쓸 수 없는 환경용 주기 스캔"""
+    print(f"🔁 {IMAGE_POLL_INTERVAL}초마다 {IMAGE_DIR} 폴더 스캔 (inotify_simple 미설치)")
+    while True:
+        scan_image_dir(started_at)
+        time.sleep(IMAGE_POLL_INTERVAL)
+
+
 def auto_image_upload_system():
     """
-    주기적으로 이미지 폴더를 스캔하여 새로운 이미지를 자동 업로드
-    (기존 코드 기반)
+    이미지 폴더에 새로 생긴 이미지를 자동 업로드
+    시작 시점에 이미 있던 이미지는 제외 (기존 동작 유지)
     """
-    print(f"🚀 자동 이미지 업로더 시작. {IMAGE_DIR} 폴더를 주기적으로 스캔합니다.")
-    
-    # 초기 스캔: 기존 이미지들을 processed_files에 추가
-    initial_images = glob.glob(os.path.join(IMAGE_DIR, "*.jpg"))
-    for img_path in initial_images:
-        processed_files.add(os.path.abspath(img_path))
-    print(f"💡 초기 스캔 완료: {len(initial_images)}개의 기존 이미지 제외")
-    
+    started_at = time.time()
+    print(f"🚀 자동 이미지 업로더 시작: {IMAGE_DIR}")
     while True:
         try:
-            all_current_images = glob.glob(os.path.join(IMAGE_DIR, "*.jpg"))
-            
-            # 새로운 이미지만 필터링
-            unprocessed_new_images = []
-            for img_path in all_current_images:
-                abs_path = os.path.abspath(img_path)
-                if abs_path not in processed_files:
-                    unprocessed_new_images.append(abs_path)
-            
-            if unprocessed_new_images:
-                # 최신 파일 우선 정렬
-                unprocessed_new_images.sort(key=os.path.getmtime, reverse=True)
-                images_to_process = unprocessed_new_images[:MAX_IMAGES_TO_UPLOAD_PER_CYCLE]
-                
-                print(f"📦 {len(unprocessed_new_images)}개의 미처리 이미지 발견. {len(images_to_process)}개 처리 시도")
-                
-                for image_path in images_to_process:
-                    # 파일명에서 group_id, iot_id 추출 (파일명 규칙에 따라)
-                    filename = os.path.basename(image_path)
-                    try:
-                        # 파일명 형식: iot_{iot_id}_group_{group_id}_{timestamp}.jpg
-                        parts = filename.split('_')
-                        if len(parts) >= 4 and parts[0] == 'iot':
-                            iot_id = parts[1]
-                            group_id = parts[3]
-                        else:
-                            # 기본값 사용
-                            iot_id = "1"
-                            group_id = "1"
-                    except:
-                        iot_id = "1"
-                        group_id = "1"
-                    
-                    if upload_image(image_path, group_id, iot_id):
-                        try:
-                            os.remove(image_path)
-                            print(f"🗑️ 업로드 완료된 이미지 삭제: {os.path.basename(image_path)}")
-                            processed_files.add(image_path)
-                        except OSError as e:
-                            print(f"❌ 파일 삭제 실패: {e}")
-                    else:
-                        print(f"⚠️ 업로드 실패: {os.path.basename(image_path)}. 다음 주기에서 재시도")
-            
-            time.sleep(5)  # 5초마다 스캔
-            
+            if INOTIFY_AVAILABLE:
+                watch_with_inotify(started_at)
+            else:
+                watch_with_polling(started_at)
         except Exception as e:
             print(f"❌ 자동 업로드 시스템 오류: {e}")
             time.sleep(10)
 
-# --- 센서 데이터 주기적 전송 ---
-def auto_sensor_upload_system():
-    """주기적으로 센서 데이터를 서버로 전송"""
-    current_iot_id = 1
-    current_gh_id = 1
-    
+# --- 접속 상태 알림 (heartbeat) ---
+def heartbeat_loop():
+    """서버가 명령 전송 전에 온라인 여부를 판단할 수 있도록 주기적으로 알림 (응답 본문 없음)"""
+    session = requests.Session()
     while True:
         try:
-            upload_sensor_data(current_iot_id, current_gh_id)
-            time.sleep(60)  # 1분마다 센서 데이터 전송
-        except Exception as e:
-            print(f"❌ 센서 업로드 시스템 오류: {e}")
-            time.sleep(60)
+            session.post(HEARTBEAT_URL, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ heartbeat 전송 실패: {e}")
+        time.sleep(HEARTBEAT_INTERVAL)
 
 # --- 메인 실행 ---
 if __name__ == "__main__":
@@ -280,9 +555,19 @@ if __name__ == "__main__":
     print(f"🌐 서버 URL: {SERVER_BASE_URL}")
     
     # 백그라운드 스레드 시작
+    UPLOADER.start()
     threading.Thread(target=auto_image_upload_system, daemon=True).start()
-    threading.Thread(target=auto_sensor_upload_system, daemon=True).start()
+    # 온습도를 2초마다 측정해 1분 단위로 집계, 서버에 접속할 수 없으면 로컬에 보관했다가 전송
+    SensorBuffer(read_sensor, SENSOR_UPLOAD_URL, iot_id=IOT_ID, gh_id=1).start()
+    if COMMAND_MODE == 'pull':
+        threading.Thread(target=command_poll_loop, daemon=True).start()
+    else:
+        threading.Thread(target=heartbeat_loop, daemon=True).start()
     
-    # Flask 서버 시작 (명령 수신용)
-    print("🚀 Flask 서버 시작 (포트 5002)")
-    app.run(host='0.0.0.0', port=5002, debug=False)
\ No newline at end of file
+    if COMMAND_MODE == 'push':
+        # Flask 서버 시작 (명령 수신용)
+        print("🚀 Flask 서버 시작 (포트 5002)")
+        app.run(host='0.0.0.0', port=5002, debug=False)
+    else:
+        while True:
+            time.sleep(3600)
\ No newline at end of file
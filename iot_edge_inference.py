@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+IoT 엣지 추론 - Raspberry Pi에서 딸기 검출 모델을 직접 실행 (pi_clientF3_fixed.py의 EDGE_INFERENCE 모드)
+  - export_models.py --edge 로 만든 INT8 모델(.onnx / .tflite)을 로드
+  - 서버와 같은 클래스 이름으로 익은/안익은/썩은 딸기 개수를 집계해 개수/박스/썸네일만 업로드
+  - ONNX는 onnxruntime, TFLite는 tflite-runtime(또는 tensorflow)이 설치되어 있어야 함
+"""
+
+import ast
+import hashlib
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# ONNX Runtime (pip install onnxruntime)
+try:
+    import onnxruntime as ort
+    ORT_AVAILABLE = True
+except ImportError:
+    ORT_AVAILABLE = False
+
+# TFLite (pip install tflite-runtime, 없으면 tensorflow의 인터프리터 사용)
+try:
+    from tflite_runtime.interpreter import Interpreter as TFLiteInterpreter
+    TFLITE_AVAILABLE = True
+except ImportError:
+    try:
+        from tensorflow.lite import Interpreter as TFLiteInterpreter
+        TFLITE_AVAILABLE = True
+    except ImportError:
+        TFLITE_AVAILABLE = False
+
+# 서버(utils/inference.py)와 같은 신뢰도 임계값
+EDGE_CONF_THRESHOLD = float(os.getenv('EDGE_CONF_THRESHOLD', 0.5))
+EDGE_IOU_THRESHOLD = 0.7
+# 모델 스레드 수 (Pi 4 기준 코어 4개, 촬영/업로드 스레드 몫을 남겨 둠)
+EDGE_NUM_THREADS = int(os.getenv('EDGE_NUM_THREADS', 3))
+# 업로드할 썸네일 크기(긴 변)와 JPEG 품질
+EDGE_THUMBNAIL_SIZE = 320
+EDGE_THUMBNAIL_QUALITY = 70
+
+# 모델 클래스 이름 (서버 count_detections와 동일, 썩은 딸기 모델의 오타도 그대로)
+RIPE_CLASS = "straw-ripe"
+UNRIPE_CLASS = "straw-unripe"
+ROTTEN_CLASS = "starw_rotten"
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def letterbox(image, size):
+    """비율을 유지한 채 size x size로 줄이고 남는 부분은 회색(114)으로 채움, (이미지, 배율, (pad_x, pad_y)) 반환"""
+    height, width = image.shape[:2]
+    ratio = min(size / width, size / height)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = image
+    return canvas, ratio, (pad_x, pad_y)
+
+
+class EdgeModel:
+    """
+    YOLOv8 검출 모델 1개 (NMS 미포함 출력 (1, 4+클래스 수, N)을 직접 후처리)
+    클래스 이름/입력 크기는 export_models.py가 함께 저장한 <모델>.json 에서 읽음
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        meta = {}
+        if os.path.exists(path + '.json'):
+            with open(path + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.onnx':
+            if not ORT_AVAILABLE:
+                raise RuntimeError("onnxruntime이 설치되어 있지 않습니다")
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = EDGE_NUM_THREADS
+            self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+            self.input_name = self.session.get_inputs()[0].name
+            self.imgsz = meta.get('imgsz') or self.session.get_inputs()[0].shape[2]
+            if 'names' not in meta:
+                # ultralytics가 ONNX 메타데이터에 넣어 둔 클래스 이름 사용
+                names = self.session.get_modelmeta().custom_metadata_map.get('names')
+                meta['names'] = ast.literal_eval(names) if names else None
+            self.nhwc = False
+        elif ext == '.tflite':
+            if not TFLITE_AVAILABLE:
+                raise RuntimeError("tflite-runtime이 설치되어 있지 않습니다")
+            self.interpreter = TFLiteInterpreter(model_path=path, num_threads=EDGE_NUM_THREADS)
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self.imgsz = meta.get('imgsz') or int(self.input_detail['shape'][1])
+            self.nhwc = True
+        else:
+            raise ValueError(f"지원하지 않는 엣지 모델 형식입니다: {path}")
+
+        if not meta.get('names'):
+            raise RuntimeError(f"클래스 이름을 찾을 수 없습니다: {path}.json")
+        self.names = {int(k): v for k, v in meta['names'].items()}
+        self.version = f"{os.path.basename(path)}-{self.imgsz}-{file_digest(path)}"
+
+    def _run(self, blob):
+        if not self.nhwc:
+            return self.session.run(None, {self.input_name: blob})[0]
+
+        blob = blob.transpose(0, 2, 3, 1)
+        dtype = self.input_detail['dtype']
+        if dtype != np.float32:
+            # 입력까지 정수로 양자화된 모델
+            scale, zero_point = self.input_detail['quantization']
+            blob = (blob / scale + zero_point).astype(dtype)
+        self.interpreter.set_tensor(self.input_detail['index'], blob)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_detail['index'])
+        if output.dtype != np.float32:
+            scale, zero_point = self.output_detail['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def predict(self, image):
+        """BGR 이미지 → [(클래스 이름, 신뢰도, [x1, y1, x2, y2]), ...] (원본 이미지 좌표)"""
+        canvas, ratio, (pad_x, pad_y) = letterbox(image, self.imgsz)
+        blob = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+
+        with self.lock:
+            output = self._run(blob)
+
+        predictions = output[0].T  # (N, 4+클래스 수)
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences >= EDGE_CONF_THRESHOLD
+        if not keep.any():
+            return []
+        boxes, class_ids, confidences = predictions[keep, :4], class_ids[keep], confidences[keep]
+        if boxes.max() <= 2.0:
+            # TFLite 출력은 입력 크기로 정규화된 좌표
+            boxes = boxes * self.imgsz
+
+        xy = boxes[:, :2] - boxes[:, 2:4] / 2
+        # 클래스별 NMS: 클래스마다 좌표를 멀리 떨어뜨려 한 번에 처리
+        offset = class_ids[:, None] * (self.imgsz * 2)
+        nms_boxes = np.concatenate([xy + offset, boxes[:, 2:4]], axis=1)
+        indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), confidences.tolist(), EDGE_CONF_THRESHOLD, EDGE_IOU_THRESHOLD)
+
+        height, width = image.shape[:2]
+        detections = []
+        for i in np.array(indices).reshape(-1):
+            x1 = (xy[i, 0] - pad_x) / ratio
+            y1 = (xy[i, 1] - pad_y) / ratio
+            x2 = x1 + boxes[i, 2] / ratio
+            y2 = y1 + boxes[i, 3] / ratio
+            detections.append((
+                self.names.get(int(class_ids[i]), str(class_ids[i])),
+                round(float(confidences[i]), 3),
+                [round(float(min(max(v, 0), limit)), 1) for v, limit in ((x1, width), (y1, height), (x2, width), (y2, height))]
+            ))
+        return detections
+
+
+class EdgeDetector:
+    """익음 모델 + 썩은 딸기 모델(선택)로 서버와 같은 형식의 검출 결과 생성"""
+
+    def __init__(self, ripe_path, rotten_path=None):
+        self.ripe = EdgeModel(ripe_path)
+        self.rotten = None
+        if rotten_path and os.path.exists(rotten_path):
+            self.rotten = EdgeModel(rotten_path)
+        else:
+            print(f"⚠️ 썩은 딸기 엣지 모델 없음 ({rotten_path}), 익음 모델만 실행")
+        self.version = self.ripe.version + (f"+{self.rotten.version}" if self.rotten else '')
+
+    def detect(self, image):
+        """
+        서버 /api/greenhouses/iot-detections 에 보낼 detections 생성
+        {"ripe", "unripe", "rotten", "rotten_checked", "boxes", "model_version", "inference_ms"}
+        """
+        started = time.perf_counter()
+        found = self.ripe.predict(image)
+        if self.rotten is not None:
+            found += self.rotten.predict(image)
+        labels = [label for label, _, _ in found]
+        return {
+            'ripe': labels.count(RIPE_CLASS),
+            'unripe': labels.count(UNRIPE_CLASS),
+            'rotten': labels.count(ROTTEN_CLASS),
+            'rotten_checked': self.rotten is not None,
+            'boxes': [{'label': label, 'conf': conf, 'xyxy': xyxy} for label, conf, xyxy in found],
+            'model_version': self.version,
+            'inference_ms': round((time.perf_counter() - started) * 1000, 1),
+            'image_size': [int(image.shape[1]), int(image.shape[0])]
+        }
+
+
+def load_edge_detector(ripe_path, rotten_path=None):
+    """엣지 모델 로드, 모델/런타임이 없으면 None (원본 이미지 업로드로 동작)"""
+    if not os.path.exists(ripe_path):
+        print(f"⚠️ 엣지 모델 없음: {ripe_path} (export_models.py --edge 로 변환 후 복사)")
+        return None
+    try:
+        detector = EdgeDetector(ripe_path, rotten_path)
+        print(f"✅ 엣지 추론 모델 로드: {detector.version}")
+        return detector
+    except Exception as e:
+        print(f"⚠️ 엣지 모델 로드 실패, 원본 이미지 업로드로 동작: {e}")
+        return None
+
+
+def encode_thumbnail(image, size=EDGE_THUMBNAIL_SIZE, quality=EDGE_THUMBNAIL_QUALITY):
+    """긴 변을 size로 줄인 JPEG 바이트 (화면 표시/알림 이미지용)"""
+    height, width = image.shape[:2]
+    scale = size / max(width, height)
+    if scale < 1:
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("썸네일 인코딩 실패")
+    return buffer.tobytes()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+IoT 센서 샘플링/집계/오프라인 보관 - Raspberry Pi에서 실행 (iot_camera_system.py, pi_clientF3_fixed.py 공용)
+  - 센서를 SENSOR_SAMPLE_INTERVAL마다 읽어 SENSOR_AGGREGATE_INTERVAL 단위로 평균/최소/최대/개수 집계
+  - 집계 결과는 먼저 로컬 SQLite 파일에 기록하고, 업로드 스레드가 모아서 한 번에 전송
+  - 서버에 접속할 수 없으면 파일에 쌓아 두었다가 재접속 시 배치로 이어서 전송 (재시작해도 유지)
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+# DHT22는 2초보다 자주 읽으면 이전 값을 돌려주거나 오류가 나므로 2초가 최소
+SENSOR_SAMPLE_INTERVAL = float(os.getenv('SENSOR_SAMPLE_INTERVAL', 2))
+# 이 기간(초)의 샘플을 레코드 1건으로 집계
+SENSOR_AGGREGATE_INTERVAL = int(os.getenv('SENSOR_AGGREGATE_INTERVAL', 60))
+# 한 번에 전송할 최대 집계 건수
+SENSOR_UPLOAD_BATCH = 200
+# 전송 실패 시 재시도 간격 상한 (초)
+SENSOR_UPLOAD_BACKOFF_MAX = 300
+# 로컬 보관 최대 건수 (넘으면 오래된 것부터 삭제, 1분 집계 기준 약 35일)
+SENSOR_SPOOL_MAX_ROWS = 50000
+SENSOR_SPOOL_PATH = os.getenv('SENSOR_SPOOL_PATH', 'sensor_spool.db')
+
+
+class SensorSpool:
+    """전송 대기 중인 집계를 보관하는 SQLite 파일"""
+
+    def __init__(self, path=SENSOR_SPOOL_PATH, max_rows=SENSOR_SPOOL_MAX_ROWS):
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS sensor_aggregates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    def put(self, record):
+        with self.lock:
+            self.db.execute("INSERT INTO sensor_aggregates (payload) VALUES (?)", (json.dumps(record),))
+            self.db.execute("""
+                DELETE FROM sensor_aggregates
+                WHERE id <= (SELECT MAX(id) FROM sensor_aggregates) - ?
+            """, (self.max_rows,))
+            self.db.commit()
+
+    def peek(self, limit):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, payload FROM sensor_aggregates ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [row[0] for row in rows], [json.loads(row[1]) for row in rows]
+
+    def remove(self, ids):
+        with self.lock:
+            self.db.executemany("DELETE FROM sensor_aggregates WHERE id = ?", [(i,) for i in ids])
+            self.db.commit()
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM sensor_aggregates").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def summarize(values):
+    return {
+        'mean': round(sum(values) / len(values), 2),
+        'min': min(values),
+        'max': max(values),
+    }
+
+
+class SensorBuffer:
+    """
+    read_sensor: () -> (temperature, humidity), 실패 시 None 반환 또는 예외
+    upload_url: 서버의 배치 업로드 주소 (/product/upload-sensor/batch)
+    """
+
+    def __init__(self, read_sensor, upload_url, iot_id, gh_id, spool=None,
+                 sample_interval=SENSOR_SAMPLE_INTERVAL, aggregate_interval=SENSOR_AGGREGATE_INTERVAL):
+        self.read_sensor = read_sensor
+        self.upload_url = upload_url
+        self.iot_id = iot_id
+        self.gh_id = gh_id
+        self.spool = spool or SensorSpool()
+        self.sample_interval = sample_interval
+        self.aggregate_interval = aggregate_interval
+        self.session = requests.Session()
+        self.samples = []
+        self.failed_reads = 0
+        self.lock = threading.Lock()
+        self.upload_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.threads = []
+
+    def start(self):
+        pending = self.spool.count()
+        if pending:
+            print(f"♻️ 전송 대기 중인 센서 집계 {pending}건")
+        for target in (self._sample_loop, self._upload_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _sample_loop(self):
+        interval_end = time.time() + self.aggregate_interval
+        while not self.stop_event.is_set():
+            self.sample()
+            if time.time() >= interval_end:
+                self.close_interval()
+                interval_end += self.aggregate_interval
+            self.stop_event.wait(self.sample_interval)
+
+    def sample(self):
+        try:
+            reading = self.read_sensor()
+        except Exception:
+            reading = None
+        with self.lock:
+            if reading is None or None in reading:
+                self.failed_reads += 1
+            else:
+                self.samples.append(reading)
+
+    def close_interval(self):
+        """지금까지의 샘플을 집계 1건으로 만들어 보관하고 업로드 스레드를 깨움"""
+        with self.lock:
+            samples, self.samples = self.samples, []
+            failed_reads, self.failed_reads = self.failed_reads, 0
+        if not samples:
+            if failed_reads:
+                print(f"⚠️ 센서 읽기 {failed_reads}회 모두 실패, 집계 없음")
+            return None
+
+        temperature = summarize([s[0] for s in samples])
+        humidity = summarize([s[1] for s in samples])
+        record = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'temperature': temperature['mean'],
+            'temperature_min': temperature['min'],
+            'temperature_max': temperature['max'],
+            'humidity': humidity['mean'],
+            'humidity_min': humidity['min'],
+            'humidity_max': humidity['max'],
+            'sample_count': len(samples),
+            'failed_reads': failed_reads,
+        }
+        self.spool.put(record)
+        self.wake.set()
+        print(f"🌡️ 센서 집계: 온도 {record['temperature']}°C ({temperature['min']}~{temperature['max']}), "
+              f"습도 {record['humidity']}% ({len(samples)}회 측정)")
+        return record
+
+    def upload_pending(self, timeout=10):
+        """보관 중인 집계를 배치로 전송, 모두 보냈으면 True (다른 스레드가 전송 중이면 끝날 때까지 대기)"""
+        with self.upload_lock:
+            while True:
+                ids, records = self.spool.peek(SENSOR_UPLOAD_BATCH)
+                if not records:
+                    return True
+                res = self.session.post(self.upload_url, json={
+                    'iot_id': self.iot_id,
+                    'gh_id': self.gh_id,
+                    'readings': records,
+                }, timeout=timeout)
+                if 400 <= res.status_code < 500:
+                    # 서버가 거부한 배치는 다시 보내도 같으므로 버림
+                    print(f"❌ 센서 집계 {len(records)}건 거부됨 ({res.status_code}): {res.text[:200]}")
+                else:
+                    res.raise_for_status()
+                    print(f"✅ 센서 집계 {len(records)}건 업로드")
+                self.spool.remove(ids)
+
+    def _upload_loop(self):
+        failures = 0
+        while not self.stop_event.is_set():
+            # 전송 중에 새 집계가 들어오면 wake가 다시 설정되어 바로 한 번 더 전송
+            self.wake.clear()
+            try:
+                self.upload_pending()
+                failures = 0
+                self.wake.wait()
+            except requests.exceptions.RequestException as e:
+                failures += 1
+                delay = random.uniform(0, min(SENSOR_UPLOAD_BACKOFF_MAX, 2 ** failures))
+                print(f"⚠️ 센서 집계 업로드 실패 (보관 {self.spool.count()}건), {delay:.0f}초 후 재시도: {e}")
+                self.stop_event.wait(delay)
+
+    def stop(self, flush=True, timeout=10):
+        """샘플링 중단, flush=True면 남은 샘플을 집계해 한 번 전송 시도 (실패분은 다음 실행 때 전송)"""
+        self.stop_event.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        if flush:
+            self.close_interval()
+            try:
+                self.upload_pending(timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ 센서 집계 전송 실패, 다음 실행 때 전송 ({self.spool.count()}건 보관): {e}")
+        self.spool.close()
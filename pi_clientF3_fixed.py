@@ -1,12 +1,12 @@
 # pi_client_v4l2_final.py
-# - v4l2-ctl 캡처 해상도 640x480
+# - 촬영 해상도는 서버의 iot.resolution 설정 (OpenCV가 있으면 카메라를 열어 둔 채 스트리밍 촬영)
 # - 업로드 URL 경로 수정 (/api/greenhouses/iot-image-upload)
 # - BASE_URL을 로컬 테스트 주소로 변경
 
 import time
 import requests
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import adafruit_dht
 import board
 import json
@@ -14,7 +14,31 @@ import threading
 import sys
 import subprocess
 import pathlib
+import queue
+from requests.adapters import HTTPAdapter
 from gpiozero import PWMOutputDevice
+from iot_sensor_buffer import SensorBuffer
+
+# Pillow (libjpeg-turbo 포함 빌드, x86에서는 Pillow-SIMD로 교체 가능)
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# OpenCV (카메라를 열어 둔 채로 촬영, 없으면 v4l2-ctl로 매번 촬영)
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+# 엣지 추론 (OpenCV + onnxruntime 또는 tflite-runtime 필요, EDGE_INFERENCE=on일 때만 사용)
+try:
+    from iot_edge_inference import load_edge_detector, encode_thumbnail
+    EDGE_AVAILABLE = True
+except ImportError:
+    EDGE_AVAILABLE = False
 
 if len(sys.argv) < 2:
     print("❌ 오류: gh_id 인자가 필요합니다.")
@@ -36,17 +60,60 @@ BASE_URL = "http://165.229.229.242:5001"
 
 # 서버 코드 분석 결과에 따른 API 경로들
 IMAGE_UPLOAD_URL = f"{BASE_URL}/api/greenhouses/iot-image-upload"
-SENSOR_UPLOAD_URL = f"{BASE_URL}/product/upload-sensor"
+DETECTIONS_UPLOAD_URL = f"{BASE_URL}/api/greenhouses/iot-detections"
+SENSOR_UPLOAD_URL = f"{BASE_URL}/product/upload-sensor/batch"
 GPS_UPLOAD_URL = f"{BASE_URL}/product/upload-gps"
 BATTERY_UPLOAD_URL = f"{BASE_URL}/product/upload-battery"
 CONFIG_API_URL = f"{BASE_URL}/api/greenhouses/iot-config"
 SEND_IOT_DONE_NOTIFICATION_URL = f"{BASE_URL}/send-notification"
+CAPTURE_SETTINGS_URL = f"{BASE_URL}/api/devices/{{iot_id}}/capture-settings"
 
 # --------------------
 IMAGE_DIR = "/home/pi/images"
 IOT_CONFIG_FILE = "/home/pi/iot_config.json"
 os.makedirs(IMAGE_DIR, exist_ok=True)
 
+# --- 카메라 ---
+CAMERA_DEVICE = "/dev/video0"
+# 촬영 해상도는 서버의 iot.resolution 설정을 따르고, 해석할 수 없을 때만 이 값 사용
+CAPTURE_WIDTH = 640
+CAPTURE_HEIGHT = 480
+# 카메라를 연 직후 자동 노출/화이트밸런스가 안정될 때까지 버릴 프레임 수 (처음 한 번만)
+CAMERA_WARMUP_FRAMES = 8
+# 촬영 요청 후 새 프레임을 기다리는 최대 시간 (초)
+CAMERA_FRAME_TIMEOUT = 2
+
+# --- 업로드 ---
+# 동시에 업로드하는 이미지 수
+UPLOAD_WORKERS = 2
+# 촬영 후 업로드가 끝나지 않은 이미지 최대 수 (넘으면 다음 촬영 전에 대기, 메모리/저장 공간 보호)
+MAX_INFLIGHT_UPLOADS = 4
+# 업로드 실패 시 재시도 횟수
+UPLOAD_RETRIES = 2
+# 탐색 종료 후 남은 업로드를 기다리는 최대 시간 (초)
+UPLOAD_DRAIN_TIMEOUT = 120
+# 이동 후 차체 흔들림이 멈출 때까지 대기 (초)
+SETTLE_SECONDS = 2
+
+# --- 업로드 전 이미지 축소/재압축 ---
+# iot.resolution 해상도로 촬영한 뒤
+# model: 모델 입력 크기(긴 변 기준)로 줄여서 업로드 / off: 촬영 해상도 그대로 업로드
+RESIZE_TARGET = os.getenv('RESIZE_TARGET', 'model')
+# 서버 설정을 받지 못했을 때 사용할 값 (JPEG_QUALITY 환경 변수가 있으면 서버 값보다 우선)
+DEFAULT_CAPTURE_SETTINGS = {
+    "resolution": "1280x720",
+    "model_input_size": 640,
+    "jpeg_quality": 80
+}
+
+# --- 엣지 추론 ---
+# on: Pi에서 직접 검출하고 개수/박스/썸네일만 업로드 / off: 원본 이미지를 업로드해 서버에서 분석
+EDGE_INFERENCE = os.getenv('EDGE_INFERENCE', 'off')
+EDGE_MODEL_RIPE = os.getenv('EDGE_MODEL_RIPE', '/home/pi/models/ripe_straw_edge_int8.onnx')
+EDGE_MODEL_ROTTEN = os.getenv('EDGE_MODEL_ROTTEN', '/home/pi/models/rotten_straw_edge_int8.onnx')
+# N장마다 1장은 원본 이미지를 검출 결과와 함께 업로드 (서버가 다시 분석해 비교, 0이면 안 함)
+EDGE_AUDIT_EVERY = int(os.getenv('EDGE_AUDIT_EVERY', 10))
+
 # --- [GPIOZERO] ---
 PIN_M2A = 17  # 뒷모터 A (구동)
 PIN_M2B = 27  # 뒷모터 B (구동)
@@ -113,19 +180,190 @@ def load_config():
         print(f"⚠️ 서버에서 설정 수신 실패: {e}. 로컬 파일 설정 사용.")
         return local_config
 
-def capture_and_upload(group_id, iot_id, prefix):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    short_filename = f"{group_id}_{iot_id}_{timestamp}_{prefix}.jpg"
-    filepath = os.path.join(IMAGE_DIR, short_filename)
-    
-    # --- [V4L2 해상도 640x480] ---
-    print(f"📸 v4l2-ctl 640x480 촬영 시작... 저장 위치: {filepath}")
+def load_capture_settings(config):
+    """서버의 촬영 설정(iot.resolution, 모델 입력 크기, JPEG 품질)을 받아 config['capture']에 저장"""
+    settings = dict(DEFAULT_CAPTURE_SETTINGS, **config.get("capture", {}))
+    try:
+        res = requests.get(CAPTURE_SETTINGS_URL.format(iot_id=config.get("iot_id", 1)), timeout=5)
+        res.raise_for_status()
+        settings.update(res.json())
+        config["capture"] = settings
+        with open(IOT_CONFIG_FILE, 'w') as f:
+            json.dump(config, f, indent=4)
+        print(f"✅ 촬영 설정 수신: 해상도 {settings['resolution']}, 모델 입력 {settings['model_input_size']}, "
+              f"품질 {settings['jpeg_quality']}")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        config["capture"] = settings
+        print(f"⚠️ 촬영 설정 수신 실패: {e}. 저장된 설정 사용.")
+    if os.getenv('JPEG_QUALITY'):
+        settings["jpeg_quality"] = int(os.getenv('JPEG_QUALITY'))
+    return settings
+
+
+def capture_size(settings):
+    """촬영 해상도 (iot.resolution, 예: "1280x720"), 형식이 잘못되었으면 기본 해상도"""
+    try:
+        width, height = (int(v) for v in str(settings["resolution"]).lower().split('x'))
+        return width, height
+    except (KeyError, ValueError):
+        print(f"⚠️ 해상도 설정 오류 ({settings.get('resolution')}), {CAPTURE_WIDTH}x{CAPTURE_HEIGHT}로 촬영")
+        return CAPTURE_WIDTH, CAPTURE_HEIGHT
+
+
+def resize_box(settings):
+    """축소 목표 크기 (가로, 세로 최대값, 비율은 유지)"""
+    size = int(settings["model_input_size"])
+    return size, size
+
+
+def optimize_image(filepath, settings):
+    """
+    촬영 이미지를 목표 크기로 줄이고 지정 품질로 다시 압축 (확대는 하지 않음)
+    JPEG draft 모드로 디코딩 단계에서 1/2, 1/4, 1/8 축소해 Pi의 CPU/메모리 사용을 줄임
+    결과가 원본보다 크면 원본 유지, (원본 크기, 최종 크기) 반환
+    """
+    original_size = os.path.getsize(filepath)
+    if not PIL_AVAILABLE or RESIZE_TARGET == 'off':
+        return original_size, original_size
+
+    box = resize_box(settings)
+    tmp_path = f"{filepath}.tmp"
+    try:
+        with Image.open(filepath) as img:
+            img.draft('RGB', box)
+            img = img.convert('RGB')
+            img.thumbnail(box, Image.LANCZOS, reducing_gap=2.0)
+            img.save(tmp_path, 'JPEG', quality=int(settings["jpeg_quality"]))
+        optimized_size = os.path.getsize(tmp_path)
+        if optimized_size >= original_size:
+            os.remove(tmp_path)
+            return original_size, original_size
+        os.replace(tmp_path, filepath)
+        return original_size, optimized_size
+    except Exception as e:
+        print(f"⚠️ 이미지 축소 실패, 원본 업로드: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return original_size, original_size
+
+
+class CameraService:
+    """
+    /dev/video0를 열어 둔 채 mmap 스트리밍을 유지하는 촬영 서비스
+    grabber 스레드가 드라이버 버퍼를 계속 비우고(grab, 디코딩 없음) 촬영 요청이 오면
+    요청 이후에 들어온 프레임만 디코딩해서 돌려주므로 항상 가장 최신 장면을 촬영
+    """
+
+    def __init__(self, device=CAMERA_DEVICE, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.cap = None
+        self.requests = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def open(self):
+        cap = cv2.VideoCapture(self.device, cv2.CAP_V4L2)
+        if not cap.isOpened():
+            cap.release()
+            raise RuntimeError(f"카메라를 열 수 없습니다: {self.device}")
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # 카메라가 지원하지 않는 해상도면 드라이버가 가장 가까운 해상도로 맞춤
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # 드라이버 큐에 오래된 프레임이 쌓이지 않도록 최소 버퍼
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        for _ in range(CAMERA_WARMUP_FRAMES):
+            cap.grab()
+        self.cap = cap
+        self.running = True
+        self.thread = threading.Thread(target=self._grab_loop, args=(cap,), daemon=True)
+        self.thread.start()
+        print(f"✅ 카메라 스트리밍 시작: {self.device} {self.width}x{self.height}")
+
+    def _grab_loop(self, cap):
+        # 재시작 후에는 이전 스레드가 새 카메라를 건드리지 않도록 자기 cap만 사용
+        while self.running and self.cap is cap:
+            if not cap.grab():
+                time.sleep(0.01)
+                continue
+            with self.lock:
+                # 요청 직후 첫 프레임은 드라이버 버퍼에 남아 있던 이전 장면일 수 있어 한 장 더 넘김
+                for request in self.requests:
+                    request['skip'] -= 1
+                pending = [r for r in self.requests if r['skip'] < 0]
+                self.requests = [r for r in self.requests if r['skip'] >= 0]
+            if not pending:
+                continue
+            ok, frame = cap.retrieve()
+            for request in pending:
+                request['frame'] = frame if ok else None
+                request['done'].set()
+
+    def capture(self, filepath, settings):
+        """다음 프레임을 목표 크기로 줄여 JPEG로 저장, 성공 여부 반환"""
+        if self.cap is None:
+            return False
+        request = {'done': threading.Event(), 'frame': None, 'skip': 1}
+        with self.lock:
+            self.requests.append(request)
+        if not request['done'].wait(CAMERA_FRAME_TIMEOUT) or request['frame'] is None:
+            return False
+
+        frame = request['frame']
+        if RESIZE_TARGET != 'off':
+            box_w, box_h = resize_box(settings)
+            height, width = frame.shape[:2]
+            scale = min(box_w / width, box_h / height)
+            if scale < 1:
+                frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return cv2.imwrite(filepath, frame, [cv2.IMWRITE_JPEG_QUALITY, int(settings["jpeg_quality"])])
+
+    def close(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        # 대기 중인 촬영 요청은 실패로 끝냄
+        with self.lock:
+            pending, self.requests = self.requests, []
+        for request in pending:
+            request['done'].set()
+
+
+def open_camera(settings):
+    """카메라 서비스 시작 (OpenCV가 없거나 열 수 없으면 None → v4l2-ctl로 촬영)"""
+    if not CV2_AVAILABLE:
+        print("ℹ️ OpenCV 미설치: 촬영마다 v4l2-ctl 사용")
+        return None
+    width, height = capture_size(settings)
+    camera = CameraService(width=width, height=height)
+    try:
+        camera.open()
+        return camera
+    except Exception as e:
+        print(f"⚠️ 카메라 스트리밍 시작 실패, v4l2-ctl 사용: {e}")
+        camera.close()
+        return None
+
+
+def capture_with_v4l2(filepath, settings):
+    """v4l2-ctl로 한 장 촬영 (매번 장치 열기/포맷 설정/프레임 8장 버림) 후 축소/재압축"""
+    width, height = capture_size(settings)
+    print(f"📸 v4l2-ctl {width}x{height} 촬영 시작... 저장 위치: {filepath}")
     
     try:
         subprocess.run([
             "v4l2-ctl",
-            "-d", "/dev/video0",
-            "--set-fmt-video=width=640,height=480,pixelformat=MJPG",
+            "-d", CAMERA_DEVICE,
+            f"--set-fmt-video=width={width},height={height},pixelformat=MJPG",
             "--stream-mmap",
             "--stream-skip=8",
             "--stream-to", filepath,
@@ -144,21 +382,123 @@ def capture_and_upload(group_id, iot_id, prefix):
     except Exception as e_capture:
         print(f"❌ v4l2-ctl 캡처 중 알 수 없는 오류: {e_capture}")
         return False
-    
-    # --------------------------
+
+    if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+        print(f"⚠️ v4l2-ctl이 파일을 생성하지 못했거나 파일이 비어있음: {os.path.basename(filepath)}")
+        return False
+
+    before, after = optimize_image(filepath, settings)
+    if after < before:
+        print(f"🗜️ 이미지 축소/재압축: {before / 1024:.0f}KB → {after / 1024:.0f}KB")
+    return True
+
+
+def capture_image(filepath, settings, camera=None):
+    if camera is not None:
+        started = time.perf_counter()
+        if camera.capture(filepath, settings):
+            print(f"📸 촬영 완료 ({(time.perf_counter() - started) * 1000:.0f}ms): {filepath}")
+            return True
+        print("⚠️ 스트리밍 촬영 실패, 카메라를 다시 열어 재시도")
+        camera.close()
+        try:
+            camera.open()
+            if camera.capture(filepath, settings):
+                print(f"📸 촬영 완료 (카메라 재시작): {filepath}")
+                return True
+        except Exception as e:
+            print(f"⚠️ 카메라 재시작 실패: {e}")
+
+        # 스트림이 /dev/video0를 잡고 있으면 v4l2-ctl이 device busy로 실패하므로 먼저 닫음
+        print("⚠️ v4l2-ctl로 재시도")
+        camera.close()
+        success = capture_with_v4l2(filepath, settings)
+        try:
+            camera.open()
+        except Exception as e:
+            print(f"⚠️ 카메라 스트리밍 재시작 실패, 다음 촬영에서 다시 시도: {e}")
+        return success
+    return capture_with_v4l2(filepath, settings)
+
+
+def load_detector():
+    """EDGE_INFERENCE=on이면 엣지 모델 로드 (실패하면 None → 원본 업로드)"""
+    if EDGE_INFERENCE != 'on':
+        return None
+    if not (CV2_AVAILABLE and EDGE_AVAILABLE):
+        print("⚠️ 엣지 추론에 필요한 OpenCV/numpy가 없어 원본 이미지 업로드로 동작")
+        return None
+    return load_edge_detector(EDGE_MODEL_RIPE, EDGE_MODEL_ROTTEN)
+
+
+def run_edge_inference(detector, filepath):
+    """촬영 이미지를 엣지 모델로 검출, (detections, 썸네일 JPEG 바이트) 반환 (실패 시 (None, None))"""
     try:
-        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-            print(f"⚠️ v4l2-ctl이 파일을 생성하지 못했거나 파일이 비어있음: {short_filename}, 업로드 스킵.")
-            return False
-        
+        image = cv2.imread(filepath)
+        if image is None:
+            raise RuntimeError("이미지를 읽을 수 없습니다")
+        detections = detector.detect(image)
+        print(f"🧠 엣지 검출 ({detections['inference_ms']:.0f}ms): 익은 {detections['ripe']}, "
+              f"안익은 {detections['unripe']}, 썩은 {detections['rotten']}")
+        return detections, encode_thumbnail(image)
+    except Exception as e:
+        print(f"⚠️ 엣지 추론 실패, 원본 이미지 업로드: {e}")
+        return None, None
+
+
+def capture_time(filepath):
+    """촬영 시각 (파일 수정 시각, 재시도로 늦게 올라가도 서버가 실제 촬영 시각으로 기록)"""
+    return datetime.fromtimestamp(os.path.getmtime(filepath), timezone.utc).isoformat()
+
+
+def upload_detections(session, filepath, group_id, iot_id, detections, thumbnail):
+    """엣지 검출 결과와 썸네일만 업로드 후 원본 삭제, 성공 여부 반환"""
+    short_filename = os.path.basename(filepath)
+    try:
+        res = session.post(
+            DETECTIONS_UPLOAD_URL,
+            files={"file": (short_filename, thumbnail, "image/jpeg")},
+            data={
+                "group_id": group_id,
+                "iot_id": iot_id,
+                "captured_at": capture_time(filepath),
+                "detections": json.dumps(detections)
+            },
+            timeout=(5, 30)
+        )
+        if 400 <= res.status_code < 500:
+            # 서버가 거부한 결과는 다시 보내도 같으므로 원본 이미지로 대체
+            print(f"⚠️ 엣지 검출 결과 거부됨 ({res.status_code}), 원본 이미지 업로드: {res.text[:200]}")
+            return upload_capture(session, filepath, group_id, iot_id)
+        res.raise_for_status()
+        print(f"✅ 검출 결과 업로드 성공: {short_filename} ({len(thumbnail) / 1024:.0f}KB 썸네일)")
+        os.remove(filepath)
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"❌ 검출 결과 업로드 실패: {short_filename} - {e}")
+        return False
+    except OSError as e:
+        print(f"❌ 이미지 삭제 실패: {short_filename} - {e}")
+        return True
+
+
+def upload_capture(session, filepath, group_id, iot_id, detections=None):
+    """촬영 이미지 1장 업로드 후 삭제, 성공 여부 반환 (detections가 있으면 감사용으로 함께 전송)"""
+    short_filename = os.path.basename(filepath)
+    try:
+        data = {
+            "group_id": group_id,
+            "iot_id": iot_id,
+            "captured_at": capture_time(filepath)
+        }
+        if detections is not None:
+            data["detections"] = json.dumps(detections)
         with open(filepath, "rb") as img_file:
-            res = requests.post(
+            res = session.post(
                 IMAGE_UPLOAD_URL,
                 files={"file": (short_filename, img_file, "image/jpeg")},
-                data={
-                    "group_id": group_id,
-                    "iot_id": iot_id
-                }
+                data=data,
+                timeout=(5, 30)
             )
             res.raise_for_status()
             print(f"✅ 이미지 업로드 성공: {short_filename} (HTTP {res.status_code})")
@@ -178,33 +518,93 @@ def capture_and_upload(group_id, iot_id, prefix):
         print(f"❌ 알 수 없는 오류 발생: {short_filename} - {e}")
         return False
 
-def upload_sensor_data(iot_id_val, gh_id_val):
-    try:
-        temperature = dht_device.temperature
-        humidity = dht_device.humidity
-    except RuntimeError as e:
-        print(f"❌ 센서 오류 (1차 시도): {e}")
-        time.sleep(1)
-        try:
-            temperature = dht_device.temperature
-            humidity = dht_device.humidity
-        except RuntimeError as e:
-            print(f"❌ 센서 오류 (2차 시도): {e}")
-            temperature = None
-            humidity = None
-    
+
+class UploadQueue:
+    """
+    촬영 이미지를 백그라운드에서 업로드 (로버는 업로드를 기다리지 않고 다음 지점으로 이동)
+    동시에 진행 중인 업로드는 최대 MAX_INFLIGHT_UPLOADS장, 넘으면 submit이 자리가 날 때까지 대기
+    detector가 있으면 워커가 엣지 추론 후 검출 결과만 업로드 (EDGE_AUDIT_EVERY장마다 원본도 함께)
+    """
+
+    def __init__(self, workers=UPLOAD_WORKERS, max_inflight=MAX_INFLIGHT_UPLOADS, detector=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.tasks = queue.Queue()
+        self.pending = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.detector = detector
+        self.submitted = 0
+        self.condition = threading.Condition()
+        for _ in range(workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, filepath, group_id, iot_id):
+        self.slots.acquire()
+        with self.condition:
+            self.pending += 1
+            audit = EDGE_AUDIT_EVERY > 0 and self.submitted % EDGE_AUDIT_EVERY == 0
+            self.submitted += 1
+        self.tasks.put((filepath, group_id, iot_id, audit))
+
+    def _upload(self, filepath, group_id, iot_id, detections, thumbnail, audit):
+        if detections is not None and not audit:
+            return upload_detections(self.session, filepath, group_id, iot_id, detections, thumbnail)
+        return upload_capture(self.session, filepath, group_id, iot_id, detections)
+
+    def _worker(self):
+        while True:
+            filepath, group_id, iot_id, audit = self.tasks.get()
+            success = False
+            try:
+                detections, thumbnail = None, None
+                if self.detector is not None:
+                    detections, thumbnail = run_edge_inference(self.detector, filepath)
+                for attempt in range(UPLOAD_RETRIES + 1):
+                    if self._upload(filepath, group_id, iot_id, detections, thumbnail, audit):
+                        success = True
+                        break
+                    if attempt < UPLOAD_RETRIES:
+                        time.sleep(2 ** attempt)
+                if not success:
+                    print(f"⚠️ 업로드 포기, 로컬 파일 유지: {filepath}")
+            finally:
+                self.slots.release()
+                with self.condition:
+                    self.pending -= 1
+                    if success:
+                        self.succeeded += 1
+                    else:
+                        self.failed += 1
+                    self.condition.notify_all()
+
+    def drain(self, timeout=None):
+        """남은 업로드가 모두 끝날 때까지 대기, 시간 안에 끝났으면 True"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending == 0, timeout)
+
+
+def capture_and_queue(group_id, iot_id, prefix, settings, camera, uploads):
+    """정지 상태에서 촬영만 하고 업로드는 큐에 넘김"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    short_filename = f"{group_id}_{iot_id}_{timestamp}_{prefix}.jpg"
+    filepath = os.path.join(IMAGE_DIR, short_filename)
+
+    if not capture_image(filepath, settings, camera):
+        print(f"⚠️ 촬영 실패: {short_filename}, 업로드 스킵.")
+        return False
+    uploads.submit(filepath, group_id, iot_id)
+    return True
+
+def read_dht():
+    """DHT22 한 번 읽기 (체크섬 오류 등은 흔하므로 None 반환, 집계에서 실패 횟수로만 기록)"""
     try:
-        data = {
-            "temperature": temperature,
-            "humidity": humidity,
-            "timestamp": datetime.now().isoformat(),
-            "iot_id": iot_id_val,
-            "gh_id": gh_id_val
-        }
-        res = requests.post(SENSOR_UPLOAD_URL, json=data)
-        print(f"✅ 센서 데이터 업로드: {res.status_code}")
-    except Exception as e:
-        print(f"❌ 센서 전송 실패: {e}")
+        return dht_device.temperature, dht_device.humidity
+    except RuntimeError:
+        return None
 
 def send_iot_done_notification(gh_id, user_id="test2"):
     try:
@@ -253,14 +653,26 @@ def drive_forward_once(p2a, p2b, speed_pct=60, duration_s=1.0):
 # --------------------
 # 메인 로직
 p2a, p2b = None, None
+camera = None
+sensor_buffer = None
+uploads = None
 
 try:
     config = load_config()
+    capture_settings = load_capture_settings(config)
+    camera = open_camera(capture_settings)
     p2a, p2b = setup_gpiozero()
     
     current_iot_id = config.get("iot_id", 1)
     current_gh_id = config.get("gh_id", 1)
+
+    # 탐색하는 동안 온습도를 계속 측정 (종료 시 집계 전송, 오프라인이면 다음 실행 때 전송)
+    sensor_buffer = SensorBuffer(read_dht, SENSOR_UPLOAD_URL, current_iot_id, current_gh_id)
+    sensor_buffer.start()
+    uploads = UploadQueue(detector=load_detector())
     
+    # 이동 → 정지 → 촬영 (업로드는 백그라운드에서 진행)
+    # 촬영 결과는 모두 gh_id 그룹으로 올라가므로 지점별 작물 그룹 매핑이 생기기 전까지는 한 지점만 방문
     for row_idx in range(1):
         for col_idx in range(1):
             current_row = row_idx
@@ -283,24 +695,33 @@ try:
             
             # 1. 전진 1초 수행
             drive_forward_once(p2a, p2b, speed_pct=60, duration_s=1.0)
-            print("ℹ️ [메인] 1초 전진 동작 완료. 2초 대기...")
-            time.sleep(2)
+            print(f"ℹ️ [메인] 1초 전진 동작 완료. {SETTLE_SECONDS}초 대기...")
+            time.sleep(SETTLE_SECONDS)
             
             # 2. 전진 후, 정지 상태에서 1회 촬영
             print("ℹ️ [메인] 정지 상태에서 1회 촬영 시도...")
             # ✅ 수정: group_id, iot_id → current_gh_id, current_iot_id
-            capture_and_upload(current_gh_id, current_iot_id, f"capture_after_move_r{current_row}_c{current_col}")
-            
-            send_iot_done_notification(current_gh_id, user_id="test2")
-            upload_sensor_data(current_iot_id, current_gh_id)
+            capture_and_queue(current_gh_id, current_iot_id, f"capture_after_move_r{current_row}_c{current_col}",
+                              capture_settings, camera, uploads)
+
+    # 3. 모든 업로드가 끝난 뒤 탐색 종료 알림 (서버에 결과가 모두 반영된 시점)
+    print(f"⏳ [메인] 남은 업로드 {uploads.pending}건 완료 대기...")
+    if not uploads.drain(UPLOAD_DRAIN_TIMEOUT):
+        print(f"⚠️ [메인] {UPLOAD_DRAIN_TIMEOUT}초 안에 업로드가 끝나지 않음 (남은 {uploads.pending}건)")
+    print(f"📦 [메인] 업로드 성공 {uploads.succeeded}건, 실패 {uploads.failed}건")
+    send_iot_done_notification(current_gh_id, user_id="test2")
 
 except KeyboardInterrupt:
     print("🛑 종료 요청")
 finally:
+    if camera:
+        camera.close()
     if p2a and p2b:
         print("ℹ️ [GPIOZero] 모터 리소스 정리 중...")
         coast(p2a, p2b)
         p2a.close()
         p2b.close()
+    if sensor_buffer:
+        sensor_buffer.stop()
     dht_device.exit()
     print("✅ 종료 및 정리 완료")
@@ -50,7 +50,7 @@ def admin_page():
 
         for farm in pending_farms:
             if farm['document_path']:
-                farm['document_url'] = farm['document_path'].replace('\\', '/').split('static/')[-1]
+                farm['document_url'] = url_for('media.stored_file', key=farm['document_path'].replace('\\', '/'))
 
         return render_template(
             'admin.html',
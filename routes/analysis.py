@@ -0,0 +1,153 @@
+from flask import Blueprint, request, jsonify
+from utils.database import get_dict_cursor_connection
+
+analysis_bp = Blueprint('analysis', __name__, url_prefix='/api/analysis')
+
+# 집계 단위 (PostgreSQL date_trunc 인자)
+TREND_BUCKETS = ('hour', 'day', 'week', 'month')
+
+# 조회 범위별 필터 조건 (crop_analysis → crop_groups → greenhouses 조인 기준)
+SCOPE_FILTERS = {
+    'group': "ca.group_id = %s",
+    'greenhouse': "cg.greenhouse_id = %s",
+    'farm': "g.farm_id = %s",
+}
+
+
+def fetch_trend(scope, target_id):
+    """crop_analysis 이력을 기간 단위로 묶어 익은/안익은/썩은 개수 추세를 한 번의 쿼리로 집계"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in TREND_BUCKETS:
+        return jsonify({'error': f'bucket은 {", ".join(TREND_BUCKETS)} 중 하나여야 합니다.'}), 400
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days는 정수여야 합니다.'}), 400
+
+    conn, cursor = get_dict_cursor_connection()
+    if not (conn and cursor):
+        return jsonify({'error': 'DB 연결 실패'}), 500
+
+    try:
+        cursor.execute(f"""
+            SELECT date_trunc(%s, ca.captured_at) AS bucket,
+                   COUNT(*) AS captures,
+                   COUNT(DISTINCT ca.group_id) AS groups,
+                   SUM(ca.ripe) AS ripe,
+                   SUM(ca.unripe) AS unripe,
+                   SUM(ca.rotten) AS rotten
+            FROM crop_analysis ca
+            JOIN crop_groups cg ON cg.id = ca.group_id
+            JOIN greenhouses g ON g.id = cg.greenhouse_id
+            WHERE {SCOPE_FILTERS[scope]}
+              AND ca.captured_at >= NOW() - (%s * INTERVAL '1 day')
+            GROUP BY 1
+            ORDER BY 1
+        """, (bucket, target_id, days))
+        rows = cursor.fetchall()
+
+        trend = []
+        for row in rows:
+            ripe = int(row['ripe'] or 0)
+            unripe = int(row['unripe'] or 0)
+            total = ripe + unripe
+            trend.append({
+                'bucket': row['bucket'].isoformat(),
+                'captures': row['captures'],
+                'edge': row['edge'],
+                'groups': row['groups'],
+                'ripe': ripe,
+                'unripe': unripe,
+                'rotten': int(row['rotten'] or 0),
+                'total': total,
+                'ripe_ratio': round(ripe / total, 3) if total else None
+            })
+
+        return jsonify({'scope': scope, 'id': target_id, 'bucket': bucket, 'days': days, 'trend': trend})
+    except Exception as e:
+        print(f"추세 조회 오류: {e}")
+        return jsonify({'error': f'추세 조회 실패: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# 작물 그룹별 숙성도 추세
+@analysis_bp.route('/groups/<int:group_id>/trend', methods=['GET'])
+def group_trend(group_id):
+    return fetch_trend('group', group_id)
+
+
+# 비닐하우스별 숙성도 추세
+@analysis_bp.route('/greenhouses/<int:greenhouse_id>/trend', methods=['GET'])
+def greenhouse_trend(greenhouse_id):
+    return fetch_trend('greenhouse', greenhouse_id)
+
+
+# 농장별 숙성도 추세
+@analysis_bp.route('/farms/<int:farm_id>/trend', methods=['GET'])
+def farm_trend(farm_id):
+    return fetch_trend('farm', farm_id)
+
+
+# 모델 실행 정책으로 절약한 추론 비용 (일별)
+@analysis_bp.route('/inference-cost', methods=['GET'])
+def inference_cost():
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days는 정수여야 합니다.'}), 400
+
+    conn, cursor = get_dict_cursor_connection()
+    if not (conn and cursor):
+        return jsonify({'error': 'DB 연결 실패'}), 500
+
+    try:
+        # models_run이 NULL인 행은 실행 정책 도입 전 기록 (두 모델 모두 실행)
+        # 엣지 추론 결과(model_version 'edge:...')는 서버가 모델을 실행하지 않았으므로 별도 집계
+        cursor.execute("""
+            SELECT date_trunc('day', captured_at) AS day,
+                   COUNT(*) FILTER (WHERE NOT edge) AS captures,
+                   COUNT(*) FILTER (WHERE edge) AS edge,
+                   COUNT(*) FILTER (WHERE NOT edge AND cardinality(models_run) = 0) AS cached,
+                   COUNT(*) FILTER (WHERE NOT edge
+                                      AND (models_run IS NULL OR 'rotten' = ANY(models_run))) AS rotten_runs,
+                   COUNT(*) FILTER (WHERE NOT edge AND cardinality(models_run) > 0
+                                      AND NOT ('rotten' = ANY(models_run))) AS rotten_skipped,
+                   COALESCE(SUM(skipped_ms) FILTER (WHERE NOT edge), 0) AS skipped_ms
+            FROM (
+                SELECT captured_at, models_run, skipped_ms,
+                       COALESCE(model_version LIKE 'edge:%%', FALSE) AS edge
+                FROM crop_analysis
+                WHERE captured_at >= NOW() - (%s * INTERVAL '1 day')
+            ) analyses
+            GROUP BY 1
+            ORDER BY 1
+        """, (days,))
+        rows = cursor.fetchall()
+
+        daily = []
+        for row in rows:
+            runs = row['rotten_runs'] + row['rotten_skipped']
+            daily.append({
+                'day': row['day'].date().isoformat(),
+                'captures': row['captures'],
+                'edge': row['edge'],
+                'cached': row['cached'],
+                'rotten_runs': row['rotten_runs'],
+                'rotten_skipped': row['rotten_skipped'],
+                'skip_ratio': round(row['rotten_skipped'] / runs, 3) if runs else None,
+                'saved_seconds': round(float(row['skipped_ms']) / 1000, 2)
+            })
+
+        return jsonify({
+            'days': days,
+            'saved_seconds': round(sum(d['saved_seconds'] for d in daily), 2),
+            'daily': daily
+        })
+    except Exception as e:
+        print(f"추론 비용 조회 오류: {e}")
+        return jsonify({'error': f'추론 비용 조회 실패: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from flask import Blueprint, request, jsonify
+from utils.command_dispatcher import COMMAND_NOTIFIER, claim_commands, ack_command
+from utils.device_registry import DEVICE_REGISTRY
+from utils.database import get_dict_cursor_connection
+from utils.inference import INFERENCE_IMGSZ
+
+device_bp = Blueprint('device', __name__, url_prefix='/api/devices')
+
+# --------------------------
+# IoT 디바이스 명령 수신 (pull 방식, COMMAND_DELIVERY=pull)
+# --------------------------
+# long-poll 최대 대기 시간 (초)
+COMMAND_POLL_MAX_WAIT = int(os.getenv('COMMAND_POLL_MAX_WAIT', 30))
+# 워커당 동시에 대기할 수 있는 long-poll 요청 수
+# (대기 중인 요청도 gthread 스레드를 하나씩 차지하므로 GUNICORN_THREADS보다 작게 유지)
+COMMAND_POLL_MAX_WAITERS = int(os.getenv('COMMAND_POLL_MAX_WAITERS', 2))
+# 알림을 놓쳐도 이 주기(초)마다 DB를 다시 확인 (ack 타임아웃 재전달 포함)
+COMMAND_POLL_RECHECK = 5
+# 디바이스가 업로드 전에 다시 압축할 때 사용할 JPEG 품질
+DEVICE_JPEG_QUALITY = int(os.getenv('DEVICE_JPEG_QUALITY', 80))
+
+poll_slots = threading.BoundedSemaphore(COMMAND_POLL_MAX_WAITERS)
+
+
+# 명령 가져가기: GET /api/devices/<iot_id>/commands?wait=30&limit=10
+# 대기 중인 명령이 있으면 바로, 없으면 새 명령이 등록되거나 wait초가 지날 때까지 응답을 보류
+@device_bp.route('/<int:iot_id>/commands', methods=['GET'])
+def poll_commands(iot_id):
+    wait = min(max(request.args.get('wait', 0, type=int), 0), COMMAND_POLL_MAX_WAIT)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    # 명령 요청 자체가 heartbeat 역할 (pull 방식 디바이스는 별도 heartbeat 불필요)
+    DEVICE_REGISTRY.beat(iot_id)
+
+    # 대기 슬롯이 없으면 기다리지 않고 바로 응답 (디바이스가 곧 다시 요청)
+    holding = wait > 0 and poll_slots.acquire(blocking=False)
+    try:
+        deadline = time.monotonic() + (wait if holding else 0)
+        while True:
+            version = COMMAND_NOTIFIER.version(iot_id)
+            commands = claim_commands(iot_id, limit)
+            if commands is None:
+                return jsonify({'message': 'DB 연결 실패'}), 500
+            remaining = deadline - time.monotonic()
+            if commands or remaining <= 0:
+                break
+            COMMAND_NOTIFIER.wait(iot_id, version, min(remaining, COMMAND_POLL_RECHECK))
+    finally:
+        if holding:
+            poll_slots.release()
+
+    if commands:
+        print(f"📡 IoT {iot_id} 명령 {len(commands)}건 전달: {[c['id'] for c in commands]}")
+    return jsonify({'commands': commands})
+
+
+# heartbeat: POST /api/devices/<iot_id>/heartbeat (메모리에만 기록, DB에는 주기적으로 반영)
+@device_bp.route('/<int:iot_id>/heartbeat', methods=['POST'])
+def heartbeat(iot_id):
+    DEVICE_REGISTRY.beat(iot_id)
+    return jsonify({'status': 'ok'})
+
+
+# 접속 상태 조회: GET /api/devices/<iot_id>/status
+@device_bp.route('/<int:iot_id>/status', methods=['GET'])
+def device_status(iot_id):
+    return jsonify(dict(DEVICE_REGISTRY.status(iot_id), iot_id=iot_id))
+
+
+# 촬영 설정: GET /api/devices/<iot_id>/capture-settings
+# 디바이스는 촬영 이미지를 iot.resolution 또는 모델 입력 크기에 맞게 줄이고 다시 압축한 뒤 업로드
+@device_bp.route('/<int:iot_id>/capture-settings', methods=['GET'])
+def capture_settings(iot_id):
+    conn, cursor = get_dict_cursor_connection()
+    if not (conn and cursor):
+        return jsonify({'message': 'DB 연결 실패'}), 500
+    try:
+        cursor.execute("SELECT resolution, camera_on FROM iot WHERE id = %s", (iot_id,))
+        device = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if not device:
+        return jsonify({'message': '디바이스를 찾을 수 없습니다'}), 404
+
+    return jsonify({
+        'resolution': device['resolution'],
+        'camera_on': device['camera_on'],
+        'model_input_size': INFERENCE_IMGSZ,
+        'jpeg_quality': DEVICE_JPEG_QUALITY
+    })
+
+
+# 명령 처리 결과: POST /api/devices/<iot_id>/commands/<command_id>/ack {"status": "done" | "failed", "error": "..."}
+@device_bp.route('/<int:iot_id>/commands/<int:command_id>/ack', methods=['POST'])
+def ack(iot_id, command_id):
+    data = request.get_json(silent=True) or {}
+    status = data.get('status', 'done')
+    if status not in ('done', 'failed'):
+        return jsonify({'message': "status는 'done' 또는 'failed'여야 합니다."}), 400
+
+    updated = ack_command(iot_id, command_id, success=(status == 'done'), error=data.get('error'))
+    if updated is None:
+        return jsonify({'message': 'DB 연결 실패'}), 500
+    if not updated:
+        # 이미 처리됐거나 재전달 횟수를 넘겨 failed 처리된 명령 → 디바이스는 그냥 넘어가면 됨
+        return jsonify({'message': '처리할 명령이 없습니다.', 'command_id': command_id}), 409
+    return jsonify({'message': '확인 완료', 'command_id': command_id})
@@ -1,12 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, abort
-import os
 from config import DB_CONFIG
+import uuid
 from werkzeug.utils import secure_filename
 from utils.database import get_db_connection, get_dict_cursor_connection
+from utils.storage import save_upload
 from routes.weather import fetch_weather
 
 UPLOAD_FOLDER = 'static/uploads/farms'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 farm_bp = Blueprint('farm', __name__)
 
 # API: 농장 목록 조회
@@ -40,9 +40,10 @@ def create_farm():
     if not document:
         return jsonify({'error': '첨부파일이 필요합니다.'}), 400
 
-    filename = secure_filename(document.filename)
-    upload_path = os.path.join(UPLOAD_FOLDER, filename).replace('\\', '/')
-    document.save(upload_path)
+    # 같은 이름의 문서가 서로 덮어쓰지 않도록 고유 접두사 추가
+    filename = f"{uuid.uuid4().hex[:8]}_{secure_filename(document.filename)}"
+    upload_path = f"{UPLOAD_FOLDER}/{filename}"
+    save_upload(upload_path, document)
 
     conn = get_db_connection()
     if conn:
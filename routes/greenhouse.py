@@ -5,18 +5,18 @@ import psycopg2
 import psycopg2.extras
 import json
 from utils.database import get_db_connection
-import requests
-from collections import Counter
 from werkzeug.utils import secure_filename
 import uuid
 from datetime import datetime
-
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-except ImportError:
-    YOLO_AVAILABLE = False
-    print("Warning: ultralytics not available. YOLO features disabled.")
+from utils.inference import (models_ready, decode_image_bytes, analyze_batch, analyze_image, StageTimer, MODEL_VERSION,
+                             policy_uses_flag, satisfies_policy)
+from utils.analysis_cache import ANALYSIS_CACHE
+from utils.image_store import store_upload, register_ref
+from utils.renditions import generate_ingest_renditions_async
+from utils.crop_analysis import update_latest_result, append_analysis_history, fetch_rotten_flag, parse_capture_time
+from utils.pest_alerts import PEST_ALERTS
+from utils.command_dispatcher import COMMAND_DISPATCHER, COMMAND_STATUSES, fetch_commands
+from utils.device_registry import DEVICE_REGISTRY
 
 import os
 
@@ -412,83 +412,137 @@ def get_crop_groups(greenhouse_id):
 # --------------------------
 # IoT 촬영 및 분석 시스템
 # --------------------------
-# 상수
-# Raspberry Pi IP 주소
-# 로컬 테스트: "http://172.20.47.250:5002" (실제 라즈베리파이)
-# 배포 환경 (ngrok): "https://proud-adder-allegedly.ngrok-free.app"
-RASPBERRY_PI_IP = os.getenv('RASPBERRY_PI_IP', "http://165.229.148.72:5002")
-
 IMAGE_DIR = "test_images/"
-UPLOAD_DIR = "static/uploads/crop_images/"
 
 # 배포된 서버 주소
 IOT_IMAGE_UPLOAD_URL = "https://smart-farm-ignore.onrender.com/api/greenhouses/iot-image-upload"
 
 # 업로드 디렉토리 생성
 os.makedirs(IMAGE_DIR, exist_ok=True)
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# YOLO 모델 초기화 (사용 가능한 경우에만)
-MODEL_RIPE = None
-MODEL_ROTTEN = None
-if YOLO_AVAILABLE:
-    try:
-        MODEL_RIPE = YOLO("model/ripe_straw.pt")
-        MODEL_ROTTEN = YOLO("model/rotten_straw.pt")
-    except Exception as e:
-        print(f"Warning: YOLO model loading failed: {e}")
-        YOLO_AVAILABLE = False
+
+def offline_response(iot_id):
+    """오프라인 디바이스에는 명령을 등록하지 않고 바로 실패 응답 (연결 타임아웃까지 기다리지 않음)"""
+    status = DEVICE_REGISTRY.status(iot_id)
+    if status['online']:
+        return None
+    return jsonify({
+        'message': 'IoT 디바이스가 오프라인 상태입니다. 전원과 네트워크를 확인하세요.',
+        'status': 'device_offline',
+        'iot_id': iot_id,
+        'last_seen': status['last_seen']
+    }), 503
+
+
+def capture_command(group_id, iot_id, greenhouse_id=None, batch_id=None):
+    # IoT는 촬영 후 자동으로 /api/greenhouses/iot-image-upload 엔드포인트로 이미지 업로드
+    return {
+        'iot_id': iot_id,
+        'group_id': group_id,
+        'greenhouse_id': greenhouse_id,
+        'batch_id': batch_id,
+        'action': 'capture_and_upload',
+        'payload': {
+            "group_id": group_id,
+            "iot_id": iot_id,
+            "upload_url": f"http://localhost:5001/api/greenhouses/iot-image-upload",
+            "action": "capture_and_upload"
+        }
+    }
+
 
 @greenhouse_bp.route('/crop_groups/read', methods=['POST'])
 def crop_groups_read():
-    try:
-        data = request.get_json()
-        group_id = data.get('group_id')
-        iot_id = data.get('iot_id')
+    data = request.get_json()
+    group_id = data.get('group_id')
+    iot_id = data.get('iot_id')
 
-        if not group_id or not iot_id:
-            return jsonify({'message': '필수 정보가 누락되었습니다.'}), 400
+    if not group_id or not iot_id:
+        return jsonify({'message': '필수 정보가 누락되었습니다.'}), 400
 
-        # ✅ 촬영 명령 → Raspberry Pi
-        try:
-            # IoT 디바이스에 촬영 명령 전송
-            # IoT는 촬영 후 자동으로 /api/greenhouses/iot-image-upload 엔드포인트로 이미지 업로드
-            capture_command = {
-                "group_id": group_id, 
-                "iot_id": iot_id,
-                "upload_url": f"http://localhost:5001/api/greenhouses/iot-image-upload",
-                "action": "capture_and_upload"
-            }
-            
-            res = requests.post(
-                f"{RASPBERRY_PI_IP}/capture-command",
-                json=capture_command,
-                timeout=10  # 촬영 시간을 고려해서 타임아웃 증가
-            )
-            res.raise_for_status()
-            
-            print(f"✅ IoT 촬영 명령 전송 성공 - 그룹 ID: {group_id}, IoT ID: {iot_id}")
-            
-            # IoT가 비동기적으로 이미지를 업로드하고 분석할 것이므로
-            # 여기서는 명령 전송 성공만 응답
-            return jsonify({
-                "message": "📸 IoT 촬영 명령이 전송되었습니다. 잠시 후 결과가 업데이트됩니다.",
-                "status": "command_sent",
-                "group_id": group_id,
-                "iot_id": iot_id
-            }), 200
-            
-        except Exception as iot_err:
-            print(f"❌ IoT 명령 전송 실패: {iot_err}")
-            return jsonify({'message': 'IoT 촬영 명령 전송 실패', 'error': str(iot_err)}), 502
+    offline = offline_response(iot_id)
+    if offline:
+        return offline
+
+    # ✅ 촬영 명령 → Raspberry Pi (등록 후 백그라운드 전송, 요청은 바로 반환)
+    try:
+        command_id = COMMAND_DISPATCHER.dispatch([capture_command(group_id, iot_id)])[0]
+    except Exception as e:
+        print(f"❌ IoT 명령 등록 실패: {e}")
+        return jsonify({'message': 'IoT 촬영 명령 등록 실패', 'error': str(e)}), 500
+
+    # IoT가 비동기적으로 이미지를 업로드하고 분석할 것이므로 여기서는 명령 등록만 응답
+    return jsonify({
+        "message": "📸 IoT 촬영 명령이 전송되었습니다. 잠시 후 결과가 업데이트됩니다.",
+        "status": "command_queued",
+        "command_id": command_id,
+        "group_id": group_id,
+        "iot_id": iot_id
+    }), 202
+
+
+# 비닐하우스 전체 스캔 (모든 작물 그룹에 촬영 명령을 동시에 전송)
+@greenhouse_bp.route('/<int:greenhouse_id>/scan', methods=['POST'])
+def scan_greenhouse(greenhouse_id):
+    data = request.get_json() or {}
+    iot_id = data.get('iot_id')
+    if not iot_id:
+        return jsonify({'message': 'iot_id가 필요합니다.'}), 400
+
+    offline = offline_response(iot_id)
+    if offline:
+        return offline
 
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'message': 'DB 연결 실패'}), 500
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM crop_groups WHERE greenhouse_id = %s ORDER BY id", (greenhouse_id,))
+            group_ids = [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
 
+    if not group_ids:
+        return jsonify({'message': '스캔할 작물 그룹이 없습니다.'}), 404
 
+    batch_id = uuid.uuid4().hex
+    try:
+        command_ids = COMMAND_DISPATCHER.dispatch([
+            capture_command(group_id, iot_id, greenhouse_id, batch_id) for group_id in group_ids
+        ])
     except Exception as e:
-        print("❌ 전체 오류:", e)
-        return jsonify({'message': '서버 오류 발생', 'error': str(e)}), 500
+        print(f"❌ 비닐하우스 스캔 명령 등록 실패: {e}")
+        return jsonify({'message': '스캔 명령 등록 실패', 'error': str(e)}), 500
+
+    print(f"📡 비닐하우스 {greenhouse_id} 스캔 명령 {len(command_ids)}건 등록 (batch: {batch_id})")
+    return jsonify({
+        "message": f"📸 작물 그룹 {len(command_ids)}곳에 촬영 명령을 전송합니다.",
+        "status": "command_queued",
+        "batch_id": batch_id,
+        "command_ids": command_ids
+    }), 202
+
+
+# 촬영 명령 상태 조회 (?ids=1,2,3 또는 ?batch_id=...)
+@greenhouse_bp.route('/commands', methods=['GET'])
+def get_command_status():
+    batch_id = request.args.get('batch_id')
+    try:
+        command_ids = [int(i) for i in request.args.get('ids', '').split(',') if i]
+    except ValueError:
+        return jsonify({'message': 'ids는 쉼표로 구분한 정수여야 합니다.'}), 400
+    if not batch_id and not command_ids:
+        return jsonify({'message': 'ids 또는 batch_id가 필요합니다.'}), 400
 
+    commands = fetch_commands(command_ids, batch_id)
+    if commands is None:
+        return jsonify({'message': 'DB 연결 실패'}), 500
 
+    summary = {status: 0 for status in COMMAND_STATUSES}
+    for command in commands:
+        summary[command['status']] = summary.get(command['status'], 0) + 1
+    return jsonify({'commands': commands, 'summary': summary})
 
 # --------------------------
 # 사진 업로드 및 분석 기능
@@ -509,122 +563,131 @@ def upload_and_analyze():
         if not files or all(f.filename == '' for f in files):
             return jsonify({'message': '선택된 파일이 없습니다.'}), 400
 
-        # 전체 분석 결과를 저장할 변수들
-        total_ripe = 0
-        total_unripe = 0
-        total_count = 0
-        has_any_rotten = False
-        analyzed_files = []
-
-        # 각 이미지 파일 처리
+        # 각 이미지 파일 저장
+        saved_files = []
         for file in files:
             if file and file.filename != '':
                 # 안전한 파일명 생성
-                from werkzeug.utils import secure_filename
-                import uuid
-                from datetime import datetime
-                
                 filename = secure_filename(file.filename)
                 unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{filename}"
-                file_path = os.path.join(UPLOAD_DIR, unique_filename)
                 
-                # 파일 저장
-                file.save(file_path)
-                
-                # YOLO 분석
-                if YOLO_AVAILABLE and MODEL_RIPE and MODEL_ROTTEN:
-                    try:
-                        # 익은/안익은 딸기 분석
-                        result_ripe = MODEL_RIPE(file_path, conf=0.5)
-                        result_rotten = MODEL_ROTTEN(file_path, conf=0.5)
-
-                        ripe_classes = [MODEL_RIPE.names[int(cls)] for cls in result_ripe[0].boxes.cls]
-                        rotten_classes = [MODEL_ROTTEN.names[int(cls)] for cls in result_rotten[0].boxes.cls]
-
-                        count_ripe = Counter(ripe_classes)
-                        count_rotten = Counter(rotten_classes)
-
-                        file_ripe = count_ripe.get("straw-ripe", 0)
-                        file_unripe = count_ripe.get("straw-unripe", 0)
-                        file_total = file_ripe + file_unripe
-                        file_has_rotten = count_rotten.get("starw_rotten", 0) > 0
-
-                        # 전체 결과에 누적
-                        total_ripe += file_ripe
-                        total_unripe += file_unripe
-                        total_count += file_total
-                        if file_has_rotten:
-                            has_any_rotten = True
-
-                        analyzed_files.append({
-                            'filename': unique_filename,
-                            'ripe': file_ripe,
-                            'unripe': file_unripe,
-                            'total': file_total,
-                            'rotten': file_has_rotten
-                        })
-
-                    except Exception as yolo_err:
-                        print(f"❌ YOLO 분석 실패 ({unique_filename}): {yolo_err}")
-                        # 분석 실패 시 더미 데이터
-                        analyzed_files.append({
-                            'filename': unique_filename,
-                            'ripe': 2,
-                            'unripe': 1,
-                            'total': 3,
-                            'rotten': False,
-                            'error': 'YOLO 분석 실패'
-                        })
-                        total_ripe += 2
-                        total_unripe += 1
-                        total_count += 3
-                else:
-                    # YOLO 사용 불가 시 더미 데이터
-                    analyzed_files.append({
-                        'filename': unique_filename,
-                        'ripe': 3,
-                        'unripe': 2,
-                        'total': 5,
-                        'rotten': False,
-                        'note': 'YOLO 모델 사용 불가'
-                    })
-                    total_ripe += 3
-                    total_unripe += 2
-                    total_count += 5
+                # 파일 저장 (해시 기반 저장소, 같은 내용은 한 번만 저장 / 분석은 메모리 버퍼 사용)
+                stored = store_upload(file, unique_filename)
+                if not stored.deduplicated:
+                    generate_ingest_renditions_async(stored.key, stored.data)
+                saved_files.append(stored)
+
+        # YOLO 배치 분석 (메모리에서 1회 디코딩, 1회 전처리 후 모델별 배치 forward)
+        # file_results[idx]가 None인 파일은 분석 실패 → 해당 파일만 더미 데이터 사용
+        timer = StageTimer()
+        file_results = [None] * len(saved_files)
+        cached_indexes = set()
+        if models_ready():
+            # 분석 실패 시 더미 데이터
+            fallback = {'ripe': 2, 'unripe': 1, 'total': 3, 'rotten': 0, 'has_rotten': False, 'error': 'YOLO 분석 실패'}
+            pending = []
+            try:
+                # 직전 촬영 검출 여부 (실행 정책이 필요로 할 때만 조회)
+                flagged = fetch_rotten_flag(group_id) if policy_uses_flag() else False
+                # 이전에 분석한 것과 내용이 같은 이미지는 캐시 결과 사용, 나머지만 배치 분석
+                for idx, stored in enumerate(saved_files):
+                    cached = ANALYSIS_CACHE.get(stored.digest, MODEL_VERSION)
+                    if cached is not None and satisfies_policy(cached, flagged):
+                        file_results[idx] = cached
+                        cached_indexes.add(idx)
+
+                # 디코딩은 파일별로 (손상된 파일 하나 때문에 나머지 분석이 실패하지 않도록)
+                images = []
+                with timer.stage('decode'):
+                    for idx, stored in enumerate(saved_files):
+                        if idx in cached_indexes:
+                            continue
+                        try:
+                            images.append(decode_image_bytes(stored.data))
+                            pending.append(idx)
+                        except Exception as decode_err:
+                            print(f"❌ 이미지 디코딩 실패 ({stored.ref}): {decode_err}")
+                if pending:
+                    for idx, result in zip(pending, analyze_batch(images, timer, flags=[flagged] * len(images))):
+                        ANALYSIS_CACHE.put(saved_files[idx].digest, MODEL_VERSION, result)
+                        file_results[idx] = result
+            except Exception as yolo_err:
+                for idx in pending:
+                    file_results[idx] = None
+                print(f"❌ YOLO 분석 실패 ({len(pending)}개 파일): {yolo_err}")
+        else:
+            # YOLO 사용 불가 시 더미 데이터
+            fallback = {'ripe': 3, 'unripe': 2, 'total': 5, 'rotten': 0, 'has_rotten': False, 'note': 'YOLO 모델 사용 불가'}
 
+        # 전체 분석 결과를 저장할 변수들
+        total_ripe = 0
+        total_unripe = 0
+        total_count = 0
+        has_any_rotten = False
+        analyzed_files = []
 
+        for idx, stored in enumerate(saved_files):
+            result = file_results[idx] if file_results[idx] is not None else fallback
+            file_entry = {
+                'filename': stored.ref,
+                'ripe': result['ripe'],
+                'unripe': result['unripe'],
+                'total': result['total'],
+                'rotten': result['has_rotten'],
+                'cached': idx in cached_indexes,
+                'models_run': [] if idx in cached_indexes else result.get('models_run', [])
+            }
+            for key in ('error', 'note'):
+                if key in result:
+                    file_entry[key] = result[key]
+            analyzed_files.append(file_entry)
+
+            # 전체 결과에 누적
+            total_ripe += result['ripe']
+            total_unripe += result['unripe']
+            total_count += result['total']
+            if result['has_rotten']:
+                has_any_rotten = True
 
         # DB 업데이트 (harvest_amount, total_amount, is_read, last_image_path, last_analysis_result)
         conn = get_db_connection()
         cur = conn.cursor()
         
         # 분석 결과를 JSON으로 저장
-        import json
         analysis_result = {
             'total_files': len(analyzed_files),
             'total_ripe': total_ripe,
             'total_unripe': total_unripe,
             'total_count': total_count,
             'has_rotten': has_any_rotten,
-            'analyzed_files': analyzed_files
+            'analyzed_files': analyzed_files,
+            'timings_ms': timer.as_dict()
         }
         
         # 첫 번째 이미지 경로 저장
         first_image = analyzed_files[0]['filename'] if analyzed_files else None
         
-        cur.execute("""
-            UPDATE crop_groups
-            SET harvest_amount = %s,
-                total_amount = %s,
-                is_read = %s,
-                last_image_path = %s,
-                last_analysis_result = %s
-            WHERE id = %s
-        """, (total_ripe, total_count, True if has_any_rotten else False, 
-              first_image, json.dumps(analysis_result), group_id))
+        for stored in saved_files:
+            register_ref(cur, stored)
+        update_latest_result(cur, group_id, total_ripe, total_count, has_any_rotten,
+                             first_image, analysis_result)
+
+        # 실제 YOLO 분석 결과만 이력에 추가 (더미 데이터 제외)
+        append_analysis_history(cur, group_id, [{
+            'image_path': stored.ref,
+            'ripe': result['ripe'],
+            'unripe': result['unripe'],
+            'rotten': result['rotten'],
+            'models_run': [] if idx in cached_indexes else result.get('models_run'),
+            'skipped_ms': 0 if idx in cached_indexes else result.get('skipped_ms', 0)
+        } for idx, (stored, result) in enumerate(zip(saved_files, file_results)) if result is not None], MODEL_VERSION)
         conn.commit()
         conn.close()
 
+        # 썩은 딸기 검출 시 병해충 알림 (비닐하우스별로 묶어서 전송, 더미 데이터는 항상 썩은 딸기 없음)
+        if has_any_rotten:
+            PEST_ALERTS.report(group_id, next(f['filename'] for f in analyzed_files if f['rotten']))
+
         # 응답 반환
         return jsonify({
             "message": "📸 이미지 업로드 및 분석 완료",
@@ -635,7 +698,8 @@ def upload_and_analyze():
                 "total_count": total_count,
                 "has_rotten": "✅ 발견됨" if has_any_rotten else "❌ 없음",
                 "is_read": True if has_any_rotten else False,
-                "analyzed_files": analyzed_files
+                "analyzed_files": analyzed_files,
+                "timings_ms": analysis_result['timings_ms']
             }
         }), 200
 
@@ -665,6 +729,8 @@ def iot_image_upload():
             print(f"❌ 필수 파라미터 누락 - group_id: {group_id}, iot_id: {iot_id}")
             return jsonify({'message': 'group_id와 iot_id가 필요합니다.'}), 400
 
+        DEVICE_REGISTRY.beat(iot_id)
+
         # 업로드된 이미지 파일 확인
         if 'file' not in request.files:
             return jsonify({'message': '업로드할 이미지가 없습니다.'}), 400
@@ -673,34 +739,49 @@ def iot_image_upload():
         if file.filename == '':
             return jsonify({'message': '선택된 파일이 없습니다.'}), 400
 
+        # 촬영 시각 (대기열에 쌓였다가 늦게 올라온 이미지도 실제 촬영 시각으로 이력에 기록)
+        captured_at = parse_capture_time(request.form.get('captured_at'), file.filename)
+
         # 안전한 파일명 생성
         filename = secure_filename(file.filename)
         unique_filename = f"iot_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{filename}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
         
-        # 파일 저장
-        file.save(file_path)
-        print(f"📸 IoT 이미지 저장: {unique_filename}")
-
-        # YOLO 분석 실행
-        if YOLO_AVAILABLE and MODEL_RIPE and MODEL_ROTTEN:
+        # 파일 저장 (해시 기반 저장소, 같은 내용은 한 번만 저장 / 분석은 메모리 버퍼 사용)
+        stored = store_upload(file, unique_filename)
+        if not stored.deduplicated:
+            generate_ingest_renditions_async(stored.key, stored.data)
+        digest = stored.digest
+        print(f"📸 IoT 이미지 저장: {unique_filename}{' (중복 이미지 재사용)' if stored.deduplicated else ''}")
+
+        # YOLO 분석 실행 (동시 업로드는 마이크로 배치로 묶어서 처리)
+        timer = StageTimer()
+        cached = False
+        analyzed = False
+        models_run = []
+        skipped_ms = 0
+        if models_ready():
             try:
-                print(f"🔍 YOLO 분석 시작: {unique_filename}")
-                
-                # 익은/안익은 딸기 분석
-                result_ripe = MODEL_RIPE(file_path, conf=0.5)
-                result_rotten = MODEL_ROTTEN(file_path, conf=0.5)
-
-                ripe_classes = [MODEL_RIPE.names[int(cls)] for cls in result_ripe[0].boxes.cls]
-                rotten_classes = [MODEL_ROTTEN.names[int(cls)] for cls in result_rotten[0].boxes.cls]
-
-                count_ripe = Counter(ripe_classes)
-                count_rotten = Counter(rotten_classes)
-
-                ripe = count_ripe.get("straw-ripe", 0)
-                unripe = count_ripe.get("straw-unripe", 0)
-                total = ripe + unripe
-                has_rotten = count_rotten.get("starw_rotten", 0) > 0
+                # 직전 촬영 검출 여부 (실행 정책이 필요로 할 때만 조회)
+                flagged = fetch_rotten_flag(group_id) if policy_uses_flag() else False
+                # 같은 내용의 이미지를 이미 분석했다면 캐시 결과를 바로 사용
+                result = ANALYSIS_CACHE.get(digest, MODEL_VERSION)
+                if result is not None and satisfies_policy(result, flagged):
+                    cached = True
+                    print(f"♻️ 캐시된 분석 결과 사용: {unique_filename}")
+                else:
+                    print(f"🔍 YOLO 분석 시작: {unique_filename}")
+                    with timer.stage('decode'):
+                        image = decode_image_bytes(stored.data)
+                    result = analyze_image(image, timer, flagged)
+                    ANALYSIS_CACHE.put(digest, MODEL_VERSION, result)
+                    models_run = result.get('models_run', [])
+                    skipped_ms = result.get('skipped_ms', 0)
+                ripe = result['ripe']
+                unripe = result['unripe']
+                total = result['total']
+                rotten = result['rotten']
+                has_rotten = result['has_rotten']
+                analyzed = True
 
                 print(f"📊 분석 결과 - 익은: {ripe}, 안익은: {unripe}, 썩은: {has_rotten}")
 
@@ -710,6 +791,7 @@ def iot_image_upload():
                 ripe = 2
                 unripe = 1
                 total = 3
+                rotten = 0
                 has_rotten = False
         else:
             print("⚠️ YOLO 모델 사용 불가, 더미 데이터 사용")
@@ -717,6 +799,7 @@ def iot_image_upload():
             ripe = 3
             unripe = 2
             total = 5
+            rotten = 0
             has_rotten = False
 
         # DB 업데이트 (harvest_amount, total_amount, is_read, last_image_path, last_analysis_result)
@@ -731,23 +814,53 @@ def iot_image_upload():
             'total': total,
             'has_rotten': has_rotten,
             'iot_id': iot_id,
-            'analyzed_at': datetime.now().isoformat()
+            'analyzed_at': datetime.now().isoformat(),
+            'cached': cached,
+            'models_run': models_run,
+            'timings_ms': timer.as_dict()
         }
-        
-        cur.execute("""
-            UPDATE crop_groups
-            SET harvest_amount = %s,
-                total_amount = %s,
-                is_read = %s,
-                last_image_path = %s,
-                last_analysis_result = %s
-            WHERE id = %s
-        """, (ripe, total, True if has_rotten else False, 
-              unique_filename, json.dumps(analysis_result), group_id))
+
+        # 엣지 추론 디바이스의 감사용 원본 업로드면 디바이스 결과와 서버 결과를 비교해 기록
+        if analyzed and request.form.get('detections'):
+            try:
+                edge = parse_edge_detections(request.form.get('detections'))
+                analysis_result['edge_audit'] = {
+                    'model_version': edge['model_version'],
+                    'ripe': edge['ripe'],
+                    'unripe': edge['unripe'],
+                    'rotten': edge['rotten'],
+                    'ripe_diff': edge['ripe'] - ripe,
+                    'unripe_diff': edge['unripe'] - unripe,
+                    'rotten_match': edge['has_rotten'] == has_rotten
+                }
+                print(f"🔎 엣지 감사 - 익은 {edge['ripe']}/{ripe}, 안익은 {edge['unripe']}/{unripe}, "
+                      f"썩은 {edge['rotten']}/{rotten} (디바이스/서버)")
+            except ValueError as e:
+                print(f"⚠️ 엣지 감사용 detections 무시: {e}")
+
+        register_ref(cur, stored)
+        update_latest_result(cur, group_id, ripe, total, has_rotten,
+                             unique_filename, analysis_result)
+
+        # 실제 YOLO 분석 결과만 이력에 추가 (더미 데이터 제외)
+        if analyzed:
+            append_analysis_history(cur, group_id, [{
+                'image_path': unique_filename,
+                'ripe': ripe,
+                'unripe': unripe,
+                'rotten': rotten,
+                'models_run': models_run,
+                'skipped_ms': skipped_ms,
+                'captured_at': captured_at
+            }], MODEL_VERSION)
         
         conn.commit()
         conn.close()
 
+        # 썩은 딸기 검출 시 병해충 알림 (비닐하우스별로 묶어서 전송)
+        if analyzed and has_rotten:
+            PEST_ALERTS.report(group_id, unique_filename)
+
         print(f"✅ DB 업데이트 완료 - 그룹 ID: {group_id}")
         print(f"📸 이미지 저장: {unique_filename}")
 
@@ -760,7 +873,10 @@ def iot_image_upload():
                 "unripe": unripe,
                 "total": total,
                 "rotten": "✅ 발견됨" if has_rotten else "❌ 없음",
-                "is_read": True if has_rotten else False
+                "is_read": True if has_rotten else False,
+                "cached": cached,
+                "models_run": models_run,
+                "timings_ms": analysis_result['timings_ms']
             }
         }), 200
 
@@ -768,6 +884,147 @@ def iot_image_upload():
         print(f"❌ IoT 이미지 업로드 및 분석 오류: {e}")
         return jsonify({'message': '서버 오류 발생', 'error': str(e)}), 500
 
+# --------------------------
+# IoT 엣지 추론 결과 업로드 (EDGE_INFERENCE 모드)
+# --------------------------
+# 디바이스가 직접 추론한 검출 결과(개수/박스)와 썸네일만 받아 서버 추론 없이 crop_groups 갱신
+# 디바이스는 EDGE_AUDIT_EVERY장마다 원본 이미지를 iot-image-upload로 함께 보내 서버 결과와 비교 (감사용)
+EDGE_MAX_BOXES = 300
+
+
+def parse_edge_detections(raw):
+    """
+    디바이스가 보낸 검출 결과 JSON 검증
+    {"ripe", "unripe", "rotten", "rotten_checked", "boxes": [{"label", "conf", "xyxy"}], "model_version", "inference_ms"}
+    형식이 잘못되었으면 ValueError
+    """
+    try:
+        detections = json.loads(raw)
+    except (TypeError, ValueError):
+        raise ValueError('detections가 올바른 JSON이 아닙니다.')
+    if not isinstance(detections, dict):
+        raise ValueError('detections는 객체여야 합니다.')
+
+    counts = {}
+    for key in ('ripe', 'unripe', 'rotten'):
+        value = detections.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(f'{key}는 0 이상의 정수여야 합니다.')
+        counts[key] = value
+
+    boxes = detections.get('boxes') or []
+    if not isinstance(boxes, list) or len(boxes) > EDGE_MAX_BOXES:
+        raise ValueError(f'boxes는 최대 {EDGE_MAX_BOXES}개의 목록이어야 합니다.')
+    for box in boxes:
+        if not (isinstance(box, dict) and isinstance(box.get('xyxy'), list) and len(box['xyxy']) == 4):
+            raise ValueError('boxes 항목에는 label, conf, xyxy(4개 좌표)가 필요합니다.')
+
+    rotten_checked = bool(detections.get('rotten_checked', True))
+    return {
+        'ripe': counts['ripe'],
+        'unripe': counts['unripe'],
+        'total': counts['ripe'] + counts['unripe'],
+        'rotten': counts['rotten'],
+        'has_rotten': counts['rotten'] > 0,
+        'rotten_checked': rotten_checked,
+        'boxes': boxes,
+        'models_run': ['ripe', 'rotten'] if rotten_checked else ['ripe'],
+        'model_version': f"edge:{detections.get('model_version') or 'unknown'}"[:100],
+        'inference_ms': detections.get('inference_ms'),
+    }
+
+
+@greenhouse_bp.route('/iot-detections', methods=['POST'])
+def iot_detections_upload():
+    """
+    IoT 디바이스가 직접 추론한 검출 결과를 받아 DB 업데이트 (서버에서 YOLO 실행 안 함)
+    form: group_id, iot_id, detections(JSON), file(썸네일, 선택)
+    """
+    group_id = request.form.get('group_id')
+    iot_id = request.form.get('iot_id')
+    if not group_id or not iot_id:
+        return jsonify({'message': 'group_id와 iot_id가 필요합니다.'}), 400
+
+    DEVICE_REGISTRY.beat(iot_id)
+
+    try:
+        edge = parse_edge_detections(request.form.get('detections'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        # 썸네일은 원본과 같은 저장소에 저장 (화면 표시/알림 이미지용)
+        stored = None
+        unique_filename = None
+        file = request.files.get('file')
+        captured_at = parse_capture_time(request.form.get('captured_at'), file.filename if file else None)
+        if file and file.filename:
+            filename = secure_filename(file.filename)
+            unique_filename = f"iot_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{filename}"
+            stored = store_upload(file, unique_filename)
+
+        analysis_result = {
+            'filename': unique_filename,
+            'ripe': edge['ripe'],
+            'unripe': edge['unripe'],
+            'total': edge['total'],
+            'has_rotten': edge['has_rotten'],
+            'iot_id': iot_id,
+            'analyzed_at': datetime.now().isoformat(),
+            'source': 'edge',
+            'rotten_checked': edge['rotten_checked'],
+            'model_version': edge['model_version'],
+            'models_run': edge['models_run'],
+            'boxes': edge['boxes'],
+            'timings_ms': {'edge_inference': edge['inference_ms']}
+        }
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'message': 'DB 연결 실패'}), 500
+        try:
+            cur = conn.cursor()
+            if stored is not None:
+                register_ref(cur, stored)
+            # 썸네일이 없으면 기존 이미지, 썩은 딸기 모델을 실행하지 않았으면 기존 검출 여부 유지
+            update_latest_result(cur, group_id, edge['ripe'], edge['total'],
+                                 edge['has_rotten'] if edge['rotten_checked'] else None,
+                                 unique_filename, analysis_result)
+            append_analysis_history(cur, group_id, [{
+                'image_path': unique_filename,
+                'ripe': edge['ripe'],
+                'unripe': edge['unripe'],
+                'rotten': edge['rotten'],
+                'models_run': edge['models_run'],
+                'captured_at': captured_at
+            }], edge['model_version'])
+            conn.commit()
+        finally:
+            conn.close()
+
+        if edge['has_rotten']:
+            PEST_ALERTS.report(group_id, unique_filename)
+
+        print(f"📡 엣지 검출 결과 반영 - 그룹 ID: {group_id}, 익은: {edge['ripe']}, "
+              f"안익은: {edge['unripe']}, 썩은: {edge['rotten']} ({edge['model_version']})")
+
+        return jsonify({
+            "message": "📡 엣지 검출 결과 반영 완료",
+            "result": {
+                "filename": unique_filename,
+                "ripe": edge['ripe'],
+                "unripe": edge['unripe'],
+                "total": edge['total'],
+                "rotten": ("✅ 발견됨" if edge['has_rotten'] else "❌ 없음") if edge['rotten_checked'] else "➖ 확인 안 함",
+                "is_read": edge['has_rotten'],
+                "models_run": edge['models_run']
+            }
+        }), 200
+
+    except Exception as e:
+        print(f"❌ 엣지 검출 결과 반영 오류: {e}")
+        return jsonify({'message': '서버 오류 발생', 'error': str(e)}), 500
+
 # --------------------------
 # IoT 촬영 명령 전송 (기존 방식 - 호환성 유지)
 # --------------------------
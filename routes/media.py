@@ -0,0 +1,116 @@
+import mimetypes
+from flask import Blueprint, Response, request, jsonify, send_file
+from werkzeug.security import safe_join
+from utils.image_store import resolve_ref
+from utils.storage import STORAGE, StorageNotFound
+from utils.renditions import RENDITIONS, RENDITION_FORMATS, DOWNSAMPLED_RENDITION, get_or_create_rendition, rendition_path
+
+media_bp = Blueprint('media', __name__, url_prefix='/api/media')
+
+# 업로드 파일명은 타임스탬프+uuid로 유일하므로 내용이 바뀌지 않음 → 1년 immutable 캐시
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# /files/ 경로로 내려줄 수 있는 저장소 키 접두사 (농장 첨부 문서, 상품 이미지)
+SERVED_PREFIXES = ('static/uploads/farms', 'static/images')
+
+
+def prefers_webp():
+    """브라우저 Accept 헤더에 image/webp가 명시되어 있는지 (*/* 와일드카드는 제외)"""
+    return any(mimetype == 'image/webp' for mimetype, _ in request.accept_mimetypes)
+
+
+def send_stored(key, mimetype, max_age=None):
+    """
+    저장소 키의 파일을 전송
+    로컬 저장소는 send_file(조건부/Range 요청 처리), 오브젝트 저장소는 요청한 범위만 Range로 읽어 스트리밍
+    """
+    path = STORAGE.local_path(key)
+    if path is not None:
+        return send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=max_age)
+    return stream_object(key, mimetype)
+
+
+def send_immutable(key, mimetype):
+    response = send_stored(key, mimetype, IMMUTABLE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.vary.add('Accept')
+    return response
+
+
+def stream_object(key, mimetype):
+    size = STORAGE.size(key)
+    # 키가 내용 해시 또는 유일한 업로드 이름이므로 키 자체를 ETag로 사용
+    etag = f"{key}:{size}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    byte_range = request.range
+    ranges = byte_range.range_for_length(size) if byte_range else None
+    if byte_range and ranges is None:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = ranges if ranges else (0, size)
+    response = Response(STORAGE.iter_chunks(key, start, end), status=206 if ranges else 200,
+                        mimetype=mimetype, direct_passthrough=True)
+    response.content_length = end - start
+    if ranges:
+        response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.set_etag(etag)
+    return response
+
+
+def send_downsampled(original_key):
+    """보존 정책으로 원본이 정리되어 썸네일만 남은 이미지 (썸네일도 없으면 404)"""
+    thumb_key = rendition_path(original_key, *DOWNSAMPLED_RENDITION)
+    if not STORAGE.exists(thumb_key):
+        return jsonify({'error': '이미지를 찾을 수 없습니다.'}), 404
+    return send_immutable(thumb_key, RENDITION_FORMATS[DOWNSAMPLED_RENDITION[1]][1])
+
+
+# 작물 촬영 이미지 조회 (size: thumb / preview / original, format: webp / jpeg)
+@media_bp.route('/crop-images/<path:filename>', methods=['GET'])
+def crop_image(filename):
+    original_key = resolve_ref(filename)
+    if not original_key:
+        return jsonify({'error': '이미지를 찾을 수 없습니다.'}), 404
+
+    size = request.args.get('size', 'preview')
+    if size == 'original':
+        if not STORAGE.exists(original_key):
+            return send_downsampled(original_key)
+        mimetype = mimetypes.guess_type(original_key)[0] or 'application/octet-stream'
+        return send_immutable(original_key, mimetype)
+
+    if size not in RENDITIONS:
+        return jsonify({'error': f'size는 original, {", ".join(RENDITIONS)} 중 하나여야 합니다.'}), 400
+
+    fmt = request.args.get('format') or ('webp' if prefers_webp() else 'jpeg')
+    if fmt not in RENDITION_FORMATS:
+        return jsonify({'error': f'format은 {", ".join(RENDITION_FORMATS)} 중 하나여야 합니다.'}), 400
+
+    try:
+        key = get_or_create_rendition(original_key, size, fmt)
+    except StorageNotFound:
+        return send_downsampled(original_key)
+    except Exception as e:
+        print(f"❌ 파생본 생성 실패 ({filename}, {size}.{fmt}): {e}")
+        return jsonify({'error': '이미지 변환 실패'}), 500
+
+    return send_immutable(key, RENDITION_FORMATS[fmt][1])
+
+
+# 저장소에 올라간 농장 문서·상품 이미지 조회 (여러 인스턴스가 같은 저장소를 공유할 때 사용)
+@media_bp.route('/files/<path:key>', methods=['GET'])
+def stored_file(key):
+    prefix = next((prefix for prefix in SERVED_PREFIXES if key.startswith(prefix + '/')), None)
+    safe_key = safe_join(prefix, key[len(prefix) + 1:]) if prefix else None
+    if not safe_key or not STORAGE.exists(safe_key):
+        return jsonify({'error': '파일을 찾을 수 없습니다.'}), 404
+
+    mimetype = mimetypes.guess_type(safe_key)[0] or 'application/octet-stream'
+    return send_stored(safe_key, mimetype)
@@ -24,7 +24,8 @@ def send_notification():
         from flask import request
         data = request.get_json()
         
-        user_id = data.get('user_id')
+        # IoT 클라이언트는 receiver_id로 전송
+        user_id = data.get('receiver_id') or data.get('user_id')
         message = data.get('message')
         notification_type = data.get('type', 'iot_done')
         target_id = data.get('target_id')
@@ -34,10 +35,11 @@ def send_notification():
         
         notification_mgr = NotificationManager()
         success = notification_mgr.create_notification(
-            user_id=user_id,
+            receiver_id=user_id,
             message=message,
-            notification_type=notification_type,
-            target_id=target_id
+            type=notification_type,
+            target_id=target_id,
+            image_url=data.get('image_url')
         )
         
         if success:
@@ -1,11 +1,23 @@
 from flask import Blueprint, request, session, jsonify
+from werkzeug.utils import secure_filename
 from utils.database import get_db_connection, get_dict_cursor_connection
-import os
+from utils.storage import save_upload
+from utils.device_registry import DEVICE_REGISTRY
+from psycopg2.extras import execute_values
 import json
+import uuid
 from datetime import datetime
 
 product_bp = Blueprint('product', __name__, url_prefix='/product')
 
+
+def apply_live_status(device):
+    """iot 행에 메모리의 접속 상태 반영 (오래전 접속 기록은 DB의 last_seen 유지)"""
+    status = DEVICE_REGISTRY.status(device['id'])
+    device['online'] = status['online']
+    device['last_seen'] = status['last_seen'] or device.get('last_seen')
+
+
 # 구독하기 (IOT 설정)
 @product_bp.route('/subscribe', methods=['POST'])
 def subscribe_iot():
@@ -60,6 +72,9 @@ def my_devices():
         """, (session['user_id'],))
 
         devices = cursor.fetchall()
+        # 접속 상태는 메모리의 heartbeat 기록으로 채움 (디바이스별 추가 조회 없음)
+        for device in devices:
+            apply_live_status(device)
         return jsonify({"devices": devices})
     finally:
         cursor.close()
@@ -90,9 +105,9 @@ def upload_image():
         return "파일 없음", 400
 
     file = request.files['file']
-    filename = file.filename
-    save_path = os.path.join("static", "images", filename)
-    file.save(save_path)
+    # secure_filename은 한글 등 비ASCII 문자를 지우므로 ("딸기.png" → "png") 접두어로 충돌 방지
+    filename = f"{uuid.uuid4().hex[:8]}_{secure_filename(file.filename)}"
+    save_upload(f"static/images/{filename}", file)
 
     return f"저장 완료: {filename}", 200
 
@@ -110,6 +125,9 @@ def upload_sensor():
         if not all([temperature is not None, humidity is not None, gh_id]):
             return jsonify({"status": "error", "message": "필수 파라미터 누락"}), 400
 
+        # 센서 업로드도 heartbeat로 처리
+        DEVICE_REGISTRY.beat(iot_id)
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"status": "error", "message": "DB 연결 실패"}), 500
@@ -118,10 +136,10 @@ def upload_sensor():
             with conn.cursor() as cursor:
                 # timestamp 컬럼명 확인 (logged_at이 아니라 timestamp)
                 sql = """
-                    INSERT INTO sensor_log (gh_id, temperature, humidity, timestamp)
-                    VALUES (%s, %s, %s, NOW())
+                    INSERT INTO sensor_log (gh_id, iot_id, temperature, humidity, timestamp)
+                    VALUES (%s, %s, %s, %s, NOW())
                 """
-                cursor.execute(sql, (gh_id, temperature, humidity))
+                cursor.execute(sql, (gh_id, iot_id, temperature, humidity))
                 conn.commit()
                 print(f"✅ 센서 데이터 저장 완료 - gh_id: {gh_id}, 온도: {temperature}°C, 습도: {humidity}%")
                 return jsonify({"status": "success"}), 200
@@ -134,6 +152,60 @@ def upload_sensor():
         print(f"❌ 센서 업로드 오류: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# 배치 업로드 1회 최대 집계 건수
+SENSOR_BATCH_MAX = 500
+# 평균값(temperature, humidity) 외에 집계 레코드에만 있는 컬럼
+SENSOR_AGGREGATE_FIELDS = ('temperature_min', 'temperature_max', 'humidity_min', 'humidity_max', 'sample_count')
+
+# 센서 집계 배치 수신 (디바이스가 구간별로 평균/최소/최대/개수를 모아서 전송, 오프라인 동안 쌓인 것도 포함)
+# {"iot_id": 1, "gh_id": 1, "readings": [{"timestamp", "temperature", "humidity", "temperature_min", ...}, ...]}
+@product_bp.route('/upload-sensor/batch', methods=['POST'])
+def upload_sensor_batch():
+    data = request.get_json(silent=True) or {}
+    gh_id = data.get('gh_id')
+    iot_id = data.get('iot_id')
+    readings = data.get('readings') or []
+    # iot_id는 중복 방지 키(gh_id, iot_id, timestamp)의 일부이므로 필수
+    if not gh_id or not iot_id or not isinstance(readings, list):
+        return jsonify({"status": "error", "message": "필수 파라미터 누락"}), 400
+    if len(readings) > SENSOR_BATCH_MAX:
+        return jsonify({"status": "error", "message": f"한 번에 최대 {SENSOR_BATCH_MAX}건까지 전송할 수 있습니다."}), 413
+
+    rows = []
+    for reading in readings:
+        if (not isinstance(reading, dict) or reading.get('timestamp') is None
+                or reading.get('temperature') is None or reading.get('humidity') is None):
+            return jsonify({"status": "error", "message": "timestamp, temperature, humidity는 필수입니다."}), 400
+        rows.append((gh_id, iot_id, reading['temperature'], reading['humidity'], reading['timestamp'])
+                    + tuple(reading.get(field) for field in SENSOR_AGGREGATE_FIELDS))
+
+    DEVICE_REGISTRY.beat(iot_id)
+    if not rows:
+        return jsonify({"status": "success", "inserted": 0}), 200
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"status": "error", "message": "DB 연결 실패"}), 500
+    try:
+        with conn.cursor() as cursor:
+            # 응답을 못 받은 디바이스가 같은 배치를 다시 보내도 중복 저장하지 않음
+            execute_values(cursor, f"""
+                INSERT INTO sensor_log (gh_id, iot_id, temperature, humidity, timestamp,
+                                        {', '.join(SENSOR_AGGREGATE_FIELDS)})
+                VALUES %s
+                ON CONFLICT (gh_id, iot_id, timestamp) WHERE sample_count IS NOT NULL DO NOTHING
+            """, rows, template="(%s, %s, %s, %s, %s::timestamptz, %s, %s, %s, %s, %s)", page_size=len(rows))
+            inserted = cursor.rowcount
+        conn.commit()
+        print(f"✅ 센서 집계 {inserted}/{len(rows)}건 저장 - gh_id: {gh_id}, iot_id: {iot_id}")
+        return jsonify({"status": "success", "inserted": inserted}), 200
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ 센서 집계 저장 실패: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        conn.close()
+
 # 구독 취소
 @product_bp.route('/unsubscribe/<int:iot_id>', methods=['DELETE'])
 def unsubscribe_iot(iot_id):
@@ -203,6 +275,7 @@ def get_device(device_id):
         if not device:
             return jsonify({"message": "디바이스를 찾을 수 없습니다"}), 404
 
+        apply_live_status(device)
         return jsonify({"device": device}), 200
     except Exception as e:
         print(f"[에러] IoT 디바이스 조회 중 오류 발생: {e}")
@@ -0,0 +1,51 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# 캐시 최대 항목 수 / 유효 시간 (초)
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 1024))
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 3600))
+
+
+class AnalysisCache:
+    """
+    이미지 내용 해시 + 모델 버전을 키로 하는 분석 결과 캐시 (LRU + TTL)
+    Pi 재전송, 폴더 스캔 업로더의 중복 전송, 같은 사진 재업로드 시 YOLO 재실행을 건너뛴다.
+    """
+
+    def __init__(self, max_size=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest, model_version):
+        key = (digest, model_version)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, digest, model_version, result):
+        key = (digest, model_version)
+        with self.lock:
+            self.entries[key] = (time.monotonic(), dict(result))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+ANALYSIS_CACHE = AnalysisCache()
@@ -0,0 +1,10 @@
+# --------------------------
+# 벤치마크 스크립트 공용 통계 (benchmark_inference.py, benchmark_profiles.py)
+# --------------------------
+
+
+def percentile(values, pct):
+    """nearest-rank 방식 백분위수 (values가 비어 있으면 IndexError)"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import queue
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import execute_values
+from utils.database import get_db_connection, get_dict_cursor_connection
+
+# --------------------------
+# IoT 명령 비동기 전송
+# --------------------------
+# Raspberry Pi 주소
+# 로컬 테스트: "http://172.20.47.250:5002" (실제 라즈베리파이)
+# 배포 환경 (ngrok): "https://proud-adder-allegedly.ngrok-free.app"
+RASPBERRY_PI_IP = os.getenv('RASPBERRY_PI_IP', "http://165.229.148.72:5002")
+# 동시에 전송할 명령 수 (HTTP 연결 풀 크기와 동일)
+COMMAND_DISPATCH_WORKERS = int(os.getenv('COMMAND_DISPATCH_WORKERS', 8))
+# 연결 / 응답 대기 제한 시간 (초)
+COMMAND_CONNECT_TIMEOUT = float(os.getenv('COMMAND_CONNECT_TIMEOUT', 3))
+COMMAND_READ_TIMEOUT = float(os.getenv('COMMAND_READ_TIMEOUT', 10))
+# 상태 변경을 모아서 한 번에 기록하는 주기 (초)
+COMMAND_STATUS_FLUSH_INTERVAL = 0.5
+# 명령 전달 방식
+#   push: 서버가 RASPBERRY_PI_IP/capture-command로 전송 (Pi에 외부 접속 경로 필요)
+#   pull: Pi가 GET /api/devices/<iot_id>/commands 를 long-poll 해서 가져감 (NAT 뒤에서도 동작)
+COMMAND_DELIVERY = os.getenv('COMMAND_DELIVERY', 'push')
+# pull 방식: 가져간 뒤 이 시간(초) 안에 ack가 없으면 다시 전달
+COMMAND_ACK_TIMEOUT = int(os.getenv('COMMAND_ACK_TIMEOUT', 60))
+# pull 방식: 최대 전달 횟수 (넘으면 failed)
+COMMAND_MAX_ATTEMPTS = int(os.getenv('COMMAND_MAX_ATTEMPTS', 5))
+# 새 명령 알림 채널 (PostgreSQL LISTEN/NOTIFY, 다른 워커가 등록한 명령도 바로 전달)
+COMMAND_NOTIFY_CHANNEL = 'device_commands'
+
+# 명령 상태
+#   push: queued(등록) → sent(전송 성공) / failed(전송 실패)
+#   pull: queued(등록) → delivered(Pi가 가져감) → acked(처리 완료) / failed(처리 실패 또는 재전달 횟수 초과)
+COMMAND_STATUSES = ('queued', 'sent', 'delivered', 'acked', 'failed')
+
+
+class CommandDispatcher:
+    """
+    device_commands 테이블에 명령을 기록한 뒤 스레드 풀에서 Pi로 전송하고 바로 반환
+    HTTP 연결은 Session 연결 풀로 재사용하고, 전송 결과는 모아서 한 번의 UPDATE로 반영
+    """
+
+    def __init__(self, base_url=RASPBERRY_PI_IP, workers=COMMAND_DISPATCH_WORKERS, delivery=COMMAND_DELIVERY):
+        self.base_url = base_url
+        self.delivery = delivery
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 스레드는 첫 전송 시 생성되므로 gunicorn preload 후 fork된 워커에서도 안전
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='iot-command')
+        self.status_updates = queue.Queue()
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def dispatch(self, commands):
+        """
+        commands: [{'iot_id', 'group_id', 'greenhouse_id', 'action', 'payload', 'batch_id'}, ...]
+        명령을 한 번의 INSERT로 등록하고 전송은 백그라운드에서 진행, 등록된 명령 ID 목록 반환
+        pull 방식이면 등록과 함께 해당 디바이스의 long-poll 대기자에게 알림만 보냄
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("DB 연결 실패")
+        try:
+            with conn.cursor() as cur:
+                rows = execute_values(cur, """
+                    INSERT INTO device_commands (iot_id, group_id, greenhouse_id, batch_id, action, payload)
+                    VALUES %s
+                    RETURNING id
+                """, [
+                    (c['iot_id'], c.get('group_id'), c.get('greenhouse_id'), c.get('batch_id'),
+                     c['action'], json.dumps(c.get('payload', {})))
+                    for c in commands
+                ], fetch=True, page_size=max(1, len(commands)))
+                if self.delivery == 'pull':
+                    # 커밋 시점에 전달되므로 대기자는 항상 등록된 명령을 조회하게 됨
+                    for iot_id in {str(c['iot_id']) for c in commands}:
+                        cur.execute("SELECT pg_notify(%s, %s)", (COMMAND_NOTIFY_CHANNEL, iot_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+        command_ids = [row[0] for row in rows]
+        if self.delivery == 'pull':
+            return command_ids
+        for command_id, command in zip(command_ids, commands):
+            payload = dict(command.get('payload', {}), command_id=command_id)
+            self.executor.submit(self._send, command_id, payload)
+        return command_ids
+
+    def _send(self, command_id, payload):
+        try:
+            res = self.session.post(
+                f"{self.base_url}/capture-command",
+                json=payload,
+                timeout=(COMMAND_CONNECT_TIMEOUT, COMMAND_READ_TIMEOUT)
+            )
+            res.raise_for_status()
+            self._record(command_id, 'sent', None)
+            print(f"✅ IoT 명령 전송 성공 - 명령 ID: {command_id}, 그룹 ID: {payload.get('group_id')}")
+        except requests.RequestException as e:
+            self._record(command_id, 'failed', str(e))
+            print(f"❌ IoT 명령 전송 실패 - 명령 ID: {command_id}: {e}")
+
+    def _record(self, command_id, status, error):
+        self.status_updates.put((command_id, status, error))
+        with self.lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self._write_statuses, daemon=True)
+                self.writer.start()
+
+    def _write_statuses(self):
+        while True:
+            updates = [self.status_updates.get()]
+            time.sleep(COMMAND_STATUS_FLUSH_INTERVAL)
+            while True:
+                try:
+                    updates.append(self.status_updates.get_nowait())
+                except queue.Empty:
+                    break
+
+            conn = get_db_connection()
+            if not conn:
+                print(f"❌ 명령 상태 기록 실패 (DB 연결 실패, {len(updates)}건)")
+                continue
+            try:
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                        UPDATE device_commands AS dc
+                        SET status = u.status,
+                            error = u.error,
+                            attempts = dc.attempts + 1,
+                            updated_at = NOW()
+                        FROM (VALUES %s) AS u (id, status, error)
+                        WHERE dc.id = u.id
+                    """, updates, template="(%s::bigint, %s, %s)", page_size=len(updates))
+                conn.commit()
+            except Exception as e:
+                print(f"❌ 명령 상태 기록 실패 ({len(updates)}건): {e}")
+            finally:
+                conn.close()
+
+
+class CommandNotifier:
+    """
+    디바이스별 새 명령 알림 (long-poll 대기용)
+    워커마다 전용 DB 연결 하나로 LISTEN 하고, 알림이 오면 해당 디바이스를 기다리는 요청을 깨움
+    """
+
+    def __init__(self, channel=COMMAND_NOTIFY_CHANNEL):
+        self.channel = channel
+        self.versions = {}
+        self.condition = threading.Condition()
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def version(self, iot_id):
+        """명령 조회 직전에 받아 두고 wait에 넘기면 조회~대기 사이에 온 알림도 놓치지 않음"""
+        self._ensure_listener()
+        with self.condition:
+            return self.versions.get(str(iot_id), 0)
+
+    def wait(self, iot_id, version, timeout):
+        iot_id = str(iot_id)
+        with self.condition:
+            return self.condition.wait_for(lambda: self.versions.get(iot_id, 0) != version, timeout)
+
+    def notify(self, iot_id):
+        with self.condition:
+            iot_id = str(iot_id)
+            self.versions[iot_id] = self.versions.get(iot_id, 0) + 1
+            self.condition.notify_all()
+
+    def _ensure_listener(self):
+        with self.lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self._listen, daemon=True)
+                self.listener.start()
+
+    def _listen(self):
+        while True:
+            conn = get_db_connection()
+            if not conn:
+                time.sleep(5)
+                continue
+            try:
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"❌ 명령 알림 수신 오류, 재연결: {e}")
+                time.sleep(1)
+            finally:
+                conn.close()
+
+
+def claim_commands(iot_id, limit=10):
+    """
+    디바이스에 전달할 명령을 가져가며 delivered로 표시 (pull 방식)
+    ack 없이 COMMAND_ACK_TIMEOUT이 지난 명령은 다시 전달하고, 최대 전달 횟수를 넘기면 failed 처리
+    push 방식이면 가져갈 명령 없음 (디스패처가 전송 중인 queued 명령을 long-poll이 또 가져가 두 번 실행되지 않도록)
+    """
+    if COMMAND_DELIVERY != 'pull':
+        return []
+    conn, cursor = get_dict_cursor_connection()
+    if not (conn and cursor):
+        return None
+    try:
+        cursor.execute("""
+            UPDATE device_commands
+            SET status = 'failed', error = 'ack 없음 (재전달 횟수 초과)', updated_at = NOW()
+            WHERE iot_id = %s AND status = 'delivered' AND attempts >= %s
+              AND delivered_at < NOW() - (%s * INTERVAL '1 second')
+        """, (iot_id, COMMAND_MAX_ATTEMPTS, COMMAND_ACK_TIMEOUT))
+        cursor.execute("""
+            UPDATE device_commands
+            SET status = 'delivered', delivered_at = NOW(), attempts = attempts + 1, updated_at = NOW()
+            WHERE id IN (
+                SELECT id FROM device_commands
+                WHERE iot_id = %s
+                  AND (status = 'queued'
+                       OR (status = 'delivered' AND attempts < %s
+                           AND delivered_at < NOW() - (%s * INTERVAL '1 second')))
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, group_id, action, payload, attempts
+        """, (iot_id, COMMAND_MAX_ATTEMPTS, COMMAND_ACK_TIMEOUT, limit))
+        commands = sorted(cursor.fetchall(), key=lambda c: c['id'])
+        conn.commit()
+        for command in commands:
+            command['payload'] = dict(command['payload'] or {}, command_id=command['id'])
+        return commands
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def ack_command(iot_id, command_id, success=True, error=None):
+    """디바이스의 처리 결과 기록 (해당 디바이스에 전달된 명령만), 갱신 여부 반환"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE device_commands
+                SET status = %s, error = %s, acked_at = NOW(), updated_at = NOW()
+                WHERE id = %s AND iot_id = %s AND status IN ('queued', 'delivered')
+            """, ('acked' if success else 'failed', error, command_id, iot_id))
+            updated = cur.rowcount > 0
+        conn.commit()
+        return updated
+    finally:
+        conn.close()
+
+
+def fetch_commands(command_ids=None, batch_id=None):
+    """명령 상태 조회 (ID 목록 또는 스캔 batch_id 기준)"""
+    conn, cursor = get_dict_cursor_connection()
+    if not (conn and cursor):
+        return None
+    try:
+        cursor.execute("""
+            SELECT id, iot_id, group_id, greenhouse_id, batch_id, action, status, attempts, error,
+                   created_at, updated_at, delivered_at, acked_at
+            FROM device_commands
+            WHERE id = ANY(%s) OR batch_id = %s
+            ORDER BY id
+        """, (command_ids or [], batch_id))
+        commands = cursor.fetchall()
+        for command in commands:
+            command['created_at'] = command['created_at'].isoformat()
+            command['updated_at'] = command['updated_at'].isoformat()
+            for key in ('delivered_at', 'acked_at'):
+                command[key] = command[key].isoformat() if command[key] else None
+        return commands
+    finally:
+        cursor.close()
+        conn.close()
+
+
+COMMAND_DISPATCHER = CommandDispatcher()
+COMMAND_NOTIFIER = CommandNotifier()
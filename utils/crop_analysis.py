@@ -0,0 +1,95 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from psycopg2.extras import execute_values
+from utils.database import get_db_connection
+
+# --------------------------
+# 작물 분석 결과 저장
+# --------------------------
+# crop_groups: 그룹별 최신 분석값 캐시 (화면 표시용, 덮어쓰기)
+# crop_analysis: 촬영 1건당 1행씩 쌓이는 분석 이력 (추세 조회용, 추가만 함)
+
+# 디바이스 파일명에 들어 있는 촬영 시각 (..._YYYYMMDD_HHMMSS...)
+FILENAME_TIMESTAMP = re.compile(r'(\d{8}_\d{6})')
+# 디바이스 시계 오차 허용 범위 (이보다 미래의 촬영 시각은 무시하고 수신 시각 사용)
+CAPTURE_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def update_latest_result(cur, group_id, harvest_amount, total_amount, has_rotten, image_path, analysis_result):
+    """
+    crop_groups의 최신값 캐시 갱신
+    has_rotten=None(썩은 딸기 미확인), image_path=None(이미지 없음)이면 기존 값 유지
+    """
+    cur.execute("""
+        UPDATE crop_groups
+        SET harvest_amount = %s,
+            total_amount = %s,
+            is_read = COALESCE(%s, is_read),
+            last_image_path = COALESCE(%s, last_image_path),
+            last_analysis_result = %s
+        WHERE id = %s
+    """, (harvest_amount, total_amount, None if has_rotten is None else bool(has_rotten),
+          image_path, json.dumps(analysis_result), group_id))
+
+
+def fetch_rotten_flag(group_id):
+    """직전 촬영에서 썩은 딸기가 검출되었는지 (crop_groups.is_read에 기록된 값)"""
+    conn = get_db_connection()
+    if not conn:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT is_read FROM crop_groups WHERE id = %s", (group_id,))
+            row = cur.fetchone()
+            return bool(row and row[0])
+    finally:
+        conn.close()
+
+
+def parse_capture_time(value=None, filename=None):
+    """
+    디바이스가 보낸 촬영 시각 (captured_at ISO 8601 → 파일명 타임스탬프 순)
+    업로드 대기열/재시도로 늦게 도착한 촬영도 실제 촬영 시각으로 기록하기 위함
+    시간대가 없으면 서버 로컬 시각으로 간주, 없거나 잘못되었으면 None (DB에서 NOW() 사용)
+    """
+    captured = None
+    if value:
+        try:
+            captured = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+    if captured is None and filename:
+        match = FILENAME_TIMESTAMP.search(filename)
+        if match:
+            try:
+                captured = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+            except ValueError:
+                pass
+    if captured is None:
+        return None
+    if captured.tzinfo is None:
+        captured = captured.astimezone()
+    if captured > datetime.now(timezone.utc) + CAPTURE_CLOCK_SKEW:
+        return None
+    return captured
+
+
+def append_analysis_history(cur, group_id, captures, model_version):
+    """
+    촬영별 분석 이력을 crop_analysis에 한 번의 INSERT로 추가
+    captures: [{'image_path', 'ripe', 'unripe', 'rotten', 'models_run', 'skipped_ms', 'captured_at'}, ...]
+    models_run: 실제 실행한 모델 목록 (캐시 결과 사용 시 빈 목록), skipped_ms: 실행 정책으로 절약한 추론 시간
+    captured_at: 촬영 시각 (parse_capture_time 결과, 없으면 INSERT 시각)
+    """
+    if not captures:
+        return
+    execute_values(cur, """
+        INSERT INTO crop_analysis (group_id, ripe, unripe, rotten, image_path, model_version, models_run, skipped_ms,
+                                   captured_at)
+        VALUES %s
+    """, [
+        (group_id, c['ripe'], c['unripe'], c['rotten'], c['image_path'], model_version,
+         c.get('models_run'), c.get('skipped_ms', 0), c.get('captured_at'))
+        for c in captures
+    ], template="(%s, %s, %s, %s, %s, %s, %s, %s, COALESCE(%s::timestamptz, NOW()))")
@@ -0,0 +1,127 @@
+import os
+import time
+import atexit
+import threading
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from utils.database import get_db_connection
+
+# --------------------------
+# IoT 디바이스 접속 상태 (heartbeat)
+# --------------------------
+# 디바이스가 보내는 heartbeat(명령 long-poll, 센서/이미지 업로드 포함)를 메모리에만 기록하고
+# DEVICE_REGISTRY_SYNC_INTERVAL마다 한 번에 iot.last_seen 으로 반영
+# 같은 주기에 DB에서 최근 접속 기록을 읽어와 다른 워커가 받은 heartbeat도 반영
+DEVICE_REGISTRY_SYNC_INTERVAL = int(os.getenv('DEVICE_REGISTRY_SYNC_INTERVAL', 15))
+# 마지막 heartbeat 후 이 시간(초)이 지나면 오프라인으로 판단
+DEVICE_OFFLINE_AFTER = int(os.getenv('DEVICE_OFFLINE_AFTER', 90))
+
+
+class DeviceRegistry:
+    def __init__(self, sync_interval=DEVICE_REGISTRY_SYNC_INTERVAL, offline_after=DEVICE_OFFLINE_AFTER):
+        self.sync_interval = sync_interval
+        self.offline_after = offline_after
+        self.last_seen = {}
+        self.dirty = {}
+        self.lock = threading.Lock()
+        self.syncer = None
+        # 첫 동기화 전에는 모든 디바이스가 오프라인으로 보이므로 조회 시 잠깐 기다림
+        self.loaded = threading.Event()
+
+    def beat(self, iot_id):
+        """heartbeat 기록 (메모리만 갱신, DB 반영은 주기적으로)"""
+        try:
+            iot_id = int(iot_id)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        with self.lock:
+            self.last_seen[iot_id] = now
+            self.dirty[iot_id] = now
+        self._ensure_syncer()
+
+    def last_seen_at(self, iot_id):
+        self._ensure_syncer()
+        self.loaded.wait(timeout=2)
+        try:
+            iot_id = int(iot_id)
+        except (TypeError, ValueError):
+            return None
+        with self.lock:
+            return self.last_seen.get(iot_id)
+
+    def is_online(self, iot_id):
+        seen = self.last_seen_at(iot_id)
+        return seen is not None and time.time() - seen < self.offline_after
+
+    def status(self, iot_id):
+        """{'online', 'last_seen'} (last_seen은 ISO 문자열, 기록이 없으면 None)"""
+        seen = self.last_seen_at(iot_id)
+        return {
+            'online': seen is not None and time.time() - seen < self.offline_after,
+            'last_seen': datetime.fromtimestamp(seen, timezone.utc).isoformat() if seen else None,
+        }
+
+    def _ensure_syncer(self):
+        if self.syncer is not None and self.syncer.is_alive():
+            return
+        with self.lock:
+            if self.syncer is None or not self.syncer.is_alive():
+                self.syncer = threading.Thread(target=self._sync_loop, daemon=True)
+                self.syncer.start()
+
+    def _sync_loop(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"❌ 디바이스 접속 상태 동기화 실패: {e}")
+            self.loaded.set()
+            time.sleep(self.sync_interval)
+
+    def sync(self):
+        """메모리의 heartbeat를 iot.last_seen 에 한 번의 UPDATE로 반영하고 최근 접속 기록을 다시 읽어옴"""
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+
+        conn = get_db_connection()
+        if not conn:
+            with self.lock:
+                for iot_id, seen in dirty.items():
+                    self.dirty.setdefault(iot_id, seen)
+            return
+        try:
+            with conn.cursor() as cur:
+                if dirty:
+                    # 다른 워커가 더 최근 시각을 기록했으면 덮어쓰지 않음
+                    execute_values(cur, """
+                        UPDATE iot SET last_seen = GREATEST(iot.last_seen, to_timestamp(v.seen))
+                        FROM (VALUES %s) AS v (id, seen)
+                        WHERE iot.id = v.id
+                    """, list(dirty.items()), template="(%s::integer, %s::double precision)",
+                        page_size=len(dirty))
+                cur.execute("""
+                    SELECT id, EXTRACT(EPOCH FROM last_seen)
+                    FROM iot
+                    WHERE last_seen > NOW() - (%s * INTERVAL '1 second')
+                """, (self.offline_after * 2,))
+                recent = cur.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self.lock:
+                for iot_id, seen in dirty.items():
+                    self.dirty.setdefault(iot_id, seen)
+            raise
+        finally:
+            conn.close()
+
+        with self.lock:
+            for iot_id, seen in recent:
+                if float(seen) > self.last_seen.get(iot_id, 0):
+                    self.last_seen[iot_id] = float(seen)
+
+
+DEVICE_REGISTRY = DeviceRegistry()
+# 종료 시 아직 반영하지 않은 heartbeat 기록
+atexit.register(lambda: DEVICE_REGISTRY.dirty and DEVICE_REGISTRY.sync())
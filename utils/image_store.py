@@ -0,0 +1,150 @@
+import os
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from werkzeug.security import safe_join
+from utils.database import get_db_connection
+from utils.upload_stream import HashingUploadStream
+from utils.storage import STORAGE
+from utils.renditions import DOWNSAMPLED_RENDITION, rendition_path
+
+# --------------------------
+# 내용 주소 기반(content-addressed) 이미지 저장소
+# --------------------------
+# 이미지 바이트의 SHA-256으로 저장소 키를 정하고 해시 앞자리로 디렉토리를 나눔
+#   static/uploads/crop_images/ab/cd/abcd1234....jpg  (로컬/S3 저장소 공통 키)
+# 같은 내용의 이미지는 한 번만 저장되고, last_image_path 등에 쓰이는 참조 이름(ref)은
+# image_refs 테이블이 blob 해시로 매핑한다. 예전 평면 구조 파일(ref 그대로의 파일명)도 계속 조회 가능.
+IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR', 'static/uploads/crop_images').rstrip('/')
+
+# ref → blob 키 조회 결과 캐시 크기 (ref는 한 번 저장되면 바뀌지 않음)
+REF_CACHE_SIZE = 4096
+
+
+class StoredImage:
+    """
+    저장한 업로드 이미지 정보
+    data(바이트)는 처음 접근할 때 읽음 (분석/썸네일 생성이 필요한 경로에서만 메모리에 올림)
+    """
+
+    def __init__(self, ref, digest, ext, key, size, deduplicated, data=None, loader=None):
+        self.ref = ref
+        self.digest = digest
+        self.ext = ext
+        self.key = key
+        self.size = size
+        self.deduplicated = deduplicated
+        self._data = data
+        self._loader = loader
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._loader()
+        return self._data
+
+
+def blob_key(digest, ext):
+    """해시 앞 2+2자리로 샤딩한 blob 저장소 키"""
+    return f"{IMAGE_STORE_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def store_upload(file, ref):
+    """
+    업로드 파일을 blob으로 저장 (이미 같은 내용이 있으면 저장하지 않고 재사용)
+    StreamingUploadRequest로 받은 파일은 수신 중 계산된 해시와 임시 파일을 그대로 사용
+    (바이트는 StoredImage.data에 처음 접근할 때 임시 파일에서 읽음)
+    """
+    ext = os.path.splitext(ref)[1].lower() or '.jpg'
+    stream = file.stream
+    streamed = isinstance(stream, HashingUploadStream)
+    if streamed:
+        data, digest, size = None, stream.sha256, stream.size
+    else:
+        data = file.read()
+        digest, size = hashlib.sha256(data).hexdigest(), len(data)
+    loader = stream.read_bytes if streamed else None
+
+    key = blob_key(digest, ext)
+    if STORAGE.exists(key):
+        # 동일 이미지 중복 제거 (임시 파일은 요청 종료 시 삭제됨)
+        return StoredImage(ref, digest, ext, key, size, True, data, loader)
+
+    content_type = mimetypes.guess_type(ref)[0]
+    if streamed:
+        # 수신 중 디스크에 받아 둔 임시 파일을 그대로 이동(로컬) 또는 업로드(S3)
+        stream.finish()
+        STORAGE.put_file(key, stream.path, content_type, move=True)
+        stream.mark_persisted(key)
+    else:
+        STORAGE.put_bytes(key, data, content_type)
+    return StoredImage(ref, digest, ext, key, size, False, data, loader)
+
+
+def lock_blob(cur, digest):
+    """
+    blob 단위 트랜잭션 advisory lock (커밋/롤백 시 해제)
+    업로드의 중복 제거(register_ref)와 gc_crop_images.py의 삭제가 같은 blob에서 엇갈리지 않도록 직렬화
+    """
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (digest,))
+
+
+def register_ref(cur, stored):
+    """
+    ref → blob 매핑을 인덱스에 기록 (호출한 쪽 트랜잭션에 포함)
+    중복 제거로 기존 blob을 재사용한 경우, 확인 이후 GC가 blob을 지웠을 수 있으므로 잠금 후 다시 확인해 복구
+    """
+    lock_blob(cur, stored.digest)
+    if stored.deduplicated and not STORAGE.exists(stored.key):
+        STORAGE.put_bytes(stored.key, stored.data, mimetypes.guess_type(stored.ref)[0])
+        stored.deduplicated = False
+    cur.execute("""
+        INSERT INTO image_refs (ref, sha256, ext, size_bytes)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (ref) DO NOTHING
+    """, (stored.ref, stored.digest, stored.ext, stored.size))
+    _remember(stored.ref, stored.key)
+
+
+_ref_cache = OrderedDict()
+_ref_cache_lock = threading.Lock()
+
+
+def _remember(ref, key):
+    with _ref_cache_lock:
+        _ref_cache[ref] = key
+        _ref_cache.move_to_end(ref)
+        while len(_ref_cache) > REF_CACHE_SIZE:
+            _ref_cache.popitem(last=False)
+
+
+def resolve_ref(ref):
+    """참조 이름을 저장소 키로 변환 (인덱스 → 예전 평면 경로 순), 없으면 None"""
+    with _ref_cache_lock:
+        if ref in _ref_cache:
+            _ref_cache.move_to_end(ref)
+            return _ref_cache[ref]
+
+    key = None
+    conn = get_db_connection()
+    if conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT sha256, ext FROM image_refs WHERE ref = %s", (ref,))
+                row = cur.fetchone()
+                if row:
+                    key = blob_key(row[0], row[1])
+        finally:
+            conn.close()
+
+    if key is None:
+        legacy_key = safe_join(IMAGE_STORE_DIR, ref)
+        # 보존 정책(gc_crop_images.py)으로 썸네일만 남은 예전 이미지도 조회 가능하도록 확인
+        if legacy_key and (STORAGE.exists(legacy_key)
+                           or STORAGE.exists(rendition_path(legacy_key, *DOWNSAMPLED_RENDITION))):
+            key = legacy_key
+
+    if key is not None:
+        _remember(ref, key)
+    return key
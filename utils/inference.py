@@ -0,0 +1,368 @@
+import os
+import time
+import hashlib
+import threading
+import queue
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import cv2
+    import numpy as np
+    import torch
+    import ultralytics  # noqa: F401 (설치 여부 확인용)
+    YOLO_AVAILABLE = True
+except ImportError:
+    YOLO_AVAILABLE = False
+    print("Warning: ultralytics not available. YOLO features disabled.")
+
+from utils.model_backends import (BACKENDS, DEFAULT_BACKEND, MODEL_WEIGHTS, load_model, resolve_profile,
+                                  backend_model_path)
+
+# --------------------------
+# 추론 설정
+# --------------------------
+# 한 번의 forward pass에 넣을 최대 이미지 수
+INFERENCE_MAX_BATCH = int(os.getenv('INFERENCE_MAX_BATCH', 8))
+# IoT 단건 업로드를 모아서 처리할 대기 시간 (ms)
+MICRO_BATCH_WINDOW_MS = int(os.getenv('MICRO_BATCH_WINDOW_MS', 20))
+# 마이크로 배치 결과 대기 제한 시간 (초)
+MICRO_BATCH_TIMEOUT = int(os.getenv('MICRO_BATCH_TIMEOUT', 30))
+# 모델 입력 크기 (letterbox 대상, 32의 배수)
+INFERENCE_IMGSZ = int(os.getenv('INFERENCE_IMGSZ', 640))
+# 추론 백엔드 (pytorch / onnx / openvino / torchscript / openvino_int8)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', DEFAULT_BACKEND)
+# 추론 프로파일 (fp32 / fp32-480 / int8 ...) 지정 시 백엔드와 입력 크기를 함께 결정
+INFERENCE_PROFILE = os.getenv('INFERENCE_PROFILE')
+if INFERENCE_PROFILE:
+    INFERENCE_BACKEND, INFERENCE_IMGSZ = resolve_profile(INFERENCE_PROFILE, INFERENCE_BACKEND)
+
+# 모델 실행 정책 (썩은 딸기 모델을 언제 실행할지)
+#   always           : 모든 이미지에 두 모델 실행
+#   fruit            : 익음 모델이 딸기를 하나라도 찾은 이미지만
+#   flagged          : 직전 촬영에서 썩은 딸기가 검출된 그룹만
+#   fruit_or_flagged : 딸기를 찾았거나 직전 촬영에서 검출된 경우
+INFERENCE_POLICIES = ('always', 'fruit', 'flagged', 'fruit_or_flagged')
+INFERENCE_POLICY = os.getenv('INFERENCE_POLICY', 'always')
+if INFERENCE_POLICY not in INFERENCE_POLICIES:
+    raise ValueError(f"지원하지 않는 INFERENCE_POLICY: {INFERENCE_POLICY} (사용 가능: {', '.join(INFERENCE_POLICIES)})")
+
+CONF_THRESHOLD = 0.5
+
+# YOLO 모델 초기화 (사용 가능한 경우에만)
+MODEL_RIPE = None
+MODEL_ROTTEN = None
+ACTIVE_BACKEND = None
+# 분석 결과 캐시 키에 포함되는 모델 버전 (가중치/변환 결과/백엔드/입력 크기/임계값이 바뀌면 달라짐)
+MODEL_VERSION = None
+
+
+def hash_path(digest, path):
+    """파일 또는 디렉토리(openvino IR) 내용을 digest에 추가"""
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                hash_path(digest, file_path)
+        return
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+def compute_model_version(backend, imgsz):
+    # .pt를 그대로 두고 onnx/openvino/int8만 다시 변환해도 캐시가 무효화되도록 실제 로드한 파일도 포함
+    digest = hashlib.sha256()
+    for weights_path in MODEL_WEIGHTS.values():
+        hash_path(digest, weights_path)
+        if backend != DEFAULT_BACKEND:
+            hash_path(digest, backend_model_path(weights_path, backend))
+    return f"{backend}-{imgsz}-{CONF_THRESHOLD}-{digest.hexdigest()[:12]}"
+
+
+if YOLO_AVAILABLE:
+    try:
+        MODEL_RIPE, ACTIVE_BACKEND = load_model(MODEL_WEIGHTS['ripe'], INFERENCE_BACKEND, INFERENCE_IMGSZ)
+        MODEL_ROTTEN, _ = load_model(MODEL_WEIGHTS['rotten'], ACTIVE_BACKEND, INFERENCE_IMGSZ)
+        MODEL_VERSION = compute_model_version(ACTIVE_BACKEND, INFERENCE_IMGSZ)
+        print(f"ℹ️ YOLO 추론 백엔드: {ACTIVE_BACKEND} (모델 버전: {MODEL_VERSION}, 실행 정책: {INFERENCE_POLICY})")
+    except Exception as e:
+        print(f"Warning: YOLO model loading failed: {e}")
+        YOLO_AVAILABLE = False
+
+
+def configure_torch_threads(intra_op, inter_op=1):
+    """
+    프로세스별 torch 스레드 수 설정
+    여러 워커가 동시에 추론할 때 코어 수를 초과해 스레드가 경쟁하지 않도록 워커마다 나눠서 지정
+    """
+    if not YOLO_AVAILABLE:
+        return
+    torch.set_num_threads(max(1, intra_op))
+    try:
+        torch.set_num_interop_threads(max(1, inter_op))
+    except RuntimeError as e:
+        # inter-op 스레드 풀이 이미 시작된 경우 변경 불가
+        print(f"Warning: torch inter-op 스레드 설정 실패: {e}")
+
+
+def models_ready():
+    return YOLO_AVAILABLE and MODEL_RIPE is not None and MODEL_ROTTEN is not None
+
+
+class StageTimer:
+    """분석 단계별 소요 시간(ms) 누적 (decode / preprocess / infer / postprocess)"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, elapsed_ms):
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+
+    def merge(self, timings):
+        for name, elapsed_ms in timings.items():
+            self.add(name, elapsed_ms)
+
+    def as_dict(self):
+        return {name: round(elapsed_ms, 2) for name, elapsed_ms in self.timings.items()}
+
+
+def decode_image_bytes(data):
+    """업로드된 바이트를 디스크 재읽기 없이 메모리에서 바로 디코딩 (BGR ndarray)"""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("이미지를 디코딩할 수 없습니다")
+    return image
+
+
+def letterbox(image, size, pad_value=114):
+    """비율을 유지한 채 size x size 캔버스에 맞추고 나머지는 회색으로 채움"""
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((size, size, 3), pad_value, dtype=np.uint8)
+    top = (size - new_h) // 2
+    left = (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = image
+    return canvas
+
+
+def preprocess(images, size):
+    """
+    BGR 이미지 목록을 한 번만 letterbox 하여 BCHW float 텐서(0~1, RGB)로 변환
+    두 모델이 같은 텐서를 그대로 입력으로 사용한다.
+    """
+    batch = np.stack([letterbox(image, size) for image in images])
+    batch = batch[..., ::-1].transpose(0, 3, 1, 2)  # BGR -> RGB, BHWC -> BCHW
+    batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+    return torch.from_numpy(batch)
+
+
+def count_detections(result_ripe, result_rotten=None):
+    """YOLO 결과에서 익은/안익은/썩은 딸기 개수 집계 (썩은 딸기 모델을 건너뛰었으면 result_rotten=None)"""
+    ripe_classes = [result_ripe.names[int(cls)] for cls in result_ripe.boxes.cls]
+    count_ripe = Counter(ripe_classes)
+    count_rotten = Counter()
+    if result_rotten is not None:
+        count_rotten = Counter(result_rotten.names[int(cls)] for cls in result_rotten.boxes.cls)
+
+    ripe = count_ripe.get("straw-ripe", 0)
+    unripe = count_ripe.get("straw-unripe", 0)
+    rotten = count_rotten.get("starw_rotten", 0)
+    return {
+        'ripe': ripe,
+        'unripe': unripe,
+        'total': ripe + unripe,
+        'rotten': rotten,
+        'has_rotten': rotten > 0,
+        'models_run': ['ripe', 'rotten'] if result_rotten is not None else ['ripe'],
+        'skipped_ms': 0.0
+    }
+
+
+def policy_uses_flag(policy=None):
+    """직전 촬영의 썩은 딸기 검출 여부가 필요한 정책인지 (필요할 때만 DB 조회)"""
+    return (policy or INFERENCE_POLICY) in ('flagged', 'fruit_or_flagged')
+
+
+def rotten_required(counts, flagged=False, policy=None):
+    """익음 모델 결과와 직전 촬영 검출 여부로 썩은 딸기 모델 실행 여부 결정"""
+    policy = policy or INFERENCE_POLICY
+    if policy == 'always':
+        return True
+    has_fruit = counts['total'] > 0
+    if policy == 'fruit':
+        return has_fruit
+    if policy == 'flagged':
+        return flagged
+    return has_fruit or flagged
+
+
+def satisfies_policy(result, flagged=False, policy=None):
+    """
+    캐시된 결과를 현재 정책/상황에서 그대로 써도 되는지
+    (썩은 딸기 모델을 건너뛴 결과인데 지금은 실행이 필요하면 다시 분석)
+    """
+    if 'rotten' in result.get('models_run', ('ripe', 'rotten')):
+        return True
+    return not rotten_required(result, flagged, policy)
+
+
+class CostEstimator:
+    """건너뛴 모델 실행 시간 추정용 이미지 1장당 평균 소요 시간(ms) (지수 이동 평균)"""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.value = None
+        self.lock = threading.Lock()
+
+    def update(self, per_image_ms):
+        with self.lock:
+            if self.value is None:
+                self.value = per_image_ms
+            else:
+                self.value += self.alpha * (per_image_ms - self.value)
+
+    def estimate(self, fallback_ms):
+        return self.value if self.value is not None else fallback_ms
+
+
+ROTTEN_COST = CostEstimator()
+
+
+def analyze_batch(images, timer=None, models=None, backend=None, imgsz=None, max_batch=None,
+                  flags=None, policy=None):
+    """
+    디코딩된 이미지 목록을 INFERENCE_MAX_BATCH 단위로 묶어
+    한 번 전처리한 텐서로 익음 모델을 실행하고, 실행 정책에 해당하는 이미지만 모아 썩은 딸기 모델 실행
+    models/backend/imgsz/max_batch/policy를 지정하지 않으면 서버에 로드된 모델과 설정을 사용
+    flags: 이미지별 직전 촬영 썩은 딸기 검출 여부 (flagged 정책용)
+    """
+    timer = timer or StageTimer()
+    imgsz = imgsz or INFERENCE_IMGSZ
+    max_batch = max_batch or INFERENCE_MAX_BATCH
+    model_ripe, model_rotten = models or (MODEL_RIPE, MODEL_ROTTEN)
+    backend = backend or ACTIVE_BACKEND or DEFAULT_BACKEND
+    flags = flags or [False] * len(images)
+    # 고정 배치로 내보낸 백엔드는 1장씩 실행 (전처리는 배치 단위로 한 번)
+    step = 1 if not BACKENDS[backend]['dynamic_batch'] else max_batch
+
+    results = []
+    for start in range(0, len(images), max_batch):
+        chunk = images[start:start + max_batch]
+        with timer.stage('preprocess'):
+            tensor = preprocess(chunk, imgsz)
+        for offset in range(0, len(chunk), step):
+            part = tensor[offset:offset + step]
+            part_flags = flags[start + offset:start + offset + len(part)]
+
+            ripe_start = time.perf_counter()
+            with timer.stage('infer'):
+                results_ripe = model_ripe(part, conf=CONF_THRESHOLD, imgsz=imgsz, verbose=False)
+            ripe_ms = (time.perf_counter() - ripe_start) * 1000 / len(part)
+            with timer.stage('postprocess'):
+                counts = [count_detections(result_ripe) for result_ripe in results_ripe]
+            needed = [idx for idx, (c, flagged) in enumerate(zip(counts, part_flags))
+                      if rotten_required(c, flagged, policy)]
+
+            if needed:
+                rotten_start = time.perf_counter()
+                with timer.stage('infer'):
+                    subset = part if len(needed) == len(part) else part[needed]
+                    results_rotten = model_rotten(subset, conf=CONF_THRESHOLD, imgsz=imgsz, verbose=False)
+                ROTTEN_COST.update((time.perf_counter() - rotten_start) * 1000 / len(needed))
+                with timer.stage('postprocess'):
+                    for idx, result_rotten in zip(needed, results_rotten):
+                        counts[idx] = count_detections(results_ripe[idx], result_rotten)
+
+            # 건너뛴 이미지는 썩은 딸기 모델 1장 평균 시간만큼 절약 (측정값이 없으면 익음 모델 시간으로 추정)
+            skipped_ms = ROTTEN_COST.estimate(ripe_ms)
+            for c in counts:
+                if 'rotten' not in c['models_run']:
+                    c['skipped_ms'] = round(skipped_ms, 2)
+            results.extend(counts)
+    return results
+
+
+# --------------------------
+# 동시 IoT 업로드용 마이크로 배치
+# --------------------------
+class MicroBatcher:
+    """
+    여러 요청 스레드에서 들어온 단건 이미지를 짧은 시간 창(window) 동안 모아
+    analyze_batch 한 번으로 처리하고, 각 요청에 개별 결과를 돌려준다.
+    """
+
+    def __init__(self, max_batch=INFERENCE_MAX_BATCH, window_ms=MICRO_BATCH_WINDOW_MS):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.pending = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def submit(self, image, flagged=False):
+        future = Future()
+        self.pending.put((image, flagged, future))
+        self._ensure_worker()
+        return future
+
+    def _ensure_worker(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+
+    def _collect(self):
+        # 첫 요청이 올 때까지 대기 후, window 동안 추가 요청 수집
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            images = [image for image, _, _ in batch]
+            flags = [flagged for _, flagged, _ in batch]
+            timer = StageTimer()
+            try:
+                results = analyze_batch(images, timer, flags=flags)
+                timings = timer.as_dict()
+                for (_, _, future), result in zip(batch, results):
+                    future.set_result((result, timings))
+            except Exception as e:
+                print(f"❌ 마이크로 배치 추론 실패 ({len(batch)}건): {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+
+
+MICRO_BATCHER = MicroBatcher()
+
+
+def analyze_image(image, timer=None, flagged=False):
+    """단건 이미지를 마이크로 배치 큐를 통해 분석 (배치 단계별 시간은 timer에 합산)"""
+    result, timings = MICRO_BATCHER.submit(image, flagged).result(timeout=MICRO_BATCH_TIMEOUT)
+    if timer is not None:
+        timer.merge(timings)
+    return result
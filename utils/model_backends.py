@@ -0,0 +1,211 @@
+import os
+import json
+import shutil
+
+try:
+    from ultralytics import YOLO
+except ImportError:
+    YOLO = None
+
+# --------------------------
+# CPU 추론 백엔드 정의
+# --------------------------
+# pytorch: ultralytics eager 모드 (.pt 그대로 사용)
+# onnx: ONNX Runtime (.onnx)
+# openvino: OpenVINO IR (*_openvino_model/ 디렉토리)
+# torchscript: TorchScript (.torchscript)
+# openvino_int8: OpenVINO INT8 양자화 IR (*_int8_openvino_model/ 디렉토리, 보정용 데이터셋 필요)
+#
+# export_format: ultralytics model.export()의 format 인자
+# suffix: .pt 파일명에서 확장자를 대체할 내보내기 결과 경로 접미사
+# dynamic_batch: 여러 장을 한 번에 넣을 수 있는지 여부 (고정 배치면 1장씩 실행)
+#                False인 백엔드는 입력 크기도 변환할 때의 imgsz로 고정 (<결과>.json에 기록)
+# int8: INT8 양자화 여부
+BACKENDS = {
+    'pytorch': {'export_format': None, 'suffix': '.pt', 'dynamic_batch': True, 'int8': False},
+    'onnx': {'export_format': 'onnx', 'suffix': '.onnx', 'dynamic_batch': True, 'int8': False},
+    'openvino': {'export_format': 'openvino', 'suffix': '_openvino_model', 'dynamic_batch': True, 'int8': False},
+    'torchscript': {'export_format': 'torchscript', 'suffix': '.torchscript', 'dynamic_batch': False, 'int8': False},
+    'openvino_int8': {'export_format': 'openvino', 'suffix': '_int8_openvino_model', 'dynamic_batch': True, 'int8': True},
+}
+
+DEFAULT_BACKEND = 'pytorch'
+
+# --------------------------
+# 추론 프로파일 (백엔드 + 입력 크기)
+# --------------------------
+# 개수만 필요한 배포 환경에서 INFERENCE_PROFILE로 선택
+# backend가 None이면 INFERENCE_BACKEND 설정을 그대로 사용
+# 프로파일별 지연시간/처리량/FP32 대비 개수 일치율은 benchmark_profiles.py로 측정
+INFERENCE_PROFILES = {
+    'fp32': {'backend': None, 'imgsz': 640},
+    'fp32-480': {'backend': None, 'imgsz': 480},
+    'fp32-320': {'backend': None, 'imgsz': 320},
+    'int8': {'backend': 'openvino_int8', 'imgsz': 640},
+    'int8-480': {'backend': 'openvino_int8', 'imgsz': 480},
+    'int8-320': {'backend': 'openvino_int8', 'imgsz': 320},
+}
+
+BASELINE_PROFILE = 'fp32'
+
+# --------------------------
+# 엣지(라즈베리파이) 추론용 내보내기 대상
+# --------------------------
+# 디바이스에서 직접 추론할 때 사용하는 고정 배치(1장) 경량 모델 (iot_edge_inference.py가 로드)
+# onnx_int8: ONNX 내보내기 후 onnxruntime 동적 양자화 (보정용 데이터셋 불필요)
+# tflite_int8: TFLite INT8 양자화 (보정용 데이터셋 필요)
+# 결과 옆에 클래스 이름/입력 크기를 담은 <모델>.json 을 함께 저장
+EDGE_TARGETS = {
+    'onnx_int8': {'export_format': 'onnx', 'suffix': '_edge_int8.onnx', 'needs_data': False},
+    'tflite_int8': {'export_format': 'tflite', 'suffix': '_edge_int8.tflite', 'needs_data': True},
+}
+
+# 엣지 모델 기본 입력 크기 (라즈베리파이 CPU 기준)
+EDGE_IMGSZ = 320
+
+# 모델 가중치 경로 (.pt 원본)
+MODEL_WEIGHTS = {
+    'ripe': "model/ripe_straw.pt",
+    'rotten': "model/rotten_straw.pt",
+}
+
+
+def backend_model_path(weights_path, backend):
+    """원본 .pt 경로로부터 백엔드별 내보내기 결과 경로 계산"""
+    base, _ = os.path.splitext(weights_path)
+    return base + BACKENDS[backend]['suffix']
+
+
+def exported_imgsz(path, default=640):
+    """고정 입력 크기 백엔드의 변환 당시 입력 크기 (export_model이 기록, 기록이 없으면 기본 변환 크기)"""
+    try:
+        with open(path + '.json', encoding='utf-8') as f:
+            return int(json.load(f)['imgsz'])
+    except (OSError, ValueError, KeyError):
+        return default
+
+
+def set_session_threads(model, path, backend, threads, imgsz=640):
+    """
+    ultralytics가 기본 설정으로 만든 ONNX Runtime/OpenVINO 세션을 지정한 스레드 수로 다시 생성
+    (torch.set_num_threads는 이 두 백엔드에 적용되지 않음, pytorch/torchscript는 호출한 쪽에서 torch로 설정)
+    """
+    export_format = BACKENDS[backend]['export_format']
+    if export_format not in ('onnx', 'openvino'):
+        return
+    import numpy as np
+
+    # 첫 실행 때 predictor와 백엔드 세션이 만들어짐
+    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    backend_model = model.predictor.model
+    if export_format == 'onnx':
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        backend_model.session = onnxruntime.InferenceSession(
+            path, options, providers=backend_model.session.get_providers())
+    else:
+        try:
+            import openvino as ov
+        except ImportError:
+            import openvino.runtime as ov
+
+        xml_path = next(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.xml'))
+        core = ov.Core()
+        backend_model.ov_compiled_model = core.compile_model(
+            core.read_model(xml_path), device_name='CPU',
+            config={'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': threads})
+
+
+def load_model(weights_path, backend=DEFAULT_BACKEND, imgsz=None, threads=None):
+    """
+    지정한 백엔드로 모델 로드
+    내보내기 결과가 없으면 경고 후 pytorch 백엔드로 대체하며, 실제 사용된 백엔드를 함께 반환
+    imgsz를 지정하면 입력 크기가 고정된 백엔드(torchscript 등)가 그 크기로 변환되었는지 미리 확인
+    threads를 지정하면 ONNX Runtime/OpenVINO 세션의 추론 스레드 수로 사용
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 추론 백엔드입니다: {backend}")
+
+    path = backend_model_path(weights_path, backend)
+    if backend != DEFAULT_BACKEND and not os.path.exists(path):
+        print(f"Warning: {path} 없음. export_models.py로 변환하세요. pytorch 백엔드로 대체합니다.")
+        backend = DEFAULT_BACKEND
+        path = weights_path
+
+    if imgsz and not BACKENDS[backend]['dynamic_batch']:
+        fixed = exported_imgsz(path)
+        if fixed != imgsz:
+            raise ValueError(f"{path}는 입력 크기 {fixed}로 고정되어 있어 {imgsz}로 실행할 수 없습니다. "
+                             f"python export_models.py {backend} --imgsz {imgsz} 로 다시 변환하세요.")
+
+    model = YOLO(path, task='detect')
+    if threads:
+        set_session_threads(model, path, backend, threads, imgsz or 640)
+    return model, backend
+
+
+def resolve_profile(name, default_backend=DEFAULT_BACKEND):
+    """프로파일 이름을 (백엔드, 입력 크기)로 변환"""
+    if name not in INFERENCE_PROFILES:
+        raise ValueError(f"지원하지 않는 추론 프로파일입니다: {name}")
+    profile = INFERENCE_PROFILES[name]
+    return profile['backend'] or default_backend, profile['imgsz']
+
+
+def export_model(weights_path, backend, imgsz=640, batch=8, data=None):
+    """
+    .pt 가중치를 지정한 백엔드 형식으로 내보내고 결과 경로를 반환
+    INT8 백엔드는 data(보정용 데이터셋 yaml)로 양자화 보정을 수행
+    """
+    spec = BACKENDS[backend]
+    if spec['export_format'] is None:
+        return weights_path
+
+    model = YOLO(weights_path)
+    options = {'format': spec['export_format'], 'imgsz': imgsz}
+    if spec['dynamic_batch']:
+        options.update({'dynamic': True, 'batch': batch})
+    if spec['int8']:
+        if not data:
+            raise ValueError("INT8 변환에는 보정용 데이터셋(data)이 필요합니다")
+        options.update({'int8': True, 'data': data})
+    output_path = model.export(**options)
+    if not spec['dynamic_batch']:
+        # 입력 크기가 고정되므로 load_model이 다른 크기 프로파일과 함께 쓰이지 않도록 기록
+        with open(backend_model_path(weights_path, backend) + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'imgsz': imgsz}, f)
+    return output_path
+
+
+def edge_model_path(weights_path, target):
+    """원본 .pt 경로로부터 엣지 모델 경로 계산"""
+    base, _ = os.path.splitext(weights_path)
+    return base + EDGE_TARGETS[target]['suffix']
+
+
+def export_edge_model(weights_path, target, imgsz=EDGE_IMGSZ, data=None):
+    """
+    .pt 가중치를 디바이스용 INT8 모델로 내보내고 결과 경로를 반환
+    NMS는 디바이스에서 수행하므로 원본 출력(1, 4+클래스 수, N) 그대로 내보냄
+    """
+    spec = EDGE_TARGETS[target]
+    if spec['needs_data'] and not data:
+        raise ValueError("TFLite INT8 변환에는 보정용 데이터셋(data)이 필요합니다")
+
+    model = YOLO(weights_path)
+    output_path = edge_model_path(weights_path, target)
+    if target == 'onnx_int8':
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        exported = model.export(format='onnx', imgsz=imgsz, batch=1, simplify=True)
+        quantize_dynamic(exported, output_path, weight_type=QuantType.QUInt8)
+    else:
+        exported = model.export(format=spec['export_format'], imgsz=imgsz, int8=True, data=data)
+        shutil.copyfile(exported, output_path)
+
+    with open(output_path + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'names': model.names, 'imgsz': imgsz}, f, ensure_ascii=False)
+    return output_path
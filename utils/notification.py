@@ -1,5 +1,5 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from config import DB_CONFIG
 from datetime import datetime
 
@@ -117,6 +117,40 @@ class NotificationManager:
             image_url=image_url
         )
 
+    #병해충 발생 알림 일괄 생성 (여러 작물 그룹의 검출을 비닐하우스별 알림 1건으로 묶어 한 번에 INSERT)
+    def create_pest_detection_notifications(self, detections, window_seconds: int):
+        """
+        detections: [(group_id, image_url), ...]
+        window_seconds 안에 같은 비닐하우스로 이미 보낸 알림이 있으면 생략 (다른 워커와 중복 방지)
+        """
+        if not detections:
+            return 0
+        try:
+            execute_values(self.cursor, f"""
+                INSERT INTO notification (receiver_id, message, type, target_id, image_url)
+                SELECT f.owner_username,
+                       format('''%%s'' 비닐하우스의 작물 %%s개 구역에서 병해충이 발견되었습니다. 확인이 필요합니다.',
+                              g.name, COUNT(DISTINCT d.group_id)),
+                       '병해충 발생', g.id, MIN(d.image_url)
+                FROM (VALUES %s) AS d (group_id, image_url)
+                JOIN crop_groups cg ON cg.id = d.group_id
+                JOIN greenhouses g ON g.id = cg.greenhouse_id
+                JOIN farms f ON f.id = g.farm_id
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM notification n
+                    WHERE n.type = '병해충 발생' AND n.target_id = g.id
+                      AND n.created_at > NOW() - INTERVAL '{int(window_seconds)} seconds'
+                )
+                GROUP BY f.owner_username, g.id, g.name
+            """, detections, template="(%s::integer, %s)", page_size=len(detections))
+            created = self.cursor.rowcount
+            self.db.commit()
+            return created
+        except Exception as e:
+            print(f"Error creating pest detection notifications: {e}")
+            self.db.rollback()
+            return 0
+
     #새 댓글 알림 생성
     def create_new_comment_notification(self, receiver_id: str, post_id: int, post_title: str):
         try:
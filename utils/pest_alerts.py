@@ -0,0 +1,49 @@
+import os
+import atexit
+import threading
+from utils.notification import NotificationManager
+
+# --------------------------
+# 병해충 알림 묶음 전송
+# --------------------------
+# 분석에서 썩은 딸기가 검출되면 바로 알림을 만들지 않고 PEST_ALERT_WINDOW 동안 모았다가
+# 비닐하우스별로 1건씩, 한 번의 INSERT로 생성 (전체 스캔 중 30개 구역 검출 → 알림 1건)
+PEST_ALERT_WINDOW = int(os.getenv('PEST_ALERT_WINDOW', 120))
+
+
+class PestAlertCoalescer:
+    def __init__(self, window=PEST_ALERT_WINDOW):
+        self.window = window
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def report(self, group_id, image_ref):
+        """검출 기록 (첫 검출 시점부터 window초 뒤에 모아서 전송, image_ref가 없으면 이미지 없는 알림)"""
+        with self.lock:
+            if self.pending.get(int(group_id)) is None:
+                self.pending[int(group_id)] = image_ref
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.timer = None
+        if not pending:
+            return
+
+        detections = [(group_id, f"/api/media/crop-images/{image_ref}?size=thumb" if image_ref else None)
+                      for group_id, image_ref in pending.items()]
+        try:
+            created = NotificationManager().create_pest_detection_notifications(detections, self.window)
+            print(f"🐛 병해충 알림 {created}건 생성 (검출 구역 {len(detections)}곳)")
+        except Exception as e:
+            print(f"❌ 병해충 알림 생성 실패 ({len(detections)}곳): {e}")
+
+
+PEST_ALERTS = PestAlertCoalescer()
+# 종료 시 대기 중인 검출도 전송
+atexit.register(PEST_ALERTS.flush)
@@ -0,0 +1,88 @@
+import io
+import os
+import threading
+from utils.storage import STORAGE
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("Warning: Pillow not available. Image renditions disabled.")
+
+# --------------------------
+# 이미지 파생본 (썸네일/미리보기)
+# --------------------------
+# 이름: 긴 변 최대 픽셀
+RENDITIONS = {
+    'thumb': 240,
+    'preview': 800,
+}
+
+# 형식: (Pillow 저장 포맷, MIME 타입, 저장 옵션)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# 업로드 시 미리 만들어 두는 형식 (나머지는 첫 요청 시 생성)
+INGEST_FORMATS = ('webp',)
+
+# 보존 정책으로 원본을 정리한 뒤에도 남기는 파생본 (이름, 형식)
+DOWNSAMPLED_RENDITION = ('thumb', 'webp')
+
+
+def rendition_path(original_key, name, fmt):
+    """원본 옆에 저장되는 파생본 키 (예: a.jpg → a.thumb.webp)"""
+    base, _ = os.path.splitext(original_key)
+    return f"{base}.{name}.{fmt}"
+
+
+def is_rendition(path):
+    """파생본 파일 여부 (원본 목록 스캔 시 제외용)"""
+    parts = os.path.basename(path).rsplit('.', 2)
+    return len(parts) == 3 and parts[1] in RENDITIONS and parts[2] in RENDITION_FORMATS
+
+
+def create_rendition(original_key, name, fmt, data=None):
+    """
+    파생본 하나를 생성해 저장소에 기록 (저장소 쓰기가 원자적이므로 동시 요청에도 깨진 파일이 노출되지 않음)
+    data: 원본 바이트를 이미 가지고 있으면 전달 (저장소에서 다시 읽지 않음)
+    """
+    target = rendition_path(original_key, name, fmt)
+    pil_format, mimetype, options = RENDITION_FORMATS[fmt]
+    if data is None:
+        data = STORAGE.read(original_key)
+
+    buffer = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        img.thumbnail((RENDITIONS[name], RENDITIONS[name]))
+        img.save(buffer, format=pil_format, **options)
+    STORAGE.put_bytes(target, buffer.getvalue(), mimetype)
+    return target
+
+
+def get_or_create_rendition(original_key, name, fmt):
+    """파생본이 있으면 키 반환, 없으면 생성 후 반환"""
+    target = rendition_path(original_key, name, fmt)
+    if STORAGE.exists(target):
+        return target
+    return create_rendition(original_key, name, fmt)
+
+
+def generate_ingest_renditions(original_key, data=None):
+    """업로드 직후 기본 파생본 생성"""
+    if not PIL_AVAILABLE:
+        return
+    for name in RENDITIONS:
+        for fmt in INGEST_FORMATS:
+            try:
+                create_rendition(original_key, name, fmt, data)
+            except Exception as e:
+                print(f"❌ 파생본 생성 실패 ({os.path.basename(original_key)}, {name}.{fmt}): {e}")
+
+
+def generate_ingest_renditions_async(original_key, data=None):
+    """업로드 응답을 늦추지 않도록 백그라운드에서 파생본 생성"""
+    threading.Thread(target=generate_ingest_renditions, args=(original_key, data), daemon=True).start()
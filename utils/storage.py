@@ -0,0 +1,252 @@
+import os
+import shutil
+import tempfile
+from utils.upload_stream import HashingUploadStream
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    BOTO3_AVAILABLE = False
+
+# --------------------------
+# 파일 저장소 (로컬 디스크 / S3 호환 오브젝트 스토리지)
+# --------------------------
+# 키는 기존 로컬 경로와 같은 상대 경로 형식 (예: static/uploads/farms/a.pdf)
+# STORAGE_BACKEND=s3 이면 여러 앱 인스턴스가 같은 버킷을 공유 (MinIO 등은 S3_ENDPOINT_URL로 지정)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', '.')
+S3_BUCKET = os.getenv('S3_BUCKET', 'smart-farm')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None
+S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+# 이 크기를 넘는 업로드는 멀티파트로 나눠 전송 (MB)
+S3_MULTIPART_MB = int(os.getenv('S3_MULTIPART_MB', 8))
+# 다운로드 스트리밍 청크 크기
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StorageNotFound(Exception):
+    pass
+
+
+class LocalStorage:
+    """로컬 파일시스템 드라이버 (기본값, 기존 static/ 경로와 호환)"""
+
+    name = 'local'
+
+    def __init__(self, root=LOCAL_STORAGE_ROOT):
+        self.root = root
+
+    def local_path(self, key):
+        """키에 해당하는 디스크 경로 (send_file 등으로 바로 전송 가능)"""
+        return os.path.join(self.root, key)
+
+    def _prepare(self, key):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def put_file(self, key, src_path, content_type=None, move=False):
+        """디스크에 있는 파일을 저장 (move=True면 같은 파일시스템에서 rename만 수행)"""
+        path = self._prepare(key)
+        if move:
+            try:
+                os.replace(src_path, path)
+            except OSError:
+                shutil.move(src_path, path)
+        else:
+            shutil.copyfile(src_path, path)
+
+    def put_fileobj(self, key, fileobj, content_type=None):
+        """파일 객체를 청크 단위로 저장 (임시 파일에 쓴 뒤 교체)"""
+        path = self._prepare(key)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(fileobj, f, STREAM_CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, key, data, content_type=None):
+        path = self._prepare(key)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self.local_path(key))
+        except FileNotFoundError:
+            raise StorageNotFound(key)
+
+    def read(self, key):
+        try:
+            with open(self.local_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise StorageNotFound(key)
+
+    def read_range(self, key, start, end):
+        """[start, end) 범위만 읽기"""
+        try:
+            with open(self.local_path(key), 'rb') as f:
+                f.seek(start)
+                return f.read(end - start)
+        except FileNotFoundError:
+            raise StorageNotFound(key)
+
+    def iter_chunks(self, key, start=0, end=None):
+        try:
+            f = open(self.local_path(key), 'rb')
+        except FileNotFoundError:
+            raise StorageNotFound(key)
+
+        def generate():
+            with f:
+                f.seek(start)
+                remaining = None if end is None else end - start
+                while remaining is None or remaining > 0:
+                    chunk = f.read(STREAM_CHUNK_SIZE if remaining is None else min(STREAM_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+        return generate()
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class S3Storage:
+    """S3 호환 드라이버 (AWS S3, MinIO 등)"""
+
+    name = 's3'
+
+    def __init__(self, bucket=S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION):
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("STORAGE_BACKEND=s3 에는 boto3 설치가 필요합니다.")
+        self.bucket = bucket
+        # 자격 증명은 AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY 환경 변수 사용
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_MB * 1024 * 1024,
+            multipart_chunksize=S3_MULTIPART_MB * 1024 * 1024,
+        )
+
+    def local_path(self, key):
+        return None
+
+    def _extra_args(self, content_type):
+        return {'ContentType': content_type} if content_type else None
+
+    def put_file(self, key, src_path, content_type=None, move=False):
+        """디스크 파일을 업로드 (큰 파일은 멀티파트로 나눠 전송)"""
+        self.client.upload_file(src_path, self.bucket, key,
+                                ExtraArgs=self._extra_args(content_type), Config=self.transfer_config)
+        if move:
+            os.remove(src_path)
+
+    def put_fileobj(self, key, fileobj, content_type=None):
+        """파일 객체를 읽는 대로 멀티파트 업로드 (전체를 메모리에 올리지 않음)"""
+        self.client.upload_fileobj(fileobj, self.bucket, key,
+                                   ExtraArgs=self._extra_args(content_type), Config=self.transfer_config)
+
+    def put_bytes(self, key, data, content_type=None):
+        kwargs = {'ContentType': content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **kwargs)
+
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise StorageNotFound(key)
+            raise
+
+    def exists(self, key):
+        try:
+            self._head(key)
+            return True
+        except StorageNotFound:
+            return False
+
+    def size(self, key):
+        return self._head(key)['ContentLength']
+
+    def _get(self, key, start=None, end=None):
+        kwargs = {}
+        if start is not None:
+            kwargs['Range'] = f"bytes={start}-{'' if end is None else end - 1}"
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)['Body']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise StorageNotFound(key)
+            raise
+
+    def read(self, key):
+        return self._get(key).read()
+
+    def read_range(self, key, start, end):
+        """[start, end) 범위만 Range 요청으로 읽기"""
+        return self._get(key, start, end).read()
+
+    def iter_chunks(self, key, start=0, end=None):
+        body = self._get(key, start if start or end is not None else None, end)
+        return body.iter_chunks(STREAM_CHUNK_SIZE)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        return True
+
+
+STORAGE_DRIVERS = {
+    'local': LocalStorage,
+    's3': S3Storage,
+}
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    if backend not in STORAGE_DRIVERS:
+        raise ValueError(f"지원하지 않는 저장소: {backend} (사용 가능: {', '.join(STORAGE_DRIVERS)})")
+    return STORAGE_DRIVERS[backend]()
+
+
+def save_upload(key, file, content_type=None):
+    """
+    요청으로 받은 업로드 파일(FileStorage)을 저장소에 기록
+    StreamingUploadRequest가 디스크에 미리 받아 둔 임시 파일이 있으면 그 파일을 그대로 이동/업로드
+    """
+    content_type = content_type or file.mimetype
+    stream = file.stream
+    if isinstance(stream, HashingUploadStream):
+        stream.finish()
+        STORAGE.put_file(key, stream.path, content_type, move=True)
+        stream.mark_persisted(key)
+    else:
+        stream.seek(0)
+        STORAGE.put_fileobj(key, stream, content_type)
+
+
+# 앱 전역 저장소
+STORAGE = create_storage()
+print(f"🗄️ 파일 저장소: {STORAGE.name}" + (f" (bucket={S3_BUCKET})" if STORAGE.name == 's3' else ''))
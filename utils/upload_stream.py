@@ -0,0 +1,85 @@
+import os
+import hashlib
+import tempfile
+from flask import Request
+
+# 업로드 수신 중 임시 파일을 쓰는 디렉토리 (최종 저장 위치와 같은 파일시스템이면 이동 비용 없음)
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', 'upload_spool')
+# 요청 본문 최대 크기 (MB)
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', 16))
+
+os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+
+
+class HashingUploadStream:
+    """
+    multipart 파일 파트를 받는 즉시 SHA-256을 계산하며 디스크 임시 파일에만 기록하는 스트림
+    파일 전체를 메모리에 두지 않으며, 분석처럼 바이트가 필요한 곳에서만 read_bytes()로 다시 읽는다.
+    """
+
+    def __init__(self, spool_dir=UPLOAD_SPOOL_DIR):
+        self.hasher = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=spool_dir, suffix='.part')
+        self.file = os.fdopen(fd, 'w+b')
+        self.persisted = False
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        # read/seek/tell 등 나머지 파일 메서드는 임시 파일에 위임
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def finish(self):
+        """디스크 임시 파일 기록 마무리 (이후 self.path를 그대로 이동/업로드 가능)"""
+        if not self.file.closed:
+            self.file.flush()
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+    @property
+    def size(self):
+        self.finish()
+        return os.fstat(self.file.fileno()).st_size
+
+    def read_bytes(self):
+        """
+        임시 파일 전체를 읽어 반환 (분석/썸네일 생성 시에만 호출)
+        저장소로 이동(rename)된 뒤에도 열린 파일 핸들로 읽을 수 있다.
+        """
+        self.finish()
+        position = self.file.tell()
+        self.file.seek(0)
+        try:
+            return self.file.read()
+        finally:
+            self.file.seek(position)
+
+    def mark_persisted(self, location):
+        """임시 파일이 다른 곳(저장소)으로 옮겨졌음을 기록 (요청 종료 시 삭제하지 않음)"""
+        self.path = location
+        self.persisted = True
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        # 저장하지 않은 임시 파일은 요청 종료 시 삭제
+        if not self.persisted and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                print(f"임시 업로드 파일 삭제 실패: {e}")
+
+
+class StreamingUploadRequest(Request):
+    """파일 파트를 HashingUploadStream으로 받는 요청 클래스 (app.request_class로 지정)"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUploadStream()
+